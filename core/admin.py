@@ -3,7 +3,8 @@ from django.contrib.auth.admin import UserAdmin
 from .models import (
     CustomUser, Customer, Project, SEOLog,
     ReportSection, Media, UserSettings, SEOLogFile, Notification,
-    Report, ReportAttachment, ReportSectionOrder, ReportVersion, AttachmentAccess
+    Report, ReportAttachment, ReportSectionOrder, ReportVersion, AttachmentAccess,
+    ReportRenderJob, PendingFileDeletion, StoredBlob, ImageDerivativeJob
 )
 
 class CustomUserAdmin(UserAdmin):
@@ -62,6 +63,28 @@ class ReportVersionAdmin(admin.ModelAdmin):
     search_fields = ('report__title', 'changes', 'report__project__name')
     ordering = ('-created_at',)
 
+class ReportRenderJobAdmin(admin.ModelAdmin):
+    list_display = ('report', 'status', 'requested_by', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('report__title', 'error')
+    ordering = ('-created_at',)
+
+class PendingFileDeletionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'attempts', 'created_at')
+    search_fields = ('name', 'last_error')
+    ordering = ('id',)
+
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'ref_count', 'created_at')
+    search_fields = ('name',)
+    ordering = ('-created_at',)
+
+class ImageDerivativeJobAdmin(admin.ModelAdmin):
+    list_display = ('source', 'status', 'attempts', 'created_at', 'started_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('source', 'error')
+    ordering = ('-created_at',)
+
 class ReportAttachmentAdmin(admin.ModelAdmin):
     list_display = ('title', 'report_section', 'file_type', 'file_size', 'created_at')
     list_filter = ('file_type', 'created_at', 'report_section__project__customer')
@@ -109,6 +132,10 @@ admin.site.register(Project, ProjectAdmin)
 admin.site.register(SEOLog, SEOLogAdmin)
 admin.site.register(ReportSection, ReportSectionAdmin)
 admin.site.register(ReportVersion, ReportVersionAdmin)
+admin.site.register(ReportRenderJob, ReportRenderJobAdmin)
+admin.site.register(PendingFileDeletion, PendingFileDeletionAdmin)
+admin.site.register(StoredBlob, StoredBlobAdmin)
+admin.site.register(ImageDerivativeJob, ImageDerivativeJobAdmin)
 admin.site.register(ReportAttachment, ReportAttachmentAdmin)
 admin.site.register(AttachmentAccess, AttachmentAccessAdmin)
 admin.site.register(ReportSectionOrder, ReportSectionOrderAdmin)
@@ -0,0 +1,47 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .file_cleanup import schedule_file_deletion
+from .models import Media, ReportAttachment, SEOLogFile, StoredBlob
+from .storage import is_blob_name
+
+# Models whose uploads live in the content-addressed store
+BLOB_FIELDS = [
+    (SEOLogFile, 'file'),
+    (ReportAttachment, 'file'),
+    (Media, 'file'),
+]
+
+
+def acquire_blob(name, size=0):
+    """Count one more reference to a stored blob."""
+    if not is_blob_name(name):
+        return
+    blobs = StoredBlob.objects.filter(name=name)
+    if blobs.update(ref_count=F('ref_count') + 1):
+        return
+    try:
+        with transaction.atomic():
+            StoredBlob.objects.create(name=name, size=size, ref_count=1)
+    except IntegrityError:
+        blobs.update(ref_count=F('ref_count') + 1)
+
+
+def release_blob(name):
+    """
+    Drop one reference to a stored file and journal it for deletion once
+    nothing references it. Files outside the blob store have a single owner
+    and are journaled straight away.
+
+    The StoredBlob row stays at zero references until drain_file_deletions
+    removes it together with the file, so an upload of the same content in
+    between takes its reference on that same row.
+    """
+    if not name:
+        return
+    if not is_blob_name(name):
+        schedule_file_deletion(name)
+        return
+    released = StoredBlob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+    if released and StoredBlob.objects.filter(name=name, ref_count=0).exists():
+        schedule_file_deletion(name)
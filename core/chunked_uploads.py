@@ -0,0 +1,149 @@
+import hashlib
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ChunkedUpload, ChunkedUploadPart, SEOLogFile
+from .uploads import sniff_content_type
+
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """A chunked upload request the client has to correct; not worth retrying as is."""
+
+
+def create_upload(seo_log, user, file_name, size, sha256=''):
+    """Start a resumable upload and preallocate its file."""
+    if not file_name:
+        raise UploadError('A file name is required.')
+    if size <= 0:
+        raise UploadError('The file is empty.')
+    if size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise UploadError(f'File {file_name} is too large.')
+
+    upload = ChunkedUpload.objects.create(
+        seo_log=seo_log,
+        user=user,
+        file_name=os.path.basename(file_name)[:255],
+        size=size,
+        chunk_size=settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+        sha256=sha256.lower()
+    )
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    with open(upload.path, 'wb') as f:
+        f.truncate(size)
+    return upload
+
+
+def missing_offsets(upload):
+    """Return the byte offsets of the chunks that still have to be sent."""
+    received = set(upload.parts.values_list('index', flat=True))
+    return [index * upload.chunk_size for index in range(upload.chunk_count) if index not in received]
+
+
+def write_chunk(upload, offset, stream, length):
+    """
+    Write one chunk from a request stream at its offset. Chunks may arrive in
+    any order and concurrently; each lands in its own byte range of the file.
+    """
+    if offset < 0 or offset % upload.chunk_size or offset >= upload.size:
+        raise UploadError('Upload-Offset must be the start of a chunk.')
+    expected = min(upload.chunk_size, upload.size - offset)
+    if length != expected:
+        raise UploadError(f'The chunk at offset {offset} must be {expected} bytes.')
+
+    written = 0
+    with open(upload.path, 'r+b') as f:
+        f.seek(offset)
+        while written < expected:
+            data = stream.read(min(READ_SIZE, expected - written))
+            if not data:
+                break
+            f.write(data)
+            written += len(data)
+    if written != expected:
+        # The connection dropped mid-chunk; the client resends it
+        raise UploadError(f'The chunk at offset {offset} arrived incomplete.')
+
+    if offset == 0 and read_content_type(upload) is None:
+        raise UploadError(f'File {upload.file_name} has an unsupported format.')
+
+    ChunkedUploadPart.objects.get_or_create(upload=upload, index=offset // upload.chunk_size)
+    ChunkedUpload.objects.filter(pk=upload.pk).update(updated_at=timezone.now())
+
+
+def read_content_type(upload):
+    with open(upload.path, 'rb') as f:
+        return sniff_content_type(f.read(READ_SIZE), upload.file_name)
+
+
+def finalize_upload(upload):
+    """
+    Check the assembled file and attach it to the SEO log as an SEOLogFile.
+
+    The upload is claimed first with a conditional UPDATE inside the
+    transaction: a concurrent or retried finalize waits on that row until
+    the first one commits, then finds the upload gone instead of attaching
+    the file a second time.
+    """
+    with transaction.atomic():
+        if not ChunkedUpload.objects.filter(pk=upload.pk).update(updated_at=timezone.now()):
+            raise UploadError('This upload was already finalized.')
+
+        if missing_offsets(upload):
+            raise UploadError('Some chunks have not been uploaded yet.')
+        if read_content_type(upload) is None:
+            raise UploadError(f'File {upload.file_name} has an unsupported format.')
+
+        digest = hashlib.sha256()
+        with open(upload.path, 'rb') as f:
+            for data in iter(lambda: f.read(READ_SIZE), b''):
+                digest.update(data)
+        if upload.sha256 and digest.hexdigest() != upload.sha256:
+            raise UploadError('The uploaded file does not match its checksum.')
+
+        with open(upload.path, 'rb') as f:
+            content = File(f, name=upload.file_name)
+            content.sha256 = digest.hexdigest()
+            log_file = SEOLogFile.objects.create(
+                seo_log=upload.seo_log,
+                file=content,
+                work_type=upload.seo_log.work_type,
+                file_name=upload.file_name,
+                file_size=upload.size
+            )
+        upload.delete()
+    return log_file
+
+
+def remove_upload_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def expire_stale_uploads(max_age=timedelta(hours=48)):
+    """
+    Delete uploads nobody sent a chunk to within max_age, and part files
+    left without a row. Returns the number of uploads removed.
+    """
+    stale = ChunkedUpload.objects.filter(updated_at__lt=timezone.now() - max_age)
+    count = 0
+    for upload in stale:
+        upload.delete()
+        count += 1
+
+    cutoff = time.time() - max_age.total_seconds()
+    known = {f'{pk}.part' for pk in ChunkedUpload.objects.values_list('pk', flat=True)}
+    if os.path.isdir(settings.CHUNKED_UPLOAD_DIR):
+        for entry in os.scandir(settings.CHUNKED_UPLOAD_DIR):
+            if entry.name not in known and entry.stat().st_mtime < cutoff:
+                remove_upload_file(entry.path)
+    return count
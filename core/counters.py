@@ -0,0 +1,144 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import CustomUser, Customer, DashboardCounter, Project, Report, SEOLog
+
+GLOBAL = 'global'
+PROVIDER = 'provider'
+CUSTOMER = 'customer'
+
+
+def logs_key(day):
+    return f'logs:{day.isoformat()}'
+
+
+def log_counter_keys(customer_id, created_by_id, date):
+    """Return the (scope, scope id, counter name) entries an SEO log counts towards."""
+    name = logs_key(date)
+    return [(GLOBAL, 0, name), (CUSTOMER, customer_id, name), (PROVIDER, created_by_id, name)]
+
+
+def scope_querysets(scope, scope_id=0):
+    """Return the customers, projects, logs and reports visible on a scope's dashboard."""
+    if scope == PROVIDER:
+        return {
+            'customers': Customer.objects.filter(project__providers=scope_id).distinct(),
+            'projects': Project.objects.filter(providers=scope_id),
+            'logs': SEOLog.objects.filter(created_by=scope_id),
+            'reports': Report.objects.filter(created_by=scope_id),
+        }
+    if scope == CUSTOMER:
+        return {
+            'customers': Customer.objects.filter(pk=scope_id),
+            'projects': Project.objects.filter(customer=scope_id),
+            'logs': SEOLog.objects.filter(project__customer=scope_id),
+            'reports': Report.objects.filter(project__customer=scope_id),
+        }
+    return {
+        'customers': Customer.objects.all(),
+        'projects': Project.objects.all(),
+        'logs': SEOLog.objects.all(),
+        'reports': Report.objects.all(),
+    }
+
+
+def increment(scope, scope_id, name, delta=1):
+    """Atomically add delta to a counter, creating the row on first use."""
+    if not delta or scope_id is None:
+        return
+    counters = DashboardCounter.objects.filter(scope=scope, scope_id=scope_id, name=name)
+    if counters.update(value=F('value') + delta):
+        return
+    try:
+        with transaction.atomic():
+            DashboardCounter.objects.create(scope=scope, scope_id=scope_id, name=name, value=delta)
+    except IntegrityError:
+        # Another request created the row first
+        counters.update(value=F('value') + delta)
+
+
+def set_counter(scope, scope_id, name, value):
+    DashboardCounter.objects.update_or_create(
+        scope=scope, scope_id=scope_id, name=name, defaults={'value': value}
+    )
+
+
+def read_counters(scope, scope_id, day):
+    """Return the dashboard card values for a scope with a single query."""
+    names = {
+        'customers': 'customer_count',
+        'active_projects': 'active_projects_count',
+        logs_key(day): 'todays_logs_count',
+        'reports': 'reports_count',
+    }
+    values = {context_name: 0 for context_name in names.values()}
+    rows = DashboardCounter.objects.filter(
+        scope=scope, scope_id=scope_id, name__in=names
+    ).values_list('name', 'value')
+    for name, value in rows:
+        values[names[name]] = value
+    return values
+
+
+def recount_membership(scope, scope_id):
+    """Recompute the customer and active project counters of a scope from the source tables."""
+    querysets = scope_querysets(scope, scope_id)
+    set_counter(scope, scope_id, 'customers', querysets['customers'].count())
+    set_counter(scope, scope_id, 'active_projects', querysets['projects'].filter(is_active=True).count())
+
+
+def recount_customer_memberships(customer_id):
+    """Refresh membership counters touched by a bulk update of a customer's projects."""
+    recount_membership(GLOBAL, 0)
+    recount_membership(CUSTOMER, customer_id)
+    provider_ids = Project.objects.filter(customer=customer_id).values_list('providers', flat=True).distinct()
+    for provider_id in provider_ids:
+        if provider_id is not None:
+            recount_membership(PROVIDER, provider_id)
+
+
+def recount_logs(scope, scope_id=0):
+    """Rewrite the daily log counters of a scope from the logs table in three queries."""
+    daily = scope_querysets(scope, scope_id)['logs'].order_by().values('date').annotate(total=Count('id'))
+    DashboardCounter.objects.filter(scope=scope, scope_id=scope_id, name__startswith='logs:').delete()
+    DashboardCounter.objects.bulk_create(
+        [
+            DashboardCounter(scope=scope, scope_id=scope_id, name=logs_key(row['date']), value=row['total'])
+            for row in daily
+        ],
+        batch_size=500,
+        # A log saved concurrently may have recreated a row since the delete
+        update_conflicts=True, unique_fields=['scope', 'scope_id', 'name'], update_fields=['value'],
+    )
+
+
+def recount_scope(scope, scope_id=0):
+    """Recompute every counter of a scope from the source tables."""
+    querysets = scope_querysets(scope, scope_id)
+    recount_membership(scope, scope_id)
+    set_counter(scope, scope_id, 'reports', querysets['reports'].count())
+    recount_logs(scope, scope_id)
+
+
+def rebuild_counters():
+    """
+    Recompute every dashboard counter from the source tables. Returns the
+    number of customer and provider scopes rebuilt.
+    """
+    with transaction.atomic():
+        # Scopes of deleted customers and providers are dropped entirely
+        DashboardCounter.objects.filter(scope=CUSTOMER).exclude(
+            scope_id__in=Customer.objects.values('id')
+        ).delete()
+        DashboardCounter.objects.filter(scope=PROVIDER).exclude(
+            scope_id__in=CustomUser.objects.filter(role='provider').values('id')
+        ).delete()
+
+        recount_scope(GLOBAL)
+        customer_ids = list(Customer.objects.values_list('id', flat=True))
+        for customer_id in customer_ids:
+            recount_scope(CUSTOMER, customer_id)
+        provider_ids = list(CustomUser.objects.filter(role='provider').values_list('id', flat=True))
+        for provider_id in provider_ids:
+            recount_scope(PROVIDER, provider_id)
+    return len(customer_ids), len(provider_ids)
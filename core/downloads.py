@@ -0,0 +1,118 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe, content_disposition_header
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def serve_file(request, field_file, filename=None, content_type=None):
+    """
+    Send a stored FileField to the client after permissions were checked.
+
+    With settings.USE_X_ACCEL_REDIRECT the transfer is handed to nginx, which
+    serves the bytes from its internal location. Otherwise the file is
+    streamed from Python with ETag and single-range (Range/If-Range) support
+    so interrupted downloads can resume.
+    """
+    filename = filename or os.path.basename(field_file.name)
+    content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    if getattr(settings, 'USE_X_ACCEL_REDIRECT', False):
+        prefix = getattr(settings, 'X_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = prefix + quote(field_file.name)
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+        return response
+
+    path = field_file.path
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{int(stat.st_mtime):x}-{size:x}"'
+    last_modified = http_date(stat.st_mtime)
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    byte_range = _requested_range(request, size, etag, stat.st_mtime)
+    if byte_range == 'invalid':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(path, start, end - start + 1),
+            status=206,
+            content_type=content_type
+        )
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+    else:
+        response = FileResponse(open(path, 'rb'), as_attachment=True, filename=filename, content_type=content_type)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    return response
+
+
+def _requested_range(request, size, etag, mtime):
+    """Return (start, end) for a satisfiable single range, 'invalid', or None for the full file."""
+    header = request.META.get('HTTP_RANGE', '').strip()
+    if not header:
+        return None
+
+    # A stale If-Range means the client's partial copy is outdated: send everything
+    if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+    if if_range:
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            if if_range != etag:
+                return None
+        else:
+            since = parse_http_date_safe(if_range)
+            if since is None or int(mtime) > since:
+                return None
+
+    match = RANGE_RE.match(header)
+    if not match:
+        # Multiple or malformed ranges: ignore the header as RFC 9110 allows
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes. An empty file has no bytes to send,
+        # so every range of it is unsatisfiable (RFC 9110, section 14.1.1)
+        length = int(last)
+        if length == 0 or size == 0:
+            return 'invalid'
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return 'invalid'
+    return start, min(end, size - 1)
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
@@ -0,0 +1,197 @@
+import io
+import os
+import time
+import zipfile
+
+from django.conf import settings
+from django.utils.text import get_valid_filename
+
+from .models import ReportAttachment, ReportRenderJob
+from .pdf_cache import get_cached_pdf, report_fingerprint, store_pdf
+from .render_pool import RenderPool, render_in_child
+
+READ_SIZE = 64 * 1024
+
+
+class ZipStream:
+    """
+    Write-only file object for zipfile. It has tell() but no seek(), so
+    zipfile writes each entry with a trailing data descriptor, and the bytes
+    written so far can be taken out with pop() and sent while the archive is
+    still being built.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def get_export_render_wait():
+    return getattr(settings, 'REPORT_EXPORT_RENDER_WAIT', 60)
+
+
+def report_pdf_source(report):
+    """
+    Return where the report's PDF for its current content is: the version's
+    FieldFile, a path in the PDF cache, or None if it still has to be rendered.
+    Only reads, so it is safe on GET requests.
+    """
+    fingerprint = report_fingerprint(report)
+    version = report.find_current_version()
+    if version is not None and version.has_pdf_for(fingerprint):
+        return version.pdf_file
+    return get_cached_pdf(fingerprint)
+
+
+def open_pdf_source(source):
+    if source is None:
+        return None
+    try:
+        if isinstance(source, str):
+            return open(source, 'rb')
+        return source.open('rb')
+    except FileNotFoundError:  # Evicted between lookup and open
+        return None
+
+
+def open_report_pdf(report):
+    """Return an open file with the report's up-to-date PDF, or None."""
+    return open_pdf_source(report_pdf_source(report))
+
+
+def report_folder(report):
+    project = get_valid_filename(report.project.name) or f'project_{report.project_id}'
+    title = get_valid_filename(report.title) or 'report'
+    return f'{project}/{title}_{report.pk}'
+
+
+class ReportArchive:
+    """
+    Stream a ZIP of report PDFs and their attachment files. Nothing is held
+    in memory beyond one read buffer: every entry is copied in READ_SIZE
+    pieces and the archive bytes are yielded as they are produced.
+
+    Reports without an up-to-date PDF are rendered in parallel in a
+    RenderPool while the ready ones stream, for at most
+    REPORT_EXPORT_RENDER_WAIT seconds. Renders still unfinished then are
+    handed to the render worker and listed in errors.txt, so exporting
+    again later includes them.
+    """
+
+    def __init__(self, reports, user=None, base_url=''):
+        self.reports = list(reports)
+        self.user = user
+        self.base_url = base_url
+        self.stream = ZipStream()
+        self.archive = zipfile.ZipFile(self.stream, 'w', zipfile.ZIP_STORED)
+        self.errors = []
+
+    def __iter__(self):
+        missing = []
+        for report in self.reports:
+            source = report_pdf_source(report)
+            if source is None:
+                missing.append(report)
+            else:
+                yield from self.write_pdf(report, open_pdf_source(source), 'the cached PDF was removed, export again')
+            yield from self.write_attachments(report)
+
+        unfinished = yield from self.render_missing(missing)
+        for report in unfinished:
+            ReportRenderJob.enqueue(report, user=self.user, base_url=self.base_url)
+            self.errors.append(
+                f'{report_folder(report)}.pdf: not rendered in time, it has been queued; export again in a few minutes'
+            )
+
+        if self.errors:
+            self.archive.writestr('errors.txt', '\n'.join(self.errors) + '\n')
+        self.archive.close()
+        yield self.stream.pop()
+
+    def render_missing(self, reports):
+        """
+        Render reports in a RenderPool and write each PDF as it finishes.
+        Returns the reports that did not finish within the wait.
+        """
+        wait = get_export_render_wait()
+        processes = min(len(reports), settings.PDF_RENDER_PROCESSES)
+        if not reports or not wait or not processes:
+            return reports
+
+        deadline = time.monotonic() + wait
+        waiting = list(reports)
+        fingerprints = {}
+        pool = RenderPool(processes=processes, timeout=wait)
+        try:
+            while (waiting or pool.in_flight()) and time.monotonic() < deadline:
+                while waiting and pool.has_free_slot():
+                    report = waiting.pop(0)
+                    fingerprints[report.pk] = report_fingerprint(report)
+                    pool.submit(report, render_in_child, report.pk, self.base_url)
+
+                for report, pdf, error in pool.collect():
+                    if error:
+                        self.errors.append(f'{report_folder(report)}.pdf: {error}')
+                        continue
+                    # Cached for the next export unless the report changed meanwhile
+                    if report_fingerprint(report) == fingerprints[report.pk]:
+                        store_pdf(fingerprints[report.pk], pdf)
+                    yield from self.write_pdf(report, io.BytesIO(pdf), '')
+
+                if pool.in_flight():
+                    time.sleep(0.1)
+            return waiting + [slot.job for slot in pool.slots if slot.busy]
+        finally:
+            pool.close()
+
+    def write_entry(self, name, file):
+        with file, self.archive.open(name, 'w', force_zip64=True) as entry:
+            for data in iter(lambda: file.read(READ_SIZE), b''):
+                entry.write(data)
+                chunk = self.stream.pop()
+                if chunk:
+                    yield chunk
+        chunk = self.stream.pop()
+        if chunk:
+            yield chunk
+
+    def write_pdf(self, report, pdf, error):
+        name = f'{report_folder(report)}.pdf'
+        if pdf is None:
+            self.errors.append(f'{name}: {error}')
+            return
+        yield from self.write_entry(name, pdf)
+
+    def write_attachments(self, report):
+        folder = report_folder(report)
+        used = set()
+        attachments = ReportAttachment.objects.filter(report_section__report=report).distinct().order_by('id')
+        for attachment in attachments:
+            ext = os.path.splitext(attachment.file.name)[1].lower()
+            base = get_valid_filename(attachment.title) or 'attachment'
+            name = f'{folder}/attachments/{base}{ext}'
+            if name in used:
+                name = f'{folder}/attachments/{base}_{attachment.pk}{ext}'
+            used.add(name)
+            try:
+                file = attachment.file.open('rb')
+            except (OSError, ValueError):
+                self.errors.append(f'{name}: file is missing')
+                continue
+            yield from self.write_entry(name, file)
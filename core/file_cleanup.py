@@ -0,0 +1,135 @@
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+
+from .images import derivative_names, forget_derivatives, source_base
+from .models import ImageDerivativeJob, PendingFileDeletion, StoredBlob
+from .storage import is_blob_name
+
+
+def schedule_file_deletion(name):
+    """Journal a stored file for deletion once the current transaction commits."""
+    if name:
+        PendingFileDeletion.objects.create(name=name)
+
+
+def file_fields():
+    """Yield (model, field name) for every file field of every installed model."""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                yield model, field.name
+
+
+def referenced_names(names=None):
+    """
+    Return the stored file names referenced by any model, limited to names
+    when given.
+    """
+    referenced = set()
+    for model, field in file_fields():
+        rows = model._base_manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+        if names is not None:
+            rows = rows.filter(**{f'{field}__in': names})
+        referenced.update(rows.values_list(field, flat=True).iterator(chunk_size=2000))
+    return referenced
+
+
+def drain_file_deletions(batch_size=500, max_attempts=5):
+    """
+    Delete one batch of journaled files and return (deleted, kept): the
+    number of files deleted, and of entries cleared without deleting because
+    the file is in use again (e.g. re-uploaded under the same name). Failures
+    are retried up to max_attempts times and count as neither.
+    """
+    entries = list(PendingFileDeletion.objects.filter(attempts__lt=max_attempts)[:batch_size])
+    if not entries:
+        return 0, 0
+
+    still_used = referenced_names([entry.name for entry in entries])
+    done = []
+    failed = []
+    removed = []
+    for entry in entries:
+        if entry.name not in still_used:
+            try:
+                if delete_unreferenced(entry):
+                    removed.append(entry.name)
+            except OSError as e:
+                entry.attempts += 1
+                entry.last_error = str(e)
+                failed.append(entry)
+                continue
+        done.append(entry.pk)
+
+    PendingFileDeletion.objects.filter(pk__in=done).delete()
+    ImageDerivativeJob.objects.filter(source__in=removed).delete()
+    PendingFileDeletion.objects.bulk_update(failed, ['attempts', 'last_error'])
+    return len(removed), len(done) - len(removed)
+
+
+def stored_since(name, since):
+    """Whether a file was written or touched at or after since (a reused blob is touched)."""
+    try:
+        return default_storage.get_modified_time(name) >= since
+    except FileNotFoundError:
+        return False
+
+
+def delete_unreferenced(entry):
+    """
+    Delete a journaled file and its image variants unless it is in use again;
+    returns whether it was deleted.
+
+    A content-addressed blob is re-checked under a lock on its StoredBlob row,
+    the row acquire_blob increments: an upload of the same content that took
+    its reference first keeps the file, and one that is still being saved has
+    touched the file after the journal entry was written. The file and the row
+    are removed in the same transaction.
+    """
+    with transaction.atomic():
+        blob = None
+        if is_blob_name(entry.name):
+            blob = StoredBlob.objects.select_for_update().filter(name=entry.name).first()
+            if blob is not None and blob.ref_count > 0:
+                return False
+            if stored_since(entry.name, entry.created_at):
+                return False
+
+        default_storage.delete(entry.name)
+        for name in derivative_names(entry.name):
+            default_storage.delete(name)
+        forget_derivatives(entry.name)
+        if blob is not None:
+            blob.delete()
+    return True
+
+
+def find_orphan_files(min_age=86400):
+    """
+    Return (name, size) of files under MEDIA_ROOT that no database row
+    references, including image variants whose original is gone. Files newer
+    than min_age seconds are skipped so uploads in progress are never reported.
+    """
+    referenced = referenced_names()
+    referenced.update(PendingFileDeletion.objects.values_list('name', flat=True))
+    referenced_bases = {os.path.splitext(name)[0] for name in referenced}
+    cutoff = time.time() - min_age
+    orphans = []
+    for dirpath, dirnames, filenames in os.walk(settings.MEDIA_ROOT):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+            if name in referenced or source_base(name) in referenced_bases:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if stat.st_mtime < cutoff:
+                orphans.append((name, stat.st_size))
+    return orphans
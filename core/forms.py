@@ -1,3 +1,5 @@
+import os
+
 from django import forms
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
 from django.contrib.auth.models import User
@@ -7,6 +9,8 @@ from .models import (
     CustomUser, Customer, Project, SEOLog, ReportSection, 
     Media, SEOLogFile, Report, ReportAttachment, ReportSectionOrder
 )
+from .log_import import IMPORT_EXTENSIONS
+from .uploads import ACCEPTED_TYPES, check_upload, file_size_error, max_file_size
 
 # Custom File Upload Widgets and Fields
 class MultipleFileInput(forms.ClearableFileInput):
@@ -20,8 +24,11 @@ class MultipleFileField(forms.FileField):
     def clean(self, data, initial=None):
         single_file_clean = super().clean
         if isinstance(data, (list, tuple)):
+            for d in data:
+                check_upload(d)
             result = [single_file_clean(d, initial) for d in data]
         else:
+            check_upload(data)
             result = single_file_clean(data, initial)
         return result
 
@@ -130,7 +137,7 @@ class SEOLogForm(forms.ModelForm):
         required=False,
         widget=MultipleFileInput(attrs={
             'class': 'form-control',
-            'accept': 'image/*,.pdf,.doc,.docx,.xls,.xlsx'
+            'accept': 'image/*,video/*,audio/mp4,.pdf,.doc,.docx,.xls,.xlsx,.csv,.txt'
         })
     )
 
@@ -166,21 +173,16 @@ class SEOLogForm(forms.ModelForm):
         cleaned_data = super().clean()
         files = self.files.getlist('files')
         
-        # Validate file sizes and types
-        max_size = 50 * 1024 * 1024  # 50MB
-        allowed_types = [
-            'image/jpeg', 'image/png', 'image/gif',
-            'application/pdf',
-            'application/msword',
-            'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            'application/vnd.ms-excel',
-            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        ]
+        # Validate file sizes and types. The upload handler already rejected
+        # oversized files and set content_type from the file's magic bytes.
+        max_size = max_file_size()
         
         for file in files:
+            if getattr(file, 'upload_error', None):
+                continue  # Already reported by the files field
             if file.size > max_size:
-                self.add_error('files', f'File {file.name} is too large. Maximum size is 50MB.')
-            if file.content_type not in allowed_types:
+                self.add_error('files', file_size_error(file.name))
+            if file.content_type not in ACCEPTED_TYPES:
                 self.add_error('files', f'File {file.name} has an unsupported format.')
         
         return cleaned_data
@@ -217,6 +219,23 @@ class SEOLogForm(forms.ModelForm):
                     )
         return instance
 
+class SEOLogImportForm(forms.Form):
+    file = forms.FileField(
+        help_text='CSV or XLSX with a header row: project (name or ID), date (YYYY-MM-DD, '
+                  'defaults to today), work_type (key or label), description, and optionally '
+                  'customer for project names that several customers use',
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'})
+    )
+
+    def clean_file(self):
+        file = self.cleaned_data.get('file')
+        if file:
+            check_upload(file)
+            ext = os.path.splitext(file.name)[1].lower()
+            if ext not in IMPORT_EXTENSIONS:
+                raise forms.ValidationError("Upload a CSV or XLSX file")
+        return file
+
 class ReportForm(forms.ModelForm):
     title = forms.CharField(
         label='Report Title',
@@ -279,6 +298,9 @@ class ReportForm(forms.ModelForm):
         section_contents = self.data.getlist('section_content[]', [])
         section_priorities = self.data.getlist('section_priority[]', [])
         
+        for file in self.files.getlist('section_attachments[]'):
+            check_upload(file)
+        
         # Validate at least one section exists
         if not section_titles:
             raise ValidationError('At least one report section is required.')
@@ -307,7 +329,7 @@ class ReportSectionForm(forms.ModelForm):
         widget=MultipleFileInput(
             attrs={
                 'class': 'form-control',
-                'accept': 'image/*,.pdf,.doc,.docx,.xls,.xlsx'
+                'accept': 'image/*,video/*,audio/mp4,.pdf,.doc,.docx,.xls,.xlsx,.csv,.txt'
             }
         )
     )
@@ -381,9 +403,11 @@ class ReportAttachmentForm(forms.ModelForm):
     def clean_file(self):
         file = self.cleaned_data.get('file')
         if file:
-            # Check file size (max 50MB)
-            if file.size > 52428800:
-                raise forms.ValidationError("File size must be under 50MB")
+            check_upload(file)
+            
+            # Check file size
+            if file.size > max_file_size():
+                raise forms.ValidationError(file_size_error(file.name))
             
             # Check file type
             allowed_types = ['pdf', 'doc', 'docx', 'xls', 'xlsx', 'png', 'jpg', 'jpeg', 'gif']
@@ -0,0 +1,113 @@
+import os
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+DERIVATIVE_PREFIX = 'derivatives'
+
+# variant: (longest side in pixels, format, quality)
+DEFAULT_VARIANTS = {
+    'thumb': (320, 'WEBP', 80),
+    'web': (1280, 'WEBP', 82),
+    'print': (2000, 'JPEG', 85),
+}
+EXTENSIONS = {'WEBP': '.webp', 'JPEG': '.jpg', 'PNG': '.png'}
+
+# Variant names this process has found in storage, with when they were found,
+# so templates stat each variant about once per READY_TTL rather than on every
+# render. Another process may delete a variant with its source, so entries
+# expire; deletes made by this process drop them straight away.
+READY_CACHE_SIZE = 10000
+READY_TTL = 300
+_ready = OrderedDict()
+
+
+def get_variants():
+    return getattr(settings, 'IMAGE_DERIVATIVES', DEFAULT_VARIANTS)
+
+
+def derivative_name(source, variant):
+    """derivatives/<variant>/<source without extension>.<variant format>"""
+    size, fmt, quality = get_variants()[variant]
+    return f'{DERIVATIVE_PREFIX}/{variant}/{os.path.splitext(source)[0]}{EXTENSIONS[fmt]}'
+
+
+def derivative_names(source):
+    return [derivative_name(source, variant) for variant in get_variants()]
+
+
+def derivative_exists(name, storage=default_storage):
+    """Whether a variant has been generated, checking storage at most once per READY_TTL."""
+    found_at = _ready.get(name)
+    if found_at is not None and time.monotonic() - found_at < READY_TTL:
+        return True
+    if not storage.exists(name):
+        _ready.pop(name, None)
+        return False
+    _ready[name] = time.monotonic()
+    _ready.move_to_end(name)
+    while len(_ready) > READY_CACHE_SIZE:
+        _ready.popitem(last=False)
+    return True
+
+
+def forget_derivatives(source):
+    """Drop the variants of a deleted source from this process's cache."""
+    for name in derivative_names(source):
+        _ready.pop(name, None)
+
+
+def source_base(name):
+    """Return the source name (without extension) a derivative was made from, or None."""
+    parts = name.split('/', 2)
+    if len(parts) < 3 or parts[0] != DERIVATIVE_PREFIX:
+        return None
+    return os.path.splitext(parts[2])[0]
+
+
+def _prepare(image, fmt):
+    if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+        # JPEG has no alpha channel; flatten transparent screenshots onto white
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode not in ('RGB', 'RGBA', 'L'):
+        return image.convert('RGBA')
+    return image
+
+
+def generate_derivatives(source, storage=default_storage):
+    """
+    Write the missing thumb/web/print variants of a stored image. Variants
+    are named after the source, so files shared through the content-addressed
+    store are only processed once. Returns the names written.
+    """
+    written = []
+    missing = [
+        (variant, spec) for variant, spec in get_variants().items()
+        if not storage.exists(derivative_name(source, variant))
+    ]
+    if not missing:
+        return written
+
+    with storage.open(source, 'rb') as f:
+        image = Image.open(f)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+
+    for variant, (size, fmt, quality) in missing:
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        resized = _prepare(resized, fmt)
+        buffer = BytesIO()
+        resized.save(buffer, fmt, quality=quality, optimize=True)
+        name = derivative_name(source, variant)
+        storage.save(name, ContentFile(buffer.getvalue()))
+        written.append(name)
+    return written
@@ -0,0 +1,76 @@
+import csv
+import tempfile
+
+from .log_import import COLUMNS, FORMULA_PREFIXES
+from .models import SEOLog
+
+# The import columns first, so an exported file can be imported again
+EXPORT_COLUMNS = COLUMNS + ['customer', 'created_by', 'word_count']
+EXPORT_FIELDS = [
+    'project__name', 'date', 'work_type', 'description',
+    'project__customer__name', 'created_by__username', 'word_count',
+]
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+
+def cell(value):
+    # The quote stops spreadsheet programs running the cell as a formula;
+    # the import strips it again
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def export_rows(logs):
+    """
+    Yield one list of cell values per log. Rows are read as tuples in chunks
+    of EXPORT_CHUNK_SIZE through a server-side cursor where the database has
+    one, so memory use does not grow with the number of logs. The description
+    is the sanitized HTML, so importing the file again keeps its formatting.
+    """
+    work_types = dict(SEOLog.WORK_TYPE_CHOICES)
+    for row in logs.values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        project, date, work_type, description, customer, created_by, word_count = row
+        yield [cell(value) for value in (
+            project, date, work_types.get(work_type, work_type), description, customer, created_by, word_count
+        )]
+
+
+class Echo:
+    """File-like object whose write() returns the line for the response to send."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(logs):
+    """Yield the CSV export line by line."""
+    writer = csv.writer(Echo())
+    # The byte order mark makes Excel open the file as UTF-8
+    yield '\ufeff' + writer.writerow(EXPORT_COLUMNS)
+    for row in export_rows(logs):
+        yield writer.writerow(row)
+
+
+def write_xlsx(logs):
+    """
+    Write the export into a temporary XLSX file and return it, rewound.
+    openpyxl's write-only mode streams each row to disk as it is appended, so
+    memory stays flat however many rows there are.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('SEO Logs')
+    sheet.append(EXPORT_COLUMNS)
+    for row in export_rows(logs):
+        sheet.append(row)
+
+    file = tempfile.TemporaryFile()
+    workbook.save(file)
+    file.seek(0)
+    return file
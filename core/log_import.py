@@ -0,0 +1,218 @@
+import codecs
+import csv
+import os
+from collections import Counter
+from datetime import date, datetime
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .counters import increment, log_counter_keys
+from .models import Project, SEOLog
+from .search import index_logs
+
+COLUMNS = ['project', 'date', 'work_type', 'description']
+# Optional: tells apart projects of different customers that share a name
+IMPORT_COLUMNS = COLUMNS + ['customer']
+REQUIRED_COLUMNS = ['project', 'work_type']
+IMPORT_EXTENSIONS = ['.csv', '.xlsx']
+
+# Spreadsheet programs run cells starting with these as formulas, so the
+# export prefixes such cells with a quote
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class LogImportError(Exception):
+    """The file as a whole cannot be imported (unknown format, missing columns)."""
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []  # (row number, message)
+
+    def add_error(self, row, message):
+        self.errors.append((row, message))
+
+
+def importable_projects(user):
+    """The projects a user may add logs to, the same ones SEOLogForm offers."""
+    if user.role == 'admin':
+        return Project.objects.all()
+    if user.role == 'provider':
+        return Project.objects.filter(providers=user)
+    return Project.objects.none()
+
+
+def read_csv(file):
+    # utf-8-sig drops the byte order mark Excel puts in front of CSV exports
+    return csv.reader(codecs.iterdecode(file, 'utf-8-sig'))
+
+
+def read_xlsx(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise LogImportError('XLSX import needs openpyxl installed; upload a CSV file instead')
+    try:
+        # read_only streams the sheet instead of building it in memory
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except Exception as e:
+        raise LogImportError(f'Not a valid XLSX file: {e}')
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_rows(file, file_name):
+    """
+    Yield (row number, {column: value}) for every non-blank row of a CSV or
+    XLSX file opened in binary mode. The first row names the columns.
+    """
+    ext = os.path.splitext(file_name)[1].lower()
+    if ext == '.csv':
+        rows = read_csv(file)
+    elif ext == '.xlsx':
+        rows = read_xlsx(file)
+    else:
+        raise LogImportError(f'Unsupported file type {ext or file_name}; use CSV or XLSX')
+
+    try:
+        header = next(rows, None)
+        if header is None:
+            raise LogImportError('The file is empty')
+        header = [str(name or '').strip().lower().replace(' ', '_') for name in header]
+        missing = [name for name in REQUIRED_COLUMNS if name not in header]
+        if missing:
+            raise LogImportError(f'Missing column(s): {", ".join(missing)}')
+
+        for number, row in enumerate(rows, start=2):
+            values = {name: value for name, value in zip(header, row) if name in IMPORT_COLUMNS}
+            if any(value not in (None, '') for value in values.values()):
+                yield number, values
+    except UnicodeDecodeError:
+        raise LogImportError('The CSV file is not UTF-8 encoded')
+    except csv.Error as e:
+        raise LogImportError(f'Invalid CSV file: {e}')
+
+
+class RowValidator:
+    """Turns one imported row into an unsaved SEOLog, or raises ValidationError."""
+
+    def __init__(self, user):
+        self.user = user
+        self.projects_by_id = {}
+        # Several customers can have a project of the same name, so keep them all
+        self.projects_by_name = {}
+        for project in importable_projects(user).select_related('customer'):
+            self.projects_by_id[str(project.pk)] = project
+            self.projects_by_name.setdefault(project.name.strip().lower(), []).append(project)
+        self.work_types = {}
+        for key, label in SEOLog.WORK_TYPE_CHOICES:
+            self.work_types[key] = key
+            self.work_types[label.lower()] = key
+        self.date_field = forms.DateField()
+
+    def text(self, value):
+        if value is None:
+            return ''
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        value = str(value)
+        if value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+            value = value[1:]
+        return value.strip()
+
+    def project(self, value, customer=None):
+        value = self.text(value)
+        if not value:
+            raise ValidationError('Project is required')
+        if value in self.projects_by_id:
+            return self.projects_by_id[value]
+
+        projects = self.projects_by_name.get(value.lower(), [])
+        customer = self.text(customer).lower()
+        if customer:
+            projects = [project for project in projects if project.customer.name.strip().lower() == customer]
+        if not projects:
+            raise ValidationError(f'Unknown project "{value}" or you are not assigned to it')
+        if len(projects) > 1:
+            raise ValidationError(
+                f'Several customers have a project named "{value}"; add a customer column or use the project id'
+            )
+        return projects[0]
+
+    def work_type(self, value):
+        value = self.text(value)
+        work_type = self.work_types.get(value.lower())
+        if work_type is None:
+            raise ValidationError(f'Unknown work type "{value}"')
+        return work_type
+
+    def date(self, value):
+        # XLSX cells come back as datetime objects, CSV cells as text
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        value = self.text(value)
+        if not value:
+            return timezone.now().date()
+        try:
+            return self.date_field.clean(value)
+        except ValidationError:
+            raise ValidationError(f'Invalid date "{value}"')
+
+    def build(self, values):
+        return SEOLog(
+            project=self.project(values.get('project'), values.get('customer')),
+            date=self.date(values.get('date')),
+            work_type=self.work_type(values.get('work_type')),
+            description=self.text(values.get('description')),
+            created_by=self.user,
+        )
+
+
+def save_batch(logs):
+    """
+    bulk_create skips save() and the post_save signals, so sanitize each log
+    here and update the dashboard counters and search index for the batch.
+    """
+    for log in logs:
+        log.sanitize()
+    created = SEOLog.objects.bulk_create(logs)
+
+    deltas = Counter()
+    for log in created:
+        deltas.update(log_counter_keys(log.project.customer_id, log.created_by_id, log.date))
+    for (scope, scope_id, name), delta in deltas.items():
+        increment(scope, scope_id, name, delta)
+    index_logs(created)
+    return len(created)
+
+
+def import_seo_logs(file, file_name, user, batch_size=500, dry_run=False):
+    """
+    Import SEO logs from a CSV or XLSX file, batch_size rows per INSERT. Rows
+    that fail validation are reported in the result and skipped; the valid
+    rows are all written in one transaction, or none with dry_run.
+    """
+    result = ImportResult()
+    validator = RowValidator(user)
+    batch = []
+    with transaction.atomic():
+        for number, values in read_rows(file, file_name):
+            try:
+                batch.append(validator.build(values))
+            except ValidationError as e:
+                result.add_error(number, ' '.join(e.messages))
+                continue
+            if len(batch) >= batch_size:
+                result.created += len(batch) if dry_run else save_batch(batch)
+                batch = []
+        if batch:
+            result.created += len(batch) if dry_run else save_batch(batch)
+    return result
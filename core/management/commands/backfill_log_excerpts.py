@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from core.models import SEOLog
+from core.search import index_logs
+
+
+class Command(BaseCommand):
+    help = 'Fill the plain-text excerpt and word count of SEO logs saved before those columns existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Recompute every log, not only those without an excerpt'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        logs = SEOLog.objects.only('id', 'description', *SEOLog.PLAIN_TEXT_FIELDS).order_by('id')
+        if not options['all']:
+            # Logs with an empty description legitimately have no excerpt
+            logs = logs.filter(excerpt='').exclude(description='')
+
+        total = 0
+        batch = []
+        for log in logs.iterator(chunk_size=batch_size):
+            old_search_text = log.search_text
+            log.set_plain_text()
+            log.search_text_changed = log.search_text != old_search_text
+            batch.append(log)
+            if len(batch) >= batch_size:
+                total += self.flush(batch)
+                batch = []
+        if batch:
+            total += self.flush(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Updated {total} SEO logs'))
+
+    def flush(self, batch):
+        SEOLog.objects.bulk_update(batch, SEOLog.PLAIN_TEXT_FIELDS)
+        # Only logs whose search text was missing or stale need reindexing
+        index_logs([log for log in batch if log.search_text_changed])
+        return len(batch)
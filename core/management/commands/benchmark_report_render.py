@@ -0,0 +1,53 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Report
+from core.pdf import render_report_html, render_report_pdf
+
+
+class Command(BaseCommand):
+    help = 'Time report PDF renders with and without the shared fonts, stylesheet and media cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('report_id', type=int, help='Report to render')
+        parser.add_argument('--runs', type=int, default=5, help='Renders per mode')
+        parser.add_argument(
+            '--base-url', default='http://localhost:8000/',
+            help='Base URL the report images are resolved against'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = Report.objects.get(pk=options['report_id'])
+        except Report.DoesNotExist:
+            raise CommandError(f'Report {options["report_id"]} does not exist')
+
+        base_url = options['base_url']
+        html_times = self.time_runs(options['runs'], lambda: render_report_html(report, base_url))
+        # The first shared render builds the caches; later ones reuse them
+        cold = self.time_runs(options['runs'], lambda: render_report_pdf(report, base_url, shared=False))
+        first = self.time_runs(1, lambda: render_report_pdf(report, base_url))
+        warm = self.time_runs(options['runs'], lambda: render_report_pdf(report, base_url))
+
+        self.stdout.write(f'Report {report.pk} over {options["runs"]} runs:')
+        self.write_times('HTML template', html_times)
+        self.write_times('PDF, no caches', cold)
+        self.write_times('PDF, first shared', first)
+        self.write_times('PDF, shared', warm)
+        saved = statistics.median(cold) - statistics.median(warm)
+        self.stdout.write(self.style.SUCCESS(f'Shared caches save {saved * 1000:.0f}ms per render'))
+
+    def time_runs(self, runs, render):
+        times = []
+        for run in range(runs):
+            started = time.perf_counter()
+            render()
+            times.append(time.perf_counter() - started)
+        return times
+
+    def write_times(self, label, times):
+        self.stdout.write(
+            f'  {label + ":":<20} median {statistics.median(times) * 1000:.0f}ms, min {min(times) * 1000:.0f}ms'
+        )
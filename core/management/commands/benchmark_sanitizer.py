@@ -0,0 +1,67 @@
+import random
+import statistics
+import timeit
+
+import bleach
+from django.core.management.base import BaseCommand
+
+from core.sanitize import ALLOWED_ATTRIBUTES, ALLOWED_TAGS, content_hash, sanitize_description
+
+WORDS = (
+    'audit crawl canonical redirect sitemap schema backlink anchor keyword intent '
+    'meta title description heading internal external index robots page speed'
+).split()
+
+
+def sample_descriptions(count, seed=1):
+    """
+    Descriptions shaped like the ones providers paste: a few paragraphs, a
+    task list, and a table of URLs with notes (the case linkify is slow on).
+    """
+    rng = random.Random(seed)
+    descriptions = []
+    for i in range(count):
+        paragraphs = ''.join(
+            f'<p>{" ".join(rng.choices(WORDS, k=40))}</p>' for p in range(rng.randint(2, 5))
+        )
+        tasks = ''.join(f'<li>{" ".join(rng.choices(WORDS, k=8))}</li>' for t in range(rng.randint(3, 8)))
+        rows = ''.join(
+            f'<tr><td>https://www.example{i}.com/{rng.choice(WORDS)}/{n}</td>'
+            f'<td>{" ".join(rng.choices(WORDS, k=5))}</td></tr>'
+            for n in range(rng.randint(20, 150))
+        )
+        descriptions.append(f'{paragraphs}<ul>{tasks}</ul><table><tbody>{rows}</tbody></table>')
+    return descriptions
+
+
+def sanitize_per_call(html):
+    # What SEOLog.save did before: build the allowlist and parsers on every call
+    cleaned = bleach.clean(html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
+    return bleach.linkify(cleaned)
+
+
+class Command(BaseCommand):
+    help = 'Time SEO log description sanitizing: per-call bleach, shared Cleaner/Linker, and the unchanged-hash skip'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=50, help='Number of sample descriptions')
+        parser.add_argument('--repeat', type=int, default=5, help='Timing rounds')
+
+    def handle(self, *args, **options):
+        descriptions = sample_descriptions(options['count'])
+        sanitized = [sanitize_description(html) for html in descriptions]
+        hashes = [content_hash(html) for html in sanitized]
+        size = sum(len(html) for html in descriptions) / len(descriptions)
+
+        cases = [
+            ('bleach.clean + linkify per call', lambda: [sanitize_per_call(html) for html in descriptions]),
+            ('shared Cleaner + Linker', lambda: [sanitize_description(html) for html in descriptions]),
+            ('unchanged, hash check only', lambda: [
+                content_hash(html) == digest for html, digest in zip(sanitized, hashes)
+            ]),
+        ]
+        self.stdout.write(f'{len(descriptions)} descriptions, {size / 1024:.1f}KB on average:')
+        for label, run in cases:
+            times = timeit.repeat(run, number=1, repeat=options['repeat'])
+            per_item = statistics.median(times) / len(descriptions) * 1000
+            self.stdout.write(f'  {label + ":":<34} {per_item:.3f}ms per description')
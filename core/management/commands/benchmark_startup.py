@@ -0,0 +1,73 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter: boot Django the way a gunicorn worker does,
+# load every URL module (and so every view module), then report the cost
+BOOT_SCRIPT = '''
+import json, resource, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+booted = time.perf_counter()
+error = ''
+for module in sys.argv[1:]:
+    try:
+        __import__(module)
+    except Exception as e:
+        error = f'{module}: {e}'
+finished = time.perf_counter()
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform != 'darwin':
+    peak *= 1024
+print(json.dumps({
+    'boot': booted - started,
+    'total': finished - started,
+    'rss': peak,
+    'weasyprint': 'weasyprint' in sys.modules,
+    'error': error,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measure the import time and memory of a freshly booted web worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Number of fresh interpreters to boot')
+        parser.add_argument(
+            '--import', dest='modules', action='append', default=[],
+            help='Also import this module after boot, e.g. weasyprint to see what a render costs (repeatable)'
+        )
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        results = []
+        for run in range(options['runs']):
+            output = subprocess.run(
+                [sys.executable, '-c', BOOT_SCRIPT, *options['modules']],
+                env=env, cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+        boot = [r['boot'] for r in results]
+        total = [r['total'] for r in results]
+        rss = [r['rss'] / (1024 * 1024) for r in results]
+        self.stdout.write(f'Worker boot over {len(results)} runs:')
+        self.stdout.write(f'  Django + URLs:   median {statistics.median(boot) * 1000:.0f}ms, min {min(boot) * 1000:.0f}ms')
+        if options['modules']:
+            self.stdout.write(
+                f'  With {", ".join(options["modules"])}: '
+                f'median {statistics.median(total) * 1000:.0f}ms, min {min(total) * 1000:.0f}ms'
+            )
+        self.stdout.write(f'  Peak RSS:        median {statistics.median(rss):.1f}MB, max {max(rss):.1f}MB')
+        self.stdout.write(f'  WeasyPrint loaded: {"yes" if results[-1]["weasyprint"] else "no"}')
+        if results[-1]['error']:
+            self.stderr.write(f'Import failed: {results[-1]["error"]}')
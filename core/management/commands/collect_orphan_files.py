@@ -0,0 +1,28 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.file_cleanup import find_orphan_files
+
+
+class Command(BaseCommand):
+    help = 'Delete files under MEDIA_ROOT that no database row references'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='List orphaned files without deleting them')
+        parser.add_argument(
+            '--min-age', type=int, default=24,
+            help='Only collect files older than this many hours'
+        )
+
+    def handle(self, *args, **options):
+        orphans = find_orphan_files(min_age=options['min_age'] * 3600)
+        total = 0
+        for name, size in orphans:
+            total += size
+            if options['dry_run']:
+                self.stdout.write(f'{name} ({size} bytes)')
+            else:
+                default_storage.delete(name)
+
+        action = 'Found' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{action} {len(orphans)} orphaned files ({total} bytes)'))
@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.chunked_uploads import expire_stale_uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete resumable uploads that were abandoned before they finished'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=48, help='Hours since the last received chunk')
+
+    def handle(self, *args, **options):
+        count = expire_stale_uploads(timedelta(hours=options['max_age']))
+        self.stdout.write(self.style.SUCCESS(f'Removed {count} abandoned uploads'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.log_import import LogImportError, import_seo_logs
+from core.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Import SEO logs from a CSV or XLSX file with project, date, work_type and description columns, '
+        'and optionally customer'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file to import')
+        parser.add_argument(
+            '--user', required=True,
+            help='Username the logs are created by; only their projects can be imported into'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file without saving')
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(username=options['user'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f'User {options["user"]} does not exist')
+
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_seo_logs(
+                    file, options['path'], user,
+                    batch_size=options['batch_size'], dry_run=options['dry_run']
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+        except LogImportError as e:
+            raise CommandError(str(e))
+
+        for row, message in result.errors:
+            self.stderr.write(f'Row {row}: {message}')
+        verb = 'Would import' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {result.created} SEO logs, skipped {len(result.errors)} rows'
+        ))
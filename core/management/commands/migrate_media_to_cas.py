@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.blobs import BLOB_FIELDS, acquire_blob, release_blob
+from core.storage import BLOB_PREFIX, blob_store
+
+
+class Command(BaseCommand):
+    help = (
+        'Move uploads from the flat media folder into the content-addressed store. '
+        'Safe to interrupt: converted rows are skipped when the command runs again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=0, help='Stop after converting this many files')
+
+    def handle(self, *args, **options):
+        converted = missing = 0
+        for model, field in BLOB_FIELDS:
+            pending = model.objects.exclude(**{f'{field}__startswith': f'{BLOB_PREFIX}/'}).exclude(**{field: ''})
+            last_pk = 0
+            while True:
+                batch = list(
+                    pending.filter(pk__gt=last_pk).order_by('pk').values_list('pk', field)[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                for pk, name in batch:
+                    last_pk = pk
+                    if not blob_store.exists(name):
+                        missing += 1
+                        self.stderr.write(f'{model.__name__} {pk}: {name} is missing')
+                        continue
+
+                    with blob_store.open(name) as f:
+                        blob_name = blob_store.save(name, f)
+                    with transaction.atomic():
+                        # Only switch rows nobody changed meanwhile
+                        updated = model.objects.filter(pk=pk, **{field: name}).update(**{field: blob_name})
+                        if updated:
+                            acquire_blob(blob_name, blob_store.size(blob_name))
+                            release_blob(name)
+                    converted += updated
+
+                    if options['limit'] and converted >= options['limit']:
+                        self.report(converted, missing)
+                        return
+        self.report(converted, missing)
+
+    def report(self, converted, missing):
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {converted} files into the content-addressed store; {missing} missing'
+        ))
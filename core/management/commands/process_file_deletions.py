@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.file_cleanup import drain_file_deletions
+
+
+class Command(BaseCommand):
+    help = 'Delete the files of deleted attachments in batches in the background'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the journal once and exit')
+        parser.add_argument('--sleep', type=float, default=10.0, help='Seconds to wait when the journal is empty')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        self.stdout.write('File deletion worker started')
+        while True:
+            deleted, kept = drain_file_deletions(options['batch_size'])
+            if deleted or kept:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Deleted {deleted} files, kept {kept} that are referenced again'
+                ))
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,54 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.images import generate_derivatives
+from core.models import ImageDerivativeJob, ReportAttachment, SEOLogFile
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnail, web and print variants of uploaded images in the background'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument(
+            '--stale-after', type=int, default=600,
+            help='Seconds after which a running job is considered abandoned and requeued'
+        )
+        parser.add_argument(
+            '--enqueue-existing', action='store_true',
+            help='Queue every image uploaded before the worker existed'
+        )
+
+    def handle(self, *args, **options):
+        if options['enqueue_existing']:
+            sources = set(SEOLogFile.objects.filter(file_type__startswith='image/').values_list('file', flat=True))
+            sources.update(ReportAttachment.objects.filter(file_type='image').values_list('file', flat=True))
+            for source in sources:
+                ImageDerivativeJob.enqueue(source)
+            self.stdout.write(f'Queued {len(sources)} images')
+
+        self.stdout.write('Image worker started')
+        while True:
+            ImageDerivativeJob.requeue_stale(timezone.now() - timedelta(seconds=options['stale_after']))
+
+            job = ImageDerivativeJob.claim_next()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            try:
+                written = generate_derivatives(job.source)
+            except Exception as e:
+                # PIL raises many types for broken files (OSError, ValueError,
+                # SyntaxError, DecompressionBombError...); none may leave the job running
+                job.mark_failed(str(e))
+                self.stderr.write(f'Failed to process {job.source}: {e}')
+                continue
+            job.mark_done()
+            self.stdout.write(self.style.SUCCESS(f'Wrote {len(written)} variants of {job.source}'))
@@ -0,0 +1,133 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import ReportRenderJob
+from core.pdf import process_render_job, read_cached_pdf, save_job_pdf, save_rendered_pdf
+from core.pdf_cache import report_fingerprint
+from core.render_pool import RenderPool, render_in_child
+
+
+# How long past the render timeout a running job must go unfinished before it
+# counts as abandoned by a crashed worker
+STALE_GRACE_SECONDS = 60
+# Used when renders have no timeout
+DEFAULT_STALE_AFTER = 600
+
+
+class Command(BaseCommand):
+    help = 'Render queued report PDFs in the background'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument(
+            '--stale-after', type=int, default=None,
+            help='Seconds after which a running job is considered abandoned and requeued '
+                 f'(default the render timeout plus {STALE_GRACE_SECONDS}s)'
+        )
+        parser.add_argument(
+            '--processes', type=int, default=None,
+            help='Render processes to run in parallel (default PDF_RENDER_PROCESSES; 0 renders in this process)'
+        )
+        parser.add_argument(
+            '--max-rss-mb', type=int, default=None,
+            help='Replace a render process once its peak memory passes this (default PDF_RENDER_MAX_RSS_MB; 0 for no cap)'
+        )
+        parser.add_argument(
+            '--timeout', type=int, default=None,
+            help='Kill renders running longer than this many seconds (default PDF_RENDER_TIMEOUT; 0 for no limit)'
+        )
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        if processes is None:
+            processes = settings.PDF_RENDER_PROCESSES
+        max_rss_mb = options['max_rss_mb']
+        if max_rss_mb is None:
+            max_rss_mb = settings.PDF_RENDER_MAX_RSS_MB
+        timeout = options['timeout']
+        if timeout is None:
+            timeout = settings.PDF_RENDER_TIMEOUT
+
+        # Another worker must not requeue a job that this one is still allowed to render
+        stale_after = options['stale_after']
+        if stale_after is None:
+            stale_after = timeout + STALE_GRACE_SECONDS if timeout else DEFAULT_STALE_AFTER
+        elif timeout and stale_after <= timeout:
+            raise CommandError(f'--stale-after must be longer than the render timeout ({timeout}s)')
+        options['stale_after'] = stale_after
+
+        self.stdout.write('Render worker started')
+        if processes == 0:
+            self.run_in_process(options)
+            return
+
+        pool = RenderPool(processes=processes, max_rss_mb=max_rss_mb, timeout=timeout)
+        try:
+            self.run_pool(pool, options)
+        finally:
+            pool.close()
+
+    def run_in_process(self, options):
+        while True:
+            ReportRenderJob.requeue_stale(timezone.now() - timedelta(seconds=options['stale_after']))
+
+            job = ReportRenderJob.claim_next()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            started = time.monotonic()
+            process_render_job(job)
+            self.report(job, time.monotonic() - started)
+
+    def run_pool(self, pool, options):
+        # Claim-time fingerprint and start time of each job in the pool
+        fingerprints = {}
+        while True:
+            ReportRenderJob.requeue_stale(
+                timezone.now() - timedelta(seconds=options['stale_after']), exclude=list(fingerprints)
+            )
+
+            for job, pdf, error in pool.collect():
+                fingerprint, started = fingerprints.pop(job.pk)
+                if error:
+                    job.mark_failed(error)
+                else:
+                    save_rendered_pdf(job, pdf, fingerprint)
+                self.report(job, time.monotonic() - started)
+
+            claimed = False
+            while pool.has_free_slot():
+                job = ReportRenderJob.claim_next()
+                if job is None:
+                    break
+                claimed = True
+                started = time.monotonic()
+                fingerprint = report_fingerprint(job.report)
+                pdf = read_cached_pdf(fingerprint)
+                if pdf is not None:
+                    save_job_pdf(job, pdf, fingerprint)
+                    self.report(job, time.monotonic() - started)
+                    continue
+                fingerprints[job.pk] = (fingerprint, started)
+                pool.submit(job, render_in_child, job.report_id, job.base_url)
+
+            if pool.in_flight():
+                time.sleep(0.1)
+            elif not claimed:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+
+    def report(self, job, elapsed):
+        if job.status == 'done':
+            self.stdout.write(self.style.SUCCESS(f'Rendered report {job.report_id} in {elapsed:.1f}s'))
+        else:
+            self.stderr.write(f'Failed to render report {job.report_id}: {job.error}')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute dashboard counters from the source tables to repair drift'
+
+    def handle(self, *args, **options):
+        customers, providers = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt counters for {customers} customers and {providers} providers'
+        ))
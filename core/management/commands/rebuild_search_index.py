@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import SEOLog
+from core.search import index_logs
+from core.utils import html_to_text
+
+
+class Command(BaseCommand):
+    help = 'Recompute the plain-text search column of SEO logs and refresh the full-text index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        logs = SEOLog.objects.only('id', 'description', 'search_text').order_by('id')
+        total = 0
+        batch = []
+        for log in logs.iterator(chunk_size=batch_size):
+            log.search_text = html_to_text(log.description)
+            batch.append(log)
+            if len(batch) >= batch_size:
+                total += self.flush(batch)
+                batch = []
+        if batch:
+            total += self.flush(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Reindexed {total} SEO logs'))
+
+    def flush(self, batch):
+        with transaction.atomic():
+            SEOLog.objects.bulk_update(batch, ['search_text'])
+            index_logs(batch)
+        return len(batch)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.storage_usage import reconcile_storage
+
+
+class Command(BaseCommand):
+    help = 'Recompute media storage usage totals from the files on disk'
+
+    def handle(self, *args, **options):
+        totals = reconcile_storage()
+        tracked_bytes, tracked_files = totals[('global', 0)]
+        disk_bytes, disk_files = totals[('disk', 0)]
+        self.stdout.write(self.style.SUCCESS(
+            f'Tracked {tracked_files} files ({tracked_bytes} bytes); '
+            f'media root holds {disk_files} files ({disk_bytes} bytes)'
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_report_render_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportversion',
+            name='pdf_fingerprint',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_reportversion_pdf_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('global', 'Global'), ('provider', 'Provider'), ('customer', 'Customer')], max_length=10)),
+                ('scope_id', models.PositiveIntegerField(default=0, help_text='Provider or customer id, 0 for the global scope')),
+                ('name', models.CharField(help_text="Counter key, e.g. 'reports' or 'logs:2025-01-31'", max_length=30)),
+                ('value', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Dashboard Counter',
+                'verbose_name_plural': 'Dashboard Counters',
+                'unique_together': {('scope', 'scope_id', 'name')},
+            },
+        ),
+    ]
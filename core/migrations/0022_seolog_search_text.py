@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+from core.utils import html_to_text
+
+
+def backfill_search_text(apps, schema_editor):
+    SEOLog = apps.get_model('core', 'SEOLog')
+    batch = []
+    for log in SEOLog.objects.only('id', 'description').iterator(chunk_size=500):
+        log.search_text = html_to_text(log.description)
+        batch.append(log)
+        if len(batch) >= 500:
+            SEOLog.objects.bulk_update(batch, ['search_text'])
+            batch = []
+    if batch:
+        SEOLog.objects.bulk_update(batch, ['search_text'])
+
+
+def has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_fulltext_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE core_seolog ADD FULLTEXT INDEX core_seolog_search_text_ft (search_text)')
+    elif connection.vendor == 'sqlite' and has_fts5(connection):
+        # Standalone FTS5 table keyed by log id; kept in sync by core.search.index_logs.
+        # Without FTS5 the table is not created and search falls back to icontains
+        schema_editor.execute('CREATE VIRTUAL TABLE core_seolog_fts USING fts5(search_text)')
+        schema_editor.execute('INSERT INTO core_seolog_fts (rowid, search_text) SELECT id, search_text FROM core_seolog')
+
+
+def drop_fulltext_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE core_seolog DROP INDEX core_seolog_search_text_ft')
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS core_seolog_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_storage_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seolog',
+            name='search_text',
+            field=models.TextField(blank=True, editable=False, help_text='Plain-text description used by full-text search'),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_seolog_search_text'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attachmentaccess',
+            index=models.Index(fields=['attachment', 'accessed_at'], name='access_attachment_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', 'created_at'], name='notification_user_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['project', 'created_at'], name='report_project_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['created_at'], name='report_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seolog',
+            index=models.Index(fields=['project', 'date', 'id'], name='seolog_project_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seolog',
+            index=models.Index(fields=['created_by', 'date', 'id'], name='seolog_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seolog',
+            index=models.Index(fields=['date', 'id'], name='seolog_date_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:27
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_pending_file_deletion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Stored Blob',
+                'verbose_name_plural': 'Stored Blobs',
+            },
+        ),
+        migrations.AlterField(
+            model_name='media',
+            name='file',
+            field=models.FileField(max_length=255, storage=core.storage.get_blob_storage, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='reportattachment',
+            name='file',
+            field=models.FileField(max_length=255, storage=core.storage.get_blob_storage, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='seologfile',
+            name='file',
+            field=models.FileField(max_length=255, storage=core.storage.get_blob_storage, upload_to=''),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seolog',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, help_text='Start of the plain-text description for lists', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='seolog',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
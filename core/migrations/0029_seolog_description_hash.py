@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_seolog_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seolog',
+            name='description_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
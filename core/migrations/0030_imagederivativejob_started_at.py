@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_seolog_description_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagederivativejob',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
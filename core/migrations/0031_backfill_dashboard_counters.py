@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def backfill_counters(apps, schema_editor):
+    # The counters are maintained by signals on the live models, so the
+    # backfill runs the same code as the rebuild_counters command. It sits
+    # after the latest schema change so those models match the tables.
+    from core.counters import rebuild_counters
+
+    rebuild_counters()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_imagederivativejob_started_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
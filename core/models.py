@@ -1,11 +1,15 @@
 from django.db import models
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.html import strip_tags
-import bleach
 import os
-from .utils import generate_unique_filename
+import uuid
+from datetime import timedelta
+from .storage import get_blob_storage
+from .sanitize import content_hash, sanitize_description
+from .utils import html_to_text, text_excerpt
 
 # Define CustomUser before Project
 class CustomUser(AbstractUser):
@@ -67,6 +71,10 @@ class SEOLog(models.Model):
     work_type = models.CharField(max_length=20, choices=WORK_TYPE_CHOICES, default='other')
     description = models.TextField(default='', blank=True)
     providers = models.ManyToManyField(CustomUser, related_name='assigned_logs', blank=True)
+    search_text = models.TextField(blank=True, editable=False, help_text="Plain-text description used by full-text search")
+    excerpt = models.CharField(max_length=200, blank=True, editable=False, help_text="Start of the plain-text description for lists")
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    description_hash = models.CharField(max_length=64, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True, null=True)
     updated_at = models.DateTimeField(auto_now=True, null=True)
 
@@ -77,33 +85,48 @@ class SEOLog(models.Model):
         ordering = ['-date']
         verbose_name = 'SEO Log'
         verbose_name_plural = 'SEO Logs'
+        # Log lists filter by project or author and page by (date, id)
+        indexes = [
+            models.Index(fields=['project', 'date', 'id'], name='seolog_project_date_idx'),
+            models.Index(fields=['created_by', 'date', 'id'], name='seolog_author_date_idx'),
+            models.Index(fields=['date', 'id'], name='seolog_date_idx'),
+        ]
+
+    # Columns derived from the description by set_plain_text()
+    PLAIN_TEXT_FIELDS = ['search_text', 'excerpt', 'word_count']
+
+    def set_plain_text(self):
+        """Derive the search text, list excerpt and word count from the description HTML."""
+        self.search_text = html_to_text(self.description)
+        self.excerpt = text_excerpt(self.search_text, self._meta.get_field('excerpt').max_length)
+        self.word_count = len(self.search_text.split())
+
+    def sanitize(self):
+        """
+        Sanitize the description and derive its plain-text columns. Returns
+        False without doing anything when the description is unchanged:
+        description_hash is the hash of the last sanitized description.
+        """
+        if content_hash(self.description) == self.description_hash:
+            return False
+        if self.description:
+            self.description = sanitize_description(self.description)
+        self.description_hash = content_hash(self.description)
+
+        # Keep the plain-text columns in sync with the description
+        self.set_plain_text()
+        return True
 
     def save(self, *args, **kwargs):
-        if self.description:
-            # Define allowed tags and attributes
-            allowed_tags = [
-                'p', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'strong', 'em', 'u',
-                'span', 'table', 'thead', 'tbody', 'tr', 'th', 'td', 'br'
-            ]
-            allowed_attrs = {
-                '*': ['class'],
-                'span': ['style'],
-                'p': ['style'],
-                'td': ['colspan', 'rowspan'],
-                'th': ['colspan', 'rowspan']
-            }
-            
-            # Clean the HTML content using bleach
-            cleaned_html = bleach.clean(
-                self.description,
-                tags=allowed_tags,
-                attributes=allowed_attrs,
-                strip=True
-            )
-            
-            # Linkify URLs in the content
-            self.description = bleach.linkify(cleaned_html)
-            
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.sanitize()
+        elif 'description' in update_fields:
+            # Write the derived columns along with the description
+            if self.sanitize():
+                kwargs['update_fields'] = set(update_fields) | {'description_hash', *self.PLAIN_TEXT_FIELDS}
+        # Otherwise the description is not written, so there is nothing to sanitize
+
         super().save(*args, **kwargs)
 
 class SEOLogFile(models.Model):
@@ -113,7 +136,7 @@ class SEOLogFile(models.Model):
     ]
 
     seo_log = models.ForeignKey(SEOLog, on_delete=models.CASCADE, related_name='files')
-    file = models.FileField(upload_to='')  # Store in main media folder
+    file = models.FileField(storage=get_blob_storage, max_length=255)  # Named by content hash
     work_type = models.CharField(max_length=10, choices=WORK_TYPE_CHOICES)
     file_name = models.CharField(max_length=255)
     file_type = models.CharField(max_length=100)
@@ -126,15 +149,8 @@ class SEOLogFile(models.Model):
     def save(self, *args, **kwargs):
         if not self.pk:  # Only on creation
             if self.file:
-                # Generate unique filename with seo prefix
-                original_filename = self.file.name
-                new_filename = generate_unique_filename(original_filename, prefix='seo')
-                
-                # Set the new filename
-                self.file.name = new_filename
-                
-                # Set file name
-                self.file_name = new_filename
+                # The stored name is the content hash, so keep the uploaded name for display
+                self.file_name = os.path.basename(self.file.name)
                 
                 # Get file type from extension
                 ext = os.path.splitext(self.file.name)[1].lower()[1:]  # Remove the dot
@@ -146,6 +162,8 @@ class SEOLogFile(models.Model):
                     self.file_type = 'application/msword'
                 elif ext in ['xls', 'xlsx']:
                     self.file_type = 'application/vnd.ms-excel'
+                elif ext in ['mp4', 'webm']:
+                    self.file_type = f'video/{ext}'
                 else:
                     self.file_type = 'application/octet-stream'
                 
@@ -181,6 +199,8 @@ class SEOLogFile(models.Model):
             return 'fas fa-file-image'
         elif self.file_type == 'application/pdf':
             return 'fas fa-file-pdf'
+        elif self.file_type.startswith('video/'):
+            return 'fas fa-file-video'
         elif 'spreadsheet' in self.file_type or 'excel' in self.file_type:
             return 'fas fa-file-excel'
         elif 'document' in self.file_type or 'word' in self.file_type:
@@ -212,7 +232,7 @@ class ReportAttachment(models.Model):
     report_section = models.ForeignKey(ReportSection, on_delete=models.CASCADE, related_name='attachments')
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
-    file = models.FileField(upload_to='')  # Store in main media folder
+    file = models.FileField(storage=get_blob_storage, max_length=255)  # Named by content hash
     file_type = models.CharField(max_length=50)
     file_size = models.IntegerField()  # Size in bytes
     created_at = models.DateTimeField(auto_now_add=True)
@@ -224,12 +244,7 @@ class ReportAttachment(models.Model):
     def save(self, *args, **kwargs):
         if not self.pk:  # Only on creation
             if self.file:
-                # Generate unique filename with report prefix
-                original_filename = self.file.name
-                new_filename = generate_unique_filename(original_filename, prefix='report')
-                
-                # Set the new filename
-                self.file.name = new_filename
+                original_filename = os.path.basename(self.file.name)
                 
                 # Set title if not provided
                 if not self.title:
@@ -298,6 +313,10 @@ class Report(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['project', 'created_at'], name='report_project_created_idx'),
+            models.Index(fields=['created_at'], name='report_created_idx'),
+        ]
         
     def get_absolute_url(self):
         return reverse('report_detail', kwargs={'pk': self.pk})
@@ -327,6 +346,19 @@ class Report(models.Model):
             self.publish_date = timezone.now().date()
             self.save()
 
+    def current_version(self):
+        """Return the ReportVersion matching the report's version number, creating it if missing."""
+        version, _ = ReportVersion.objects.get_or_create(
+            report=self,
+            version_number=self.version,
+            defaults={'created_by': self.created_by, 'changes': ''}
+        )
+        return version
+
+    def find_current_version(self):
+        """Return the ReportVersion matching the report's version number, or None; never writes."""
+        return ReportVersion.objects.filter(report=self, version_number=self.version).first()
+
 class ReportSectionOrder(models.Model):
     report = models.ForeignKey(Report, on_delete=models.CASCADE)
     section = models.ForeignKey(ReportSection, on_delete=models.CASCADE)
@@ -344,6 +376,8 @@ class ReportVersion(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     changes = models.TextField()
     pdf_file = models.FileField(upload_to='report_versions/%Y/%m/', null=True, blank=True)
+    pdf_rendered_at = models.DateTimeField(null=True, blank=True)
+    pdf_fingerprint = models.CharField(max_length=64, blank=True)
 
     class Meta:
         ordering = ['-version_number']
@@ -352,6 +386,240 @@ class ReportVersion(models.Model):
     def __str__(self):
         return f"{self.report.title} - v{self.version_number}"
 
+    def has_pdf_for(self, fingerprint):
+        """Check if the stored PDF was rendered from content with the given fingerprint."""
+        return bool(self.pdf_file and self.pdf_fingerprint == fingerprint)
+
+class ReportRenderJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name='render_jobs')
+    version = models.ForeignKey(ReportVersion, on_delete=models.SET_NULL, null=True, blank=True, related_name='render_jobs')
+    requested_by = models.ForeignKey('CustomUser', on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    base_url = models.CharField(max_length=255, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = 'Report Render Job'
+        verbose_name_plural = 'Report Render Jobs'
+
+    def __str__(self):
+        return f"{self.report.title} - {self.get_status_display()}"
+
+    @classmethod
+    def enqueue(cls, report, version=None, user=None, base_url=''):
+        """Return the pending job for a report, queueing a new one if none is pending."""
+        job = cls.objects.filter(report=report, status__in=['queued', 'running']).first()
+        if job:
+            return job
+        return cls.objects.create(
+            report=report,
+            version=version,
+            requested_by=user,
+            base_url=base_url
+        )
+
+    @classmethod
+    def claim_next(cls):
+        """
+        Claim the oldest queued job for this worker. The status flip is a
+        conditional UPDATE, so concurrent workers never claim the same job.
+        """
+        for job_id in cls.objects.filter(status='queued').values_list('id', flat=True)[:10]:
+            claimed = cls.objects.filter(id=job_id, status='queued').update(
+                status='running',
+                started_at=timezone.now(),
+                attempts=models.F('attempts') + 1
+            )
+            if claimed:
+                return cls.objects.select_related('report', 'version').get(id=job_id)
+        return None
+
+    @classmethod
+    def requeue_stale(cls, older_than, max_attempts=3, exclude=()):
+        """
+        Return jobs abandoned by a crashed worker to the queue, or fail them
+        after max_attempts. exclude lists the ids the calling worker is still
+        rendering, which are never taken from it.
+        """
+        stale = cls.objects.filter(status='running', started_at__lt=older_than).exclude(pk__in=exclude)
+        stale.filter(attempts__gte=max_attempts).update(
+            status='failed',
+            error='Render worker stopped responding',
+            finished_at=timezone.now()
+        )
+        return stale.filter(attempts__lt=max_attempts).update(status='queued', started_at=None)
+
+    def mark_done(self):
+        self.status = 'done'
+        self.error = ''
+        self.finished_at = timezone.now()
+        self.save(update_fields=['status', 'error', 'version', 'finished_at'])
+
+    def mark_failed(self, error):
+        self.status = 'failed'
+        self.error = error
+        self.finished_at = timezone.now()
+        self.save(update_fields=['status', 'error', 'finished_at'])
+
+class PendingFileDeletion(models.Model):
+    """
+    A stored file whose database row was deleted. Entries are written in the
+    deleting transaction, so a rollback keeps the file, and the files are
+    removed later in batches by the process_file_deletions worker.
+    """
+    name = models.CharField(max_length=255)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Pending File Deletion'
+        verbose_name_plural = 'Pending File Deletions'
+
+    def __str__(self):
+        return self.name
+
+class StoredBlob(models.Model):
+    """Reference count of a file in the content-addressed upload store."""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Stored Blob'
+        verbose_name_plural = 'Stored Blobs'
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
+
+class ChunkedUpload(models.Model):
+    """
+    A resumable upload to an SEO log. Chunks are written straight into a
+    preallocated file under CHUNKED_UPLOAD_DIR, in any order and in parallel;
+    finalizing attaches the assembled file as an SEOLogFile.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    seo_log = models.ForeignKey(SEOLog, on_delete=models.CASCADE, related_name='chunked_uploads')
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Expected SHA-256, checked on finalize when given")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Chunked Upload'
+        verbose_name_plural = 'Chunked Uploads'
+
+    def __str__(self):
+        return f"{self.file_name} ({self.size} bytes)"
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    @property
+    def path(self):
+        return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{self.pk}.part')
+
+class ChunkedUploadPart(models.Model):
+    """A chunk of a ChunkedUpload that was received completely."""
+    upload = models.ForeignKey(ChunkedUpload, on_delete=models.CASCADE, related_name='parts')
+    index = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ['upload', 'index']
+
+class ImageDerivativeJob(models.Model):
+    """Queued generation of the resized variants of an uploaded image."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    source = models.CharField(max_length=255, unique=True, help_text="Storage name of the original image")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = 'Image Derivative Job'
+        verbose_name_plural = 'Image Derivative Jobs'
+
+    def __str__(self):
+        return f"{self.source} - {self.get_status_display()}"
+
+    @classmethod
+    def enqueue(cls, source):
+        """
+        Queue an image once; identical uploads share the job of the first one.
+        Uploading an image whose job failed queues it again.
+        """
+        if not source:
+            return
+        job, created = cls.objects.get_or_create(source=source)
+        if not created and job.status == 'failed':
+            cls.objects.filter(pk=job.pk, status='failed').update(
+                status='queued', attempts=0, error='', started_at=None, finished_at=None
+            )
+
+    @classmethod
+    def claim_next(cls):
+        """Claim the oldest queued job with a conditional UPDATE, like ReportRenderJob."""
+        for job_id in cls.objects.filter(status='queued').values_list('id', flat=True)[:10]:
+            claimed = cls.objects.filter(id=job_id, status='queued').update(
+                status='running',
+                started_at=timezone.now(),
+                attempts=models.F('attempts') + 1
+            )
+            if claimed:
+                return cls.objects.get(id=job_id)
+        return None
+
+    @classmethod
+    def requeue_stale(cls, older_than, max_attempts=3):
+        """Return jobs abandoned by a crashed worker to the queue, or fail them after max_attempts."""
+        stale = cls.objects.filter(status='running', started_at__lt=older_than)
+        stale.filter(attempts__gte=max_attempts).update(
+            status='failed',
+            error='Image worker stopped responding',
+            finished_at=timezone.now()
+        )
+        return stale.filter(attempts__lt=max_attempts).update(status='queued', started_at=None)
+
+    def mark_done(self):
+        self.status = 'done'
+        self.error = ''
+        self.finished_at = timezone.now()
+        self.save(update_fields=['status', 'error', 'finished_at'])
+
+    def mark_failed(self, error):
+        self.status = 'failed'
+        self.error = error
+        self.finished_at = timezone.now()
+        self.save(update_fields=['status', 'error', 'finished_at'])
+
 class AttachmentAccess(models.Model):
     attachment = models.ForeignKey(ReportAttachment, on_delete=models.CASCADE)
     user = models.ForeignKey('CustomUser', on_delete=models.CASCADE)
@@ -361,13 +629,16 @@ class AttachmentAccess(models.Model):
 
     class Meta:
         ordering = ['-accessed_at']
+        indexes = [
+            models.Index(fields=['attachment', 'accessed_at'], name='access_attachment_time_idx'),
+        ]
 
     def __str__(self):
         return f"{self.attachment.title} - {self.user.email} - {self.accessed_at}"
 
 class Media(models.Model):
     seo_log = models.ForeignKey(SEOLog, on_delete=models.CASCADE)
-    file = models.FileField(upload_to='media/')
+    file = models.FileField(storage=get_blob_storage, max_length=255)  # Named by content hash
     file_type = models.CharField(max_length=50)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -375,6 +646,58 @@ class Media(models.Model):
     def __str__(self):
         return f"{self.seo_log.project.name} - {self.file_type}"
 
+class DashboardCounter(models.Model):
+    SCOPE_CHOICES = [
+        ('global', 'Global'),
+        ('provider', 'Provider'),
+        ('customer', 'Customer'),
+    ]
+
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    scope_id = models.PositiveIntegerField(default=0, help_text="Provider or customer id, 0 for the global scope")
+    name = models.CharField(max_length=30, help_text="Counter key, e.g. 'reports' or 'logs:2025-01-31'")
+    value = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['scope', 'scope_id', 'name']
+        verbose_name = 'Dashboard Counter'
+        verbose_name_plural = 'Dashboard Counters'
+
+    def __str__(self):
+        return f"{self.scope}:{self.scope_id} {self.name} = {self.value}"
+
+class StorageUsage(models.Model):
+    SCOPE_CHOICES = [
+        ('global', 'Global'),
+        ('customer', 'Customer'),
+        ('project', 'Project'),
+        ('disk', 'Media Root on Disk'),
+    ]
+
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    scope_id = models.PositiveIntegerField(default=0, help_text="Customer or project id, 0 for global scopes")
+    bytes_used = models.BigIntegerField(default=0)
+    file_count = models.IntegerField(default=0)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ['scope', 'scope_id']
+        verbose_name = 'Storage Usage'
+        verbose_name_plural = 'Storage Usage'
+
+    def __str__(self):
+        return f"{self.scope}:{self.scope_id} {self.bytes_used} bytes"
+
+    @property
+    def bytes_used_formatted(self):
+        """Return human-readable storage size."""
+        size = self.bytes_used
+        for unit in ['B', 'KB', 'MB', 'GB']:
+            if size < 1024:
+                return f"{size:.1f} {unit}"
+            size /= 1024
+        return f"{size:.1f} TB"
+
 class UserSettings(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='settings')
     
@@ -454,6 +777,10 @@ class Notification(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Notification'
         verbose_name_plural = 'Notifications'
+        # Unread notifications of a user, newest first
+        indexes = [
+            models.Index(fields=['user', 'is_read', 'created_at'], name='notification_user_unread_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.username}"
@@ -471,11 +798,57 @@ class Notification(models.Model):
         # Send real-time notification if WebSocket is implemented
         return notification
 
+    # The UserSettings flag that lets a user opt out of each notification type
+    SETTINGS_FLAGS = {
+        'project_assigned': 'notify_new_project',
+        'seo_log_added': 'notify_new_log',
+        'file_uploaded': 'notify_new_log',
+        'report_generated': 'notify_report',
+    }
+
+    @classmethod
+    def notify_users(cls, users, type, title, message, link=''):
+        """
+        Notify every user of a CustomUser queryset with a single INSERT.
+
+        Users who turned this type off in their settings are skipped, and so are
+        users who still have an unread notification of the same type and link
+        from the last NOTIFICATION_COALESCE_SECONDS.
+        """
+        flag = cls.SETTINGS_FLAGS.get(type)
+        if flag:
+            # Users without a settings row keep the default (notify)
+            users = users.exclude(**{f'settings__{flag}': False})
+
+        window = getattr(settings, 'NOTIFICATION_COALESCE_SECONDS', 300)
+        recent = cls.objects.filter(
+            type=type, link=link, is_read=False,
+            created_at__gte=timezone.now() - timedelta(seconds=window)
+        )
+        users = users.exclude(pk__in=recent.values('user_id'))
+
+        return cls.objects.bulk_create([
+            cls(user_id=user_id, type=type, title=title, message=message, link=link)
+            for user_id in users.values_list('pk', flat=True).distinct()
+        ])
+
+    @staticmethod
+    def project_audience(project, exclude=None):
+        """The customer accounts and assigned providers of a project."""
+        customer_emails = Customer.objects.filter(pk=project.customer_id).values('email')
+        providers = CustomUser.objects.filter(assigned_projects=project).values('pk')
+        users = CustomUser.objects.filter(
+            models.Q(pk__in=providers) | models.Q(role='customer', email__in=customer_emails)
+        )
+        if exclude is not None:
+            users = users.exclude(pk=exclude.pk)
+        return users
+
     @classmethod
     def notify_project_assignment(cls, project, provider):
         """Notify provider about project assignment."""
-        cls.create_notification(
-            user=provider,
+        cls.notify_users(
+            CustomUser.objects.filter(pk=provider.pk),
             type='project_assigned',
             title='New Project Assignment',
             message=f'You have been assigned to the project: {project.name}',
@@ -484,74 +857,48 @@ class Notification(models.Model):
 
     @classmethod
     def notify_seo_log_added(cls, seo_log):
-        """Notify relevant users about new SEO log."""
-        # Notify customer
-        cls.create_notification(
-            user=seo_log.project.customer.user,
+        """Notify the customer and the other providers about a new SEO log."""
+        cls.notify_users(
+            cls.project_audience(seo_log.project, exclude=seo_log.created_by),
             type='seo_log_added',
             title='New SEO Log Added',
             message=f'New SEO log added for project: {seo_log.project.name}',
             link=f'/seo-logs/{seo_log.pk}/'
         )
-        # Notify other providers
-        for provider in seo_log.project.providers.exclude(id=seo_log.created_by.id):
-            cls.create_notification(
-                user=provider,
-                type='seo_log_added',
-                title='New SEO Log Added',
-                message=f'New SEO log added for project: {seo_log.project.name}',
-                link=f'/seo-logs/{seo_log.pk}/'
-            )
 
     @classmethod
     def notify_report_generated(cls, report, project):
         """Notify customer about new report."""
-        cls.create_notification(
-            user=project.customer.user,
+        cls.notify_users(
+            cls.project_audience(project).filter(role='customer'),
             type='report_generated',
             title='New Report Available',
             message=f'A new SEO report is available for project: {project.name}',
-            link=f'/reports/{project.pk}/'
+            link=f'/reports/{report.pk}/'
         )
 
     @classmethod
     def notify_project_completed(cls, project):
-        """Notify all relevant users about project completion."""
-        # Notify customer
-        cls.create_notification(
-            user=project.customer.user,
+        """Notify the customer and all providers about project completion."""
+        cls.notify_users(
+            cls.project_audience(project),
             type='project_completed',
             title='Project Completed',
             message=f'Project completed: {project.name}',
             link=f'/projects/{project.pk}/'
         )
-        # Notify providers
-        for provider in project.providers.all():
-            cls.create_notification(
-                user=provider,
-                type='project_completed',
-                title='Project Completed',
-                message=f'Project completed: {project.name}',
-                link=f'/projects/{project.pk}/'
-            )
 
     @classmethod
     def notify_file_uploaded(cls, file, seo_log):
-        """Notify relevant users about file upload."""
-        # Notify customer
-        cls.create_notification(
-            user=seo_log.project.customer.user,
+        """
+        Notify the customer and the other providers about a file upload.
+        Uploading several files to a log in a row produces one notification
+        per user, since later calls coalesce into the first.
+        """
+        cls.notify_users(
+            cls.project_audience(seo_log.project, exclude=seo_log.created_by),
             type='file_uploaded',
             title='New File Uploaded',
             message=f'New file uploaded for project: {seo_log.project.name}',
             link=f'/seo-logs/{seo_log.pk}/'
         )
-        # Notify other providers
-        for provider in seo_log.project.providers.exclude(id=seo_log.created_by.id):
-            cls.create_notification(
-                user=provider,
-                type='file_uploaded',
-                title='New File Uploaded',
-                message=f'New file uploaded for project: {seo_log.project.name}',
-                link=f'/seo-logs/{seo_log.pk}/'
-            )
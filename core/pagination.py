@@ -0,0 +1,47 @@
+import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(log, field='date'):
+    value = getattr(log, field)
+    if field == 'date':
+        value = value.isoformat()
+    else:
+        value = repr(value)
+    return f'{value}_{log.pk}'
+
+
+def decode_cursor(cursor, field='date'):
+    """Return (value, id) from a cursor, or None if it is missing or malformed."""
+    try:
+        value, pk = cursor.rsplit('_', 1)
+        if field == 'date':
+            value = datetime.date.fromisoformat(value)
+        else:
+            value = float(value)
+        return value, int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_page(logs, cursor=None, page_size=50, field='date'):
+    """
+    Return one page of SEO logs ordered by field (date, or the search_rank
+    annotation) descending, and the cursor of the next page (None on the
+    last page).
+
+    Pages continue from the (field, id) of the previous page's last row rather
+    than an OFFSET, so every page costs the same however deep the user scrolls.
+    """
+    logs = logs.order_by(f'-{field}', '-id')
+    position = decode_cursor(cursor, field)
+    if position:
+        value, pk = position
+        logs = logs.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}))
+
+    page = list(logs[:page_size + 1])
+    if len(page) > page_size:
+        page = page[:page_size]
+        return page, encode_cursor(page[-1], field)
+    return page, None
@@ -0,0 +1,132 @@
+from django.contrib.staticfiles import finders
+from django.core.files.base import ContentFile
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .pdf_cache import get_cached_pdf, report_fingerprint, store_pdf
+from .pdf_fetcher import make_url_fetcher
+from .report_loader import load_report, report_queryset
+
+REPORT_STYLESHEET = 'css/report_pdf.css'
+
+# Built on the first render and reused by every later render in the process
+_font_config = None
+_stylesheet = None
+
+
+def render_report_html(report, base_url=''):
+    """Render the printable HTML for a report."""
+    template = get_template('core/report_pdf.html')
+    context = load_report(report_queryset().get(pk=report.pk))
+    context['base_url'] = base_url.rstrip('/')
+    return template.render(context)
+
+
+def get_font_config():
+    """Return the process-wide FontConfiguration, so fonts are discovered once."""
+    global _font_config
+    if _font_config is None:
+        from weasyprint.text.fonts import FontConfiguration
+        _font_config = FontConfiguration()
+    return _font_config
+
+
+def load_report_stylesheet(font_config):
+    from weasyprint import CSS
+    return CSS(filename=finders.find(REPORT_STYLESHEET), font_config=font_config)
+
+
+def get_report_stylesheet():
+    """Return the report stylesheet, parsed once per process."""
+    global _stylesheet
+    if _stylesheet is None:
+        _stylesheet = load_report_stylesheet(get_font_config())
+    return _stylesheet
+
+
+def render_report_pdf(report, base_url='', shared=True):
+    """
+    Render a report to PDF bytes. With shared=False the fonts, stylesheet and
+    images are all loaded from scratch, as a first render would; the render
+    benchmark compares the two.
+    """
+    # WeasyPrint pulls in Pango and cairo; import it only in the process that
+    # actually renders, so web workers importing this module stay light
+    from weasyprint import HTML
+    from weasyprint.text.fonts import FontConfiguration
+
+    html = render_report_html(report, base_url)
+    if shared:
+        font_config = get_font_config()
+        stylesheet = get_report_stylesheet()
+        url_fetcher = make_url_fetcher(base_url)
+    else:
+        font_config = FontConfiguration()
+        stylesheet = load_report_stylesheet(font_config)
+        url_fetcher = None
+
+    document = HTML(string=html, base_url=base_url or None, url_fetcher=url_fetcher)
+    return document.write_pdf(stylesheets=[stylesheet], font_config=font_config)
+
+
+def read_cached_pdf(fingerprint):
+    """Return the cached PDF bytes for a fingerprint, or None."""
+    cached_path = get_cached_pdf(fingerprint)
+    if not cached_path:
+        return None
+    with open(cached_path, 'rb') as f:
+        return f.read()
+
+
+def save_job_pdf(job, pdf, fingerprint):
+    """Store rendered PDF bytes on the job's ReportVersion and finish the job."""
+    report = job.report
+    version = job.version or report.current_version()
+
+    filename = f'report_{report.pk}_v{version.version_number}.pdf'
+    old_name = version.pdf_file.name
+    version.pdf_file.save(filename, ContentFile(pdf), save=False)
+    version.pdf_rendered_at = timezone.now()
+    version.pdf_fingerprint = fingerprint
+    version.save(update_fields=['pdf_file', 'pdf_rendered_at', 'pdf_fingerprint'])
+
+    # Remove the superseded PDF only after the row points at the new one
+    if old_name and old_name != version.pdf_file.name:
+        version.pdf_file.storage.delete(old_name)
+
+    job.version = version
+    job.mark_done()
+    return job
+
+
+def save_rendered_pdf(job, pdf, fingerprint):
+    """
+    Cache and store a PDF rendered for the report fingerprinted as fingerprint
+    when the job was claimed. If the report was edited while it rendered, the
+    PDF may show some of the edits but not others: it is stored under the old
+    fingerprint, so the version reads as stale and is rendered again, and kept
+    out of the cache.
+    """
+    job.report.refresh_from_db()
+    if report_fingerprint(job.report) == fingerprint:
+        store_pdf(fingerprint, pdf)
+    return save_job_pdf(job, pdf, fingerprint)
+
+
+def process_render_job(job):
+    """
+    Render the PDF for a claimed ReportRenderJob and store it on the job's
+    ReportVersion. A cached artifact with the same content fingerprint is
+    reused instead of rendering. Failures are recorded on the job instead
+    of raised.
+    """
+    fingerprint = report_fingerprint(job.report)
+    pdf = read_cached_pdf(fingerprint)
+    if pdf is None:
+        try:
+            pdf = render_report_pdf(job.report, job.base_url)
+        except Exception as e:
+            job.mark_failed(str(e))
+            return job
+        return save_rendered_pdf(job, pdf, fingerprint)
+    return save_job_pdf(job, pdf, fingerprint)
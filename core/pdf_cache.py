@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import time
+
+from django.conf import settings
+
+from .models import ImageDerivativeJob, ReportAttachment, ReportSectionOrder, SEOLog, SEOLogFile
+
+# Bump when core/report_pdf.html or the renderer changes so old artifacts stop matching.
+CACHE_FORMAT_VERSION = 3
+
+# store_pdf skips the directory scan while this process's running estimate of
+# the cache size stays under the limit, but rescans at least this often so
+# PDFs written by other processes are counted too.
+EVICT_SCAN_INTERVAL = 300
+_cache_size = {'bytes': None, 'scanned_at': 0.0}
+
+
+def get_cache_dir():
+    return str(getattr(settings, 'REPORT_PDF_CACHE_DIR', os.path.join(settings.BASE_DIR, 'var', 'pdf_cache')))
+
+
+def get_cache_max_bytes():
+    return getattr(settings, 'REPORT_PDF_CACHE_MAX_BYTES', 500 * 1024 * 1024)
+
+
+def report_fingerprint(report):
+    """
+    Hash everything that ends up in a report's PDF: the report fields, the
+    ordered sections, their attachments, the linked SEO logs and files, and
+    which of those images have print variants. Each relation is read with a
+    single values() query.
+    """
+    project = report.project
+    customer = project.customer
+    creator = report.created_by
+
+    sections = list(
+        ReportSectionOrder.objects.filter(report=report)
+        .order_by('order')
+        .values_list(
+            'section_id', 'order', 'page_break_before',
+            'section__title', 'section__content', 'section__updated_at'
+        )
+    )
+    section_ids = [row[0] for row in sections]
+
+    attachments = list(
+        ReportAttachment.objects.filter(report_section_id__in=section_ids)
+        .order_by('report_section_id', 'id')
+        .values_list('report_section_id', 'id', 'file', 'file_size', 'file_type', 'title', 'updated_at')
+    )
+    logs = list(
+        SEOLog.objects.filter(reportsection__id__in=section_ids)
+        .order_by('id')
+        .distinct()
+        .values_list('id', 'date', 'work_type', 'updated_at')
+    )
+    log_files = list(
+        SEOLogFile.objects.filter(seo_log_id__in=[row[0] for row in logs])
+        .order_by('seo_log_id', 'id')
+        .values_list('seo_log_id', 'id', 'file', 'file_size', 'file_type')
+    )
+    # The PDF embeds the print variant of an image once the media worker has
+    # made it, and the original until then
+    images = [row[2] for row in attachments] + [row[2] for row in log_files]
+    derivatives = sorted(
+        ImageDerivativeJob.objects.filter(source__in=images, status='done').values_list('source', flat=True)
+    )
+
+    payload = {
+        'format': CACHE_FORMAT_VERSION,
+        'report': [
+            report.pk, report.title, report.description, report.version,
+            report.created_at, report.updated_at,
+            creator.get_full_name() if creator else '',
+        ],
+        'project': [project.pk, project.name, customer.logo.name if customer.logo else ''],
+        'sections': sections,
+        'attachments': attachments,
+        'logs': logs,
+        'log_files': log_files,
+        'derivatives': derivatives,
+    }
+    encoded = json.dumps(payload, default=str, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _cache_path(fingerprint):
+    return os.path.join(get_cache_dir(), fingerprint[:2], f'{fingerprint}.pdf')
+
+
+def get_cached_pdf(fingerprint):
+    """Return the path of a cached PDF, or None. Hits refresh the entry's LRU timestamp."""
+    path = _cache_path(fingerprint)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def store_pdf(fingerprint, data):
+    """Write a rendered PDF into the cache and evict old entries if it grew too large."""
+    path = _cache_path(fingerprint)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Write to a temp file first so readers never see a partial PDF
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+    if cache_may_be_full(len(data)):
+        evict_pdf_cache()
+    return path
+
+
+def cache_may_be_full(added):
+    """
+    Add a newly stored PDF to the size estimate and return whether the cache
+    needs a scan: the estimate passed the limit, or it is missing or too old.
+    """
+    if _cache_size['bytes'] is None or time.monotonic() - _cache_size['scanned_at'] > EVICT_SCAN_INTERVAL:
+        return True
+    _cache_size['bytes'] += added
+    return _cache_size['bytes'] > get_cache_max_bytes()
+
+
+def evict_pdf_cache(max_bytes=None):
+    """Delete least recently used PDFs until the cache fits in max_bytes. Returns bytes freed."""
+    if max_bytes is None:
+        max_bytes = get_cache_max_bytes()
+
+    entries = []
+    total_size = 0
+    for dirpath, dirnames, filenames in os.walk(get_cache_dir()):
+        for f in filenames:
+            if not f.endswith('.pdf'):
+                continue
+            fp = os.path.join(dirpath, f)
+            try:
+                stat = os.stat(fp)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, fp))
+            total_size += stat.st_size
+
+    freed = 0
+    entries.sort()
+    for mtime, size, fp in entries:
+        if total_size - freed <= max_bytes:
+            break
+        try:
+            os.remove(fp)
+        except FileNotFoundError:
+            continue
+        freed += size
+
+    _cache_size['bytes'] = total_size - freed
+    _cache_size['scanned_at'] = time.monotonic()
+    return freed
@@ -0,0 +1,152 @@
+import mimetypes
+import os
+from collections import OrderedDict
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.exceptions import SuspiciousFileOperation
+from django.http.request import split_domain_port, validate_host
+from django.utils._os import safe_join
+
+# Protocols the fallback fetcher may use; file: would expose the server's disk
+NETWORK_PROTOCOLS = ('http', 'https', 'data')
+
+_cache = OrderedDict()
+_cache_bytes = 0
+
+
+class LocalURLError(ValueError):
+    """A URL of this site that points outside MEDIA_ROOT or the static files."""
+
+
+def get_fetch_cache_max_bytes():
+    return getattr(settings, 'REPORT_PDF_FETCH_CACHE_BYTES', 64 * 1024 * 1024)
+
+
+def is_own_host(netloc, base_url=''):
+    """Whether a URL host is this site: the report's base URL host or one of ALLOWED_HOSTS."""
+    host = netloc.rsplit('@', 1)[-1].lower()
+    if host == urlsplit(base_url).netloc.lower():
+        return True
+    allowed = [pattern for pattern in settings.ALLOWED_HOSTS if pattern != '*']
+    return validate_host(split_domain_port(host)[0], allowed)
+
+
+def contained_path(root, relative):
+    """
+    Join a URL path onto a directory and make sure the result, with symlinks
+    resolved, is still inside it.
+    """
+    if '\x00' in relative:
+        raise LocalURLError('Invalid path')
+    try:
+        path = safe_join(root, relative)
+    except SuspiciousFileOperation:
+        raise LocalURLError(f'{relative} is outside {root}')
+    real_root = os.path.realpath(root)
+    if os.path.commonpath([os.path.realpath(path), real_root]) != real_root:
+        raise LocalURLError(f'{relative} is outside {root}')
+    return path
+
+
+def static_path(relative):
+    """Find a static file in STATIC_ROOT (collected, hashed names) or the app directories."""
+    if settings.STATIC_ROOT:
+        path = contained_path(settings.STATIC_ROOT, relative)
+        if os.path.isfile(path):
+            return path
+    # The finders refuse paths outside their directories themselves
+    found = finders.find(relative)
+    if not found:
+        raise LocalURLError(f'Static file {relative} not found')
+    return found
+
+
+def local_path(url, base_url=''):
+    """
+    Return the file a /media/ or /static/ URL of this site points to, or None
+    for external URLs. Absolute URLs count as local only on our own hosts.
+    Raises LocalURLError for any other URL of this site, or one escaping its
+    directory, so a render never makes an HTTP request against ourselves.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('', 'http', 'https'):
+        return None
+    if parts.netloc and not is_own_host(parts.netloc, base_url):
+        return None
+
+    path = unquote(parts.path)
+    if path.startswith(settings.MEDIA_URL):
+        return contained_path(settings.MEDIA_ROOT, path[len(settings.MEDIA_URL):])
+    if path.startswith(settings.STATIC_URL):
+        return static_path(path[len(settings.STATIC_URL):])
+    raise LocalURLError(f'{url} is not a media or static file of this site')
+
+
+def read_cached(path):
+    """
+    Return the bytes of a file, from an in-process LRU cache keyed by path,
+    size and mtime so a replaced file is read again.
+    """
+    global _cache_bytes
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    data = _cache.get(key)
+    if data is not None:
+        _cache.move_to_end(key)
+        return data
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) <= get_fetch_cache_max_bytes():
+        _cache[key] = data
+        _cache_bytes += len(data)
+        while _cache_bytes > get_fetch_cache_max_bytes():
+            old_key, old_data = _cache.popitem(last=False)
+            _cache_bytes -= len(old_data)
+    return data
+
+
+def local_resource(url, base_url=''):
+    """Return (bytes, mime type) for one of our media or static URLs, or None."""
+    path = local_path(url, base_url)
+    if path is None:
+        return None
+    mime_type, encoding = mimetypes.guess_type(path)
+    return read_cached(path), mime_type or 'application/octet-stream'
+
+
+def make_url_fetcher(base_url=''):
+    """
+    Build a WeasyPrint url_fetcher that reads media and static files straight
+    from disk instead of requesting them from our own web server. Only
+    http(s) URLs of other hosts and data: URLs go through WeasyPrint's own
+    fetcher; other URLs of this site fail with LocalURLError.
+    """
+    try:
+        from weasyprint.urls import URLFetcher, URLFetcherResponse
+    except ImportError:
+        # WeasyPrint before the URLFetcher class takes a plain function
+        from weasyprint import default_url_fetcher
+
+        def fetch(url):
+            local = local_resource(url, base_url)
+            if local is None:
+                if urlsplit(url).scheme not in NETWORK_PROTOCOLS:
+                    raise ValueError(f'URI uses disallowed protocol: {url}')
+                return default_url_fetcher(url)
+            data, mime_type = local
+            return {'string': data, 'mime_type': mime_type, 'redirected_url': url}
+
+        return fetch
+
+    class LocalURLFetcher(URLFetcher):
+        def fetch(self, url, headers=None):
+            local = local_resource(url, base_url)
+            if local is None:
+                return super().fetch(url, headers)
+            data, mime_type = local
+            return URLFetcherResponse(url, data, {'Content-Type': mime_type})
+
+    return LocalURLFetcher(allowed_protocols=NETWORK_PROTOCOLS)
@@ -0,0 +1,145 @@
+import multiprocessing
+import resource
+import sys
+import time
+
+import django
+from django import db
+from django.conf import settings
+
+
+def peak_rss():
+    """Peak resident memory of the current process in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _setup_child():
+    django.setup()
+
+
+def render_in_child(report_id, base_url):
+    """
+    Runs inside a pool process. Returns (pdf, error, peak rss); errors come
+    back as text because WeasyPrint exceptions do not always pickle.
+    """
+    from .models import Report
+    from .pdf import render_report_pdf
+
+    db.close_old_connections()
+    try:
+        report = Report.objects.get(pk=report_id)
+        return render_report_pdf(report, base_url), '', peak_rss()
+    except Exception as e:
+        return None, str(e) or type(e).__name__, peak_rss()
+
+
+class RenderSlot:
+    """
+    One child process rendering one job at a time. The process is replaced
+    after max_jobs renders, once its peak RSS passes max_rss bytes, or when
+    a render runs past the timeout.
+    """
+
+    def __init__(self, max_jobs, max_rss):
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss
+        self.pool = None
+        self.jobs_done = 0
+        self.job = None
+        self.result = None
+        self.started = None
+
+    @property
+    def busy(self):
+        return self.job is not None
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def start(self, job, func, *args):
+        if self.pool is None:
+            self.pool = multiprocessing.get_context('spawn').Pool(1, initializer=_setup_child)
+            self.jobs_done = 0
+        self.job = job
+        self.started = time.monotonic()
+        self.result = self.pool.apply_async(func, args)
+
+    def finish(self):
+        """Return (job, pdf, error) for the finished render and free the slot."""
+        try:
+            pdf, error, rss = self.result.get()
+        except Exception as e:
+            # The child died (e.g. killed by the OOM killer)
+            pdf, error, rss = None, f'The render process failed: {e}', 0
+            self.recycle()
+        job = self.job
+        self.job = self.result = self.started = None
+        self.jobs_done += 1
+        if (self.max_jobs and self.jobs_done >= self.max_jobs) or (self.max_rss and rss > self.max_rss):
+            self.recycle()
+        return job, pdf, error
+
+    def abandon(self):
+        """Kill a render that is taking too long; return its job."""
+        job = self.job
+        self.job = self.result = self.started = None
+        self.recycle()
+        return job
+
+    def recycle(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+
+class RenderPool:
+    """
+    A fixed number of render processes, kept apart from the web and worker
+    processes so WeasyPrint's memory growth on large reports is returned to
+    the OS whenever a process is recycled.
+    """
+
+    def __init__(self, processes=None, max_jobs=None, max_rss_mb=None, timeout=None):
+        # 0 is a valid value for the caps (no limit), so only None falls back
+        if processes is None:
+            processes = settings.PDF_RENDER_PROCESSES
+        if max_jobs is None:
+            max_jobs = settings.PDF_RENDER_MAX_JOBS_PER_PROCESS
+        if max_rss_mb is None:
+            max_rss_mb = settings.PDF_RENDER_MAX_RSS_MB
+        if timeout is None:
+            timeout = settings.PDF_RENDER_TIMEOUT
+        max_rss = max_rss_mb * 1024 * 1024
+        self.timeout = timeout
+        self.slots = [RenderSlot(max_jobs, max_rss) for i in range(processes)]
+
+    def has_free_slot(self):
+        return any(not slot.busy for slot in self.slots)
+
+    def in_flight(self):
+        return sum(1 for slot in self.slots if slot.busy)
+
+    def submit(self, job, func, *args):
+        for slot in self.slots:
+            if not slot.busy:
+                slot.start(job, func, *args)
+                return
+        raise RuntimeError('No free render process')
+
+    def collect(self):
+        """Return (job, pdf, error) for every render that finished or timed out."""
+        finished = []
+        for slot in self.slots:
+            if not slot.busy:
+                continue
+            if slot.result.ready():
+                finished.append(slot.finish())
+            elif self.timeout and slot.elapsed() > self.timeout:
+                finished.append((slot.abandon(), None, f'Rendering took longer than {self.timeout}s'))
+        return finished
+
+    def close(self):
+        for slot in self.slots:
+            slot.recycle()
@@ -0,0 +1,45 @@
+from django.db.models import F, Prefetch
+
+from .models import Report, ReportAttachment, ReportSection, SEOLog, SEOLogFile
+
+
+def report_queryset():
+    """Reports joined with the project, customer and people every report page shows."""
+    return Report.objects.select_related('project__customer', 'created_by', 'last_reviewed_by')
+
+
+def ordered_sections(report):
+    """
+    Return the report's sections in report order, each annotated with its
+    order and page_break_before from ReportSectionOrder, with attachments,
+    SEO logs and log files prefetched: four queries however many sections.
+    """
+    logs = SEOLog.objects.prefetch_related(
+        Prefetch('files', queryset=SEOLogFile.objects.order_by('id'))
+    )
+    return list(
+        ReportSection.objects.filter(reportsectionorder__report=report)
+        .annotate(
+            order=F('reportsectionorder__order'),
+            page_break_before=F('reportsectionorder__page_break_before')
+        )
+        .order_by('order', 'id')
+        .prefetch_related(
+            Prefetch('attachments', queryset=ReportAttachment.objects.order_by('id')),
+            Prefetch('seo_logs', queryset=logs)
+        )
+    )
+
+
+def load_report(report):
+    """
+    Build the object graph the report templates render: the ordered sections
+    and the work logs listed in the report (those of its first section).
+    Templates must read only from this context, never from report.sections.
+    """
+    sections = ordered_sections(report)
+    return {
+        'report': report,
+        'sections': sections,
+        'work_logs': sections[0].seo_logs.all() if sections else [],
+    }
@@ -0,0 +1,41 @@
+import hashlib
+import threading
+
+import bleach
+
+# Markup providers may use in SEO log descriptions
+ALLOWED_TAGS = [
+    'p', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'strong', 'em', 'u',
+    'span', 'table', 'thead', 'tbody', 'tr', 'th', 'td', 'br'
+]
+ALLOWED_ATTRIBUTES = {
+    '*': ['class'],
+    'span': ['style'],
+    'p': ['style'],
+    'td': ['colspan', 'rowspan'],
+    'th': ['colspan', 'rowspan']
+}
+
+# Cleaner and Linker keep parser state, so each thread builds its own pair once
+_local = threading.local()
+
+
+def get_cleaner():
+    if not hasattr(_local, 'cleaner'):
+        _local.cleaner = bleach.Cleaner(tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
+    return _local.cleaner
+
+
+def get_linker():
+    if not hasattr(_local, 'linker'):
+        _local.linker = bleach.Linker()
+    return _local.linker
+
+
+def sanitize_description(html):
+    """Strip disallowed markup from a description and turn bare URLs into links."""
+    return get_linker().linkify(get_cleaner().clean(html))
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
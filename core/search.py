@@ -0,0 +1,129 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+FTS_TABLE = 'core_seolog_fts'
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+_backend = None
+
+
+def search_backend():
+    """
+    Return the full-text engine available on the default database:
+    'mysql' (FULLTEXT index), 'fts5' (SQLite FTS5 table) or None.
+    """
+    global _backend
+    if _backend is None:
+        if connection.vendor == 'mysql':
+            _backend = 'mysql'
+        elif connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+            _backend = 'fts5'
+        else:
+            _backend = ''
+    return _backend or None
+
+
+def search_terms(query):
+    return WORD_RE.findall(query or '')[:10]
+
+
+def _fts5_query(terms):
+    # Quote every term so user input can never be read as FTS5 syntax; the last
+    # term matches as a prefix so results appear while the user is still typing
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _mysql_query(terms):
+    # Boolean mode so matching follows FTS5: every term required, the last as a
+    # prefix. Terms are \w+ only, so they cannot contain boolean operators
+    return ' '.join(f'+{term}' for term in terms) + '*'
+
+
+def search_logs(logs, query):
+    """
+    Filter SEO logs to those matching the query and annotate each with a
+    search_rank, higher meaning more relevant.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return logs.none()
+
+    backend = search_backend()
+    if backend == 'mysql':
+        match = 'MATCH(core_seolog.search_text) AGAINST (%s IN BOOLEAN MODE)'
+        return logs.annotate(
+            search_rank=RawSQL(match, [_mysql_query(terms)], output_field=FloatField())
+        ).filter(search_rank__gt=0)
+
+    if backend == 'fts5':
+        fts_query = _fts5_query(terms)
+        matches = f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        # bm25() is lower for better matches, so negate it
+        rank = (
+            f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = core_seolog.id'
+        )
+        return logs.filter(id__in=RawSQL(matches, [fts_query])).annotate(
+            search_rank=RawSQL(rank, [fts_query], output_field=FloatField())
+        )
+
+    # No full-text engine: plain substring matching on the stripped text
+    for term in terms:
+        logs = logs.filter(search_text__icontains=term)
+    return logs.annotate(search_rank=RawSQL('1.0', [], output_field=FloatField()))
+
+
+def index_logs(logs):
+    """Write SEO logs into the FTS5 table. MySQL maintains its FULLTEXT index itself."""
+    if search_backend() != 'fts5':
+        return
+    rows = [(log.pk, log.search_text) for log in logs]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk, text in rows])
+        cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, search_text) VALUES (%s, %s)', rows)
+
+
+def unindex_log(pk):
+    if search_backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def highlight(text, query, width=200):
+    """
+    Return an HTML-escaped excerpt of text around the first matching term,
+    with every matching term wrapped in <mark>.
+    """
+    terms = search_terms(query)
+    if not text:
+        return ''
+    if not terms:
+        return escape(text[:width])
+
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    first = pattern.search(text)
+    start = max((first.start() if first else 0) - width // 4, 0)
+    end = min(start + width, len(text))
+    excerpt = text[start:end]
+
+    parts = []
+    position = 0
+    for match in pattern.finditer(excerpt):
+        parts.append(escape(excerpt[position:match.start()]))
+        parts.append(f'<mark>{escape(match.group())}</mark>')
+        position = match.end()
+    parts.append(escape(excerpt[position:]))
+
+    prefix = '&hellip;' if start > 0 else ''
+    suffix = '&hellip;' if end < len(text) else ''
+    return mark_safe(prefix + ''.join(parts) + suffix)
@@ -1,22 +1,270 @@
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
 from django.dispatch import receiver
-from .models import SEOLog, Report, ReportAttachment, SEOLogFile
-import os
-
-@receiver(post_delete, sender=SEOLogFile)
-def auto_delete_seo_log_file_on_delete(sender, instance, **kwargs):
-    """
-    Delete file from filesystem when corresponding SEOLogFile object is deleted.
-    """
-    if instance.file:
-        if os.path.isfile(instance.file.path):
-            os.remove(instance.file.path)
-
-@receiver(post_delete, sender=ReportAttachment)
-def auto_delete_report_attachment_on_delete(sender, instance, **kwargs):
-    """
-    Delete file from filesystem when corresponding ReportAttachment object is deleted.
-    """
-    if instance.file:
-        if os.path.isfile(instance.file.path):
-            os.remove(instance.file.path) 
\ No newline at end of file
+from .models import (
+    SEOLog, Report, Customer, Project, DashboardCounter, StorageUsage, ChunkedUpload,
+    ImageDerivativeJob, ReportAttachment, SEOLogFile
+)
+from .blobs import BLOB_FIELDS, acquire_blob, release_blob
+from .chunked_uploads import remove_upload_file
+from .counters import (
+    GLOBAL, PROVIDER, CUSTOMER, increment, log_counter_keys, recount_logs, recount_membership, recount_scope,
+    set_counter
+)
+from .search import index_logs, unindex_log
+from .storage_usage import TRACKED_FILES, add_usage, owner_ids, stored_size, tracked_field
+
+# Dashboard counters. Creates and deletes adjust the counters in place; changes that
+# move a row between scopes undo the old contribution before adding the new one.
+
+@receiver(post_save, sender=Customer)
+def count_customer_on_save(sender, instance, created, **kwargs):
+    if created:
+        increment(GLOBAL, 0, 'customers')
+        set_counter(CUSTOMER, instance.pk, 'customers', 1)
+
+@receiver(post_delete, sender=Customer)
+def count_customer_on_delete(sender, instance, **kwargs):
+    increment(GLOBAL, 0, 'customers', -1)
+    # Cascaded projects, logs and reports still decrement this scope, so drop it last
+    customer_id = instance.pk
+    transaction.on_commit(
+        lambda: DashboardCounter.objects.filter(scope=CUSTOMER, scope_id=customer_id).delete()
+    )
+
+@receiver(pre_save, sender=Project)
+def remember_project_state(sender, instance, **kwargs):
+    instance._counter_state = None
+    if instance.pk:
+        instance._counter_state = Project.objects.filter(pk=instance.pk).values_list(
+            'is_active', 'customer_id'
+        ).first()
+
+@receiver(post_save, sender=Project)
+def count_project_on_save(sender, instance, created, **kwargs):
+    old_active, old_customer_id = getattr(instance, '_counter_state', None) or (False, None)
+    if (old_active, old_customer_id) == (instance.is_active, instance.customer_id):
+        return
+
+    if old_active:
+        increment(GLOBAL, 0, 'active_projects', -1)
+        increment(CUSTOMER, old_customer_id, 'active_projects', -1)
+    if instance.is_active:
+        increment(GLOBAL, 0, 'active_projects')
+        increment(CUSTOMER, instance.customer_id, 'active_projects')
+
+    if not created:
+        if old_customer_id != instance.customer_id:
+            # Logs and reports of the project move to the new customer's scope
+            recount_scope(CUSTOMER, old_customer_id)
+            recount_scope(CUSTOMER, instance.customer_id)
+        for provider_id in instance.providers.values_list('id', flat=True):
+            recount_membership(PROVIDER, provider_id)
+
+@receiver(pre_delete, sender=Project)
+def remember_project_providers(sender, instance, **kwargs):
+    instance._counter_providers = list(instance.providers.values_list('id', flat=True))
+
+@receiver(post_delete, sender=Project)
+def count_project_on_delete(sender, instance, **kwargs):
+    if instance.is_active:
+        increment(GLOBAL, 0, 'active_projects', -1)
+        increment(CUSTOMER, instance.customer_id, 'active_projects', -1)
+    for provider_id in getattr(instance, '_counter_providers', []):
+        recount_membership(PROVIDER, provider_id)
+
+@receiver(m2m_changed, sender=Project.providers.through)
+def count_project_providers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        if reverse:
+            instance._counter_providers = [instance.pk]
+        else:
+            instance._counter_providers = list(instance.providers.values_list('id', flat=True))
+        return
+    if action == 'post_clear':
+        provider_ids = getattr(instance, '_counter_providers', [])
+    elif action in ('post_add', 'post_remove'):
+        provider_ids = [instance.pk] if reverse else pk_set
+    else:
+        return
+    for provider_id in provider_ids:
+        recount_membership(PROVIDER, provider_id)
+
+@receiver(pre_save, sender=SEOLog)
+def remember_seo_log_state(sender, instance, **kwargs):
+    instance._counter_state = None
+    if instance.pk:
+        instance._counter_state = SEOLog.objects.filter(pk=instance.pk).values_list(
+            'project__customer_id', 'created_by_id', 'date'
+        ).first()
+
+@receiver(post_save, sender=SEOLog)
+def count_seo_log_on_save(sender, instance, created, **kwargs):
+    new_keys = log_counter_keys(instance.project.customer_id, instance.created_by_id, instance.date)
+    old_state = getattr(instance, '_counter_state', None)
+    old_keys = log_counter_keys(*old_state) if old_state else []
+    if old_keys == new_keys:
+        return
+    for scope, scope_id, name in old_keys:
+        increment(scope, scope_id, name, -1)
+    for scope, scope_id, name in new_keys:
+        increment(scope, scope_id, name)
+
+@receiver(post_delete, sender=SEOLog)
+def count_seo_log_on_delete(sender, instance, origin=None, **kwargs):
+    if origin is None or isinstance(origin, SEOLog):
+        customer_id = Project.objects.filter(pk=instance.project_id).values_list('customer_id', flat=True).first()
+        for scope, scope_id, name in log_counter_keys(customer_id, instance.created_by_id, instance.date):
+            increment(scope, scope_id, name, -1)
+        return
+
+    # A queryset delete or a cascade from a project, customer or user sends this
+    # once per log. Collect the scopes on the delete's origin and recount each
+    # of them once the deleting transaction commits.
+    batch = getattr(origin, '_counter_log_deletes', None)
+    if batch is None:
+        batch = origin._counter_log_deletes = {'customers': {}, 'providers': set()}
+        transaction.on_commit(lambda: _recount_deleted_logs(batch))
+    if instance.project_id not in batch['customers']:
+        batch['customers'][instance.project_id] = Project.objects.filter(
+            pk=instance.project_id
+        ).values_list('customer_id', flat=True).first()
+    batch['providers'].add(instance.created_by_id)
+
+def _recount_deleted_logs(batch):
+    recount_logs(GLOBAL, 0)
+    for customer_id in set(batch['customers'].values()) - {None}:
+        recount_logs(CUSTOMER, customer_id)
+    for provider_id in batch['providers'] - {None}:
+        recount_logs(PROVIDER, provider_id)
+
+def _report_counter_keys(customer_id, created_by_id):
+    return [(GLOBAL, 0), (CUSTOMER, customer_id), (PROVIDER, created_by_id)]
+
+@receiver(pre_save, sender=Report)
+def remember_report_state(sender, instance, **kwargs):
+    instance._counter_state = None
+    if instance.pk:
+        instance._counter_state = Report.objects.filter(pk=instance.pk).values_list(
+            'project__customer_id', 'created_by_id'
+        ).first()
+
+@receiver(post_save, sender=Report)
+def count_report_on_save(sender, instance, created, **kwargs):
+    new_keys = _report_counter_keys(instance.project.customer_id, instance.created_by_id)
+    old_state = getattr(instance, '_counter_state', None)
+    old_keys = _report_counter_keys(*old_state) if old_state else []
+    if old_keys == new_keys:
+        return
+    for scope, scope_id in old_keys:
+        increment(scope, scope_id, 'reports', -1)
+    for scope, scope_id in new_keys:
+        increment(scope, scope_id, 'reports')
+
+@receiver(post_delete, sender=Report)
+def count_report_on_delete(sender, instance, **kwargs):
+    customer_id = Project.objects.filter(pk=instance.project_id).values_list('customer_id', flat=True).first()
+    for scope, scope_id in _report_counter_keys(customer_id, instance.created_by_id):
+        increment(scope, scope_id, 'reports', -1)
+
+# Storage accounting. Sizes are recorded when a tracked file field is set, replaced
+# or its row deleted, so the usage totals never need a walk over MEDIA_ROOT.
+
+def remember_stored_file(sender, instance, **kwargs):
+    field = tracked_field(sender)[0]
+    instance._storage_state = None
+    if instance.pk:
+        old_name = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+        storage = sender._meta.get_field(field).storage
+        instance._storage_state = (old_name or '', stored_size(storage, old_name))
+
+def record_stored_file(sender, instance, created, **kwargs):
+    field_file = getattr(instance, tracked_field(sender)[0])
+    new_name = field_file.name or ''
+    old_name, old_size = getattr(instance, '_storage_state', None) or ('', 0)
+    if new_name == old_name:
+        return
+    project_id, customer_id = owner_ids(instance)
+    add_usage(project_id, customer_id, -old_size, -1 if old_name else 0)
+    if new_name:
+        add_usage(project_id, customer_id, stored_size(field_file.storage, new_name), 1)
+
+def remember_deleted_file(sender, instance, **kwargs):
+    # Runs before any receiver removes the file from disk
+    field_file = getattr(instance, tracked_field(sender)[0])
+    instance._storage_state = None
+    if field_file.name:
+        project_id, customer_id = owner_ids(instance)
+        instance._storage_state = (project_id, customer_id, stored_size(field_file.storage, field_file.name))
+
+def release_deleted_file(sender, instance, **kwargs):
+    state = getattr(instance, '_storage_state', None)
+    if state:
+        project_id, customer_id, size = state
+        add_usage(project_id, customer_id, -size, -1)
+
+for tracked_model, *_ in TRACKED_FILES:
+    pre_save.connect(remember_stored_file, sender=tracked_model, dispatch_uid=f'storage_pre_save_{tracked_model.__name__}')
+    post_save.connect(record_stored_file, sender=tracked_model, dispatch_uid=f'storage_post_save_{tracked_model.__name__}')
+    pre_delete.connect(remember_deleted_file, sender=tracked_model, dispatch_uid=f'storage_pre_delete_{tracked_model.__name__}')
+    post_delete.connect(release_deleted_file, sender=tracked_model, dispatch_uid=f'storage_post_delete_{tracked_model.__name__}')
+
+# Content-addressed uploads. Every row holding a blob is one reference; when the last
+# reference goes the file is journaled and removed by the process_file_deletions worker.
+
+def count_blob_reference(sender, instance, created, **kwargs):
+    field_file = instance.file
+    # remember_stored_file stashed the previous name
+    old_name = (getattr(instance, '_storage_state', None) or ('', 0))[0]
+    if field_file.name == old_name:
+        return
+    if field_file.name:
+        acquire_blob(field_file.name, stored_size(field_file.storage, field_file.name))
+    release_blob(old_name)
+
+def release_blob_reference(sender, instance, **kwargs):
+    release_blob(instance.file.name)
+
+for blob_model, field in BLOB_FIELDS:
+    post_save.connect(count_blob_reference, sender=blob_model, dispatch_uid=f'blob_post_save_{blob_model.__name__}')
+    post_delete.connect(release_blob_reference, sender=blob_model, dispatch_uid=f'blob_post_delete_{blob_model.__name__}')
+
+def _drop_storage_scope(scope, scope_id):
+    transaction.on_commit(lambda: StorageUsage.objects.filter(scope=scope, scope_id=scope_id).delete())
+
+@receiver(post_delete, sender=Project)
+def drop_project_storage(sender, instance, **kwargs):
+    _drop_storage_scope('project', instance.pk)
+
+@receiver(post_delete, sender=Customer)
+def drop_customer_storage(sender, instance, **kwargs):
+    _drop_storage_scope('customer', instance.pk)
+
+# Full-text search index (SQLite FTS5 only; MySQL maintains its FULLTEXT index itself)
+
+@receiver(post_save, sender=SEOLog)
+def index_seo_log_on_save(sender, instance, **kwargs):
+    index_logs([instance])
+
+@receiver(post_delete, sender=SEOLog)
+def unindex_seo_log_on_delete(sender, instance, **kwargs):
+    unindex_log(instance.pk)
+
+# Chunked uploads keep their part file outside MEDIA_ROOT until finalized
+
+@receiver(post_delete, sender=ChunkedUpload)
+def remove_chunked_upload_file(sender, instance, **kwargs):
+    path = instance.path
+    transaction.on_commit(lambda: remove_upload_file(path))
+
+# Resized variants of uploaded images are made by the process_image_derivatives worker
+
+@receiver(post_save, sender=SEOLogFile)
+def queue_seo_log_image(sender, instance, created, **kwargs):
+    if created and instance.is_image:
+        ImageDerivativeJob.enqueue(instance.file.name)
+
+@receiver(post_save, sender=ReportAttachment)
+def queue_attachment_image(sender, instance, created, **kwargs):
+    if created and instance.file_type == 'image':
+        ImageDerivativeJob.enqueue(instance.file.name)
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+BLOB_PREFIX = 'cas'
+
+
+def blob_name_for(digest, ext=''):
+    """Return the storage name of a blob: cas/ab/cd/abcd...ef.png"""
+    return f'{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(f'{BLOB_PREFIX}/')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores uploads under MEDIA_ROOT named by the SHA-256 of their content and
+    sharded two directory levels deep, so identical uploads share a single
+    file and no directory grows past a few hundred entries. The upload's name
+    only contributes its extension. StoredBlob rows count the references.
+
+    Names outside cas/ (files uploaded before the migrate_media_to_cas
+    command ran) are served and deleted as before.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name depends on the content and is chosen in _save
+        return name
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1].lower()[:10]
+
+        # Uploads screened by ScreenedUploadHandler were hashed while streaming in.
+        # Reusing a stored blob touches it, which tells drain_file_deletions that
+        # the file is being referenced again if it was just journaled for deletion
+        digest = getattr(content, 'sha256', None)
+        if digest:
+            try:
+                os.utime(self.path(blob_name_for(digest, ext)))
+                return blob_name_for(digest, ext)
+            except FileNotFoundError:
+                pass
+
+        directory = self.path(BLOB_PREFIX)
+        os.makedirs(directory, exist_ok=True)
+
+        # Hash while writing to a temporary file, then move it into place
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+
+            # Same content may already be stored; replacing it with identical
+            # bytes is harmless and gives it a fresh mtime, like the touch above
+            blob_name = blob_name_for(digest.hexdigest(), ext)
+            full_path = self.path(blob_name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return blob_name
+
+
+blob_store = ContentAddressedStorage()
+
+
+def get_blob_storage():
+    return blob_store
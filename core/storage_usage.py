@@ -0,0 +1,165 @@
+import os
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Customer, Media, ReportAttachment, ReportVersion, SEOLogFile, StorageUsage
+
+# Models with uploaded files: (model, file field, lookup to project id, lookup to customer id).
+# Usage is billed per referencing row: an upload identical to an earlier one
+# shares its content-addressed blob on disk but still counts for each row, so
+# the global total can exceed the 'disk' scan.
+TRACKED_FILES = [
+    (SEOLogFile, 'file', 'seo_log__project_id', 'seo_log__project__customer_id'),
+    (ReportAttachment, 'file', 'report_section__project_id', 'report_section__project__customer_id'),
+    (Media, 'file', 'seo_log__project_id', 'seo_log__project__customer_id'),
+    (ReportVersion, 'pdf_file', 'report__project_id', 'report__project__customer_id'),
+    (Customer, 'logo', None, 'id'),
+]
+
+
+def tracked_field(model):
+    for tracked_model, field, project_path, customer_path in TRACKED_FILES:
+        if tracked_model is model:
+            return field, project_path, customer_path
+    return None
+
+
+def stored_size(storage, name):
+    """Return the size of a stored file, or 0 if it is missing."""
+    if not name:
+        return 0
+    try:
+        return storage.size(name)
+    except OSError:
+        return 0
+
+
+def owner_ids(instance):
+    """Return (project_id, customer_id) the instance's file is billed to."""
+    field, project_path, customer_path = tracked_field(type(instance))
+    lookups = [path for path in (project_path, customer_path) if path]
+    row = type(instance).objects.filter(pk=instance.pk).values_list(*lookups).first()
+    if row is None:
+        return None, None
+    if project_path is None:
+        return None, row[0]
+    return row
+
+
+def add_usage(project_id, customer_id, bytes_delta, files_delta):
+    """Apply a size change to the global, customer and project totals."""
+    if not bytes_delta and not files_delta:
+        return
+    scopes = [('global', 0), ('customer', customer_id), ('project', project_id)]
+    for scope, scope_id in scopes:
+        if scope_id is None:
+            continue
+        usage = StorageUsage.objects.filter(scope=scope, scope_id=scope_id)
+        updated = usage.update(
+            bytes_used=F('bytes_used') + bytes_delta,
+            file_count=F('file_count') + files_delta
+        )
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                StorageUsage.objects.create(
+                    scope=scope, scope_id=scope_id, bytes_used=bytes_delta, file_count=files_delta
+                )
+        except IntegrityError:
+            usage.update(
+                bytes_used=F('bytes_used') + bytes_delta,
+                file_count=F('file_count') + files_delta
+            )
+
+
+def get_usage(scope, scope_id=0):
+    return StorageUsage.objects.filter(scope=scope, scope_id=scope_id).first()
+
+
+def top_customer_usage(limit=10):
+    """Return the customers using the most storage, each with a usage attribute."""
+    usages = list(StorageUsage.objects.filter(scope='customer').order_by('-bytes_used')[:limit])
+    customers = Customer.objects.in_bulk([usage.scope_id for usage in usages])
+    result = []
+    for usage in usages:
+        customer = customers.get(usage.scope_id)
+        if customer:
+            customer.usage = usage
+            result.append(customer)
+    return result
+
+
+def reconcile_storage():
+    """
+    Recompute every usage total by statting the files referenced in the
+    database, and measure the whole MEDIA_ROOT to expose orphaned files.
+    Slow on large trees; run it from the reconcile_storage command, never
+    from a request.
+
+    A blob shared by several rows counts once per row, matching add_usage.
+    Rows are locked and updated in place, so add_usage calls made while the
+    totals are written wait for them and are applied on top.
+    """
+    totals = {}
+
+    def add(scope, scope_id, size):
+        if scope_id is None:
+            return
+        bytes_used, file_count = totals.get((scope, scope_id), (0, 0))
+        totals[(scope, scope_id)] = (bytes_used + size, file_count + 1)
+
+    for model, field, project_path, customer_path in TRACKED_FILES:
+        storage = model._meta.get_field(field).storage
+        lookups = [field] + [path for path in (project_path, customer_path) if path]
+        rows = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+        for row in rows.values_list(*lookups).iterator(chunk_size=2000):
+            name = row[0]
+            if project_path:
+                project_id, customer_id = row[1], row[2]
+            else:
+                project_id, customer_id = None, row[1]
+            size = stored_size(storage, name)
+            add('global', 0, size)
+            add('customer', customer_id, size)
+            add('project', project_id, size)
+
+    disk_bytes = 0
+    disk_files = 0
+    for dirpath, dirnames, filenames in os.walk(settings.MEDIA_ROOT):
+        for f in filenames:
+            try:
+                disk_bytes += os.path.getsize(os.path.join(dirpath, f))
+            except OSError:
+                continue
+            disk_files += 1
+    totals[('disk', 0)] = (disk_bytes, disk_files)
+    totals.setdefault(('global', 0), (0, 0))
+
+    now = timezone.now()
+    with transaction.atomic():
+        existing = {
+            (usage.scope, usage.scope_id): usage
+            for usage in StorageUsage.objects.select_for_update().order_by('pk')
+        }
+        changed = []
+        for key, usage in existing.items():
+            # Scopes with no files left (e.g. deleted projects) drop to zero
+            usage.bytes_used, usage.file_count = totals.get(key, (0, 0))
+            usage.reconciled_at = now
+            changed.append(usage)
+        StorageUsage.objects.bulk_update(
+            changed, ['bytes_used', 'file_count', 'reconciled_at'], batch_size=500
+        )
+        StorageUsage.objects.bulk_create([
+            StorageUsage(
+                scope=scope, scope_id=scope_id, bytes_used=bytes_used,
+                file_count=file_count, reconciled_at=now
+            )
+            for (scope, scope_id), (bytes_used, file_count) in totals.items()
+            if (scope, scope_id) not in existing
+        ], batch_size=500)
+    return totals
@@ -0,0 +1,20 @@
+from django import template
+from django.core.files.storage import default_storage
+
+from core.images import derivative_exists, derivative_name
+
+register = template.Library()
+
+
+@register.filter
+def derivative(field_file, variant):
+    """
+    URL of the thumb, web or print variant of an uploaded image, or of the
+    original while the background worker has not generated it yet.
+    """
+    if not field_file:
+        return ''
+    name = derivative_name(field_file.name, variant)
+    if derivative_exists(name):
+        return default_storage.url(name)
+    return field_file.url
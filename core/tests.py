@@ -1,3 +1,2052 @@
-from django.test import TestCase
+import csv
+import datetime
+import hashlib
+import importlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.http import QueryDict
+from django.test import Client, RequestFactory, TestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+from openpyxl import Workbook, load_workbook
+from PIL import Image
+
+from .chunked_uploads import UploadError, expire_stale_uploads, finalize_upload
+from .counters import CUSTOMER, GLOBAL, PROVIDER, read_counters
+from .downloads import serve_file
+from .exports import report_folder
+from .file_cleanup import drain_file_deletions, find_orphan_files, referenced_names
+from .forms import ReportAttachmentForm, SEOLogForm
+from .images import (
+    derivative_exists, derivative_name, derivative_names, forget_derivatives, generate_derivatives
+)
+from .log_import import LogImportError, import_seo_logs, save_batch
+from .models import (
+    AttachmentAccess, ChunkedUpload, CustomUser, Customer, DashboardCounter, ImageDerivativeJob, Notification,
+    PendingFileDeletion, Project, Report, ReportAttachment, ReportRenderJob, ReportSection, ReportSectionOrder,
+    SEOLog, SEOLogFile, StorageUsage, StoredBlob, UserSettings
+)
+from .pagination import decode_cursor, encode_cursor, keyset_page
+from .pdf import read_cached_pdf, render_report_html, render_report_pdf, save_rendered_pdf
+from .pdf_cache import evict_pdf_cache, get_cached_pdf, report_fingerprint, store_pdf
+from .pdf_fetcher import LocalURLError, contained_path, local_path, make_url_fetcher
+from .render_pool import RenderPool
+from .report_loader import load_report
+from .sanitize import content_hash
+from .search import _mysql_query, search_backend, search_logs, unindex_log
+from .storage_usage import get_usage, reconcile_storage
+from .templatetags.media_tags import derivative
+from .uploads import ScreenedUploadHandler, sniff_content_type
+
+
+class TempDirsMixin:
+    """Point MEDIA_ROOT and any other directory settings listed in temp_dirs at fresh temporary directories."""
+
+    temp_dirs = ['MEDIA_ROOT']
+
+    def setUp(self):
+        super().setUp()
+        paths = {}
+        for name in self.temp_dirs:
+            paths[name] = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, paths[name], ignore_errors=True)
+        override = override_settings(**paths)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class DashboardQueryBudgetTests(TestCase):
+    """The dashboard must run a fixed number of queries however many projects exist."""
+
+    # Session + user lookup, dashboard counters, active projects, recent logs, recent reports,
+    # and the customer lookup for customer accounts
+    QUERY_BUDGET = 7
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('dash_admin', 'admin@example.com', 'pw', role='admin')
+        self.provider = CustomUser.objects.create_user('dash_provider', 'provider@example.com', 'pw', role='provider')
+        self.customer_user = CustomUser.objects.create_user('dash_customer', 'customer@example.com', 'pw', role='customer')
+        self.customer = Customer.objects.create(
+            name='Acme', email='customer@example.com', website='https://example.com'
+        )
+
+    def add_projects(self, count):
+        today = datetime.date.today()
+        for i in range(count):
+            project = Project.objects.create(
+                customer=self.customer, name=f'Project {i}', description='', start_date=today
+            )
+            project.providers.add(self.provider)
+            for work_type in ['on_page', 'technical']:
+                SEOLog.objects.create(
+                    project=project, date=today, created_by=self.provider,
+                    work_type=work_type, description='<p>Work</p>'
+                )
+            Report.objects.create(project=project, title=f'Report {i}', created_by=self.provider)
+
+    def count_dashboard_queries(self, user):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_is_independent_of_project_count(self):
+        for user in [self.admin, self.provider, self.customer_user]:
+            with self.subTest(role=user.role):
+                self.add_projects(1)
+                few = self.count_dashboard_queries(user)
+                self.add_projects(10)
+                many = self.count_dashboard_queries(user)
+                self.assertEqual(few, many)
+                self.assertLessEqual(many, self.QUERY_BUDGET)
+
+    def test_progress_and_counts(self):
+        self.add_projects(3)
+        self.client.force_login(self.provider)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['customer_count'], 1)
+        self.assertEqual(response.context['active_projects_count'], 3)
+        self.assertEqual(response.context['todays_logs_count'], 6)
+        self.assertEqual(response.context['reports_count'], 3)
+        self.assertEqual([p.progress for p in response.context['active_projects']], [0, 0, 0])
+
+
+class DashboardCounterTests(TestCase):
+    """Signal-maintained counters must agree with a full rebuild."""
+
+    def setUp(self):
+        self.provider = CustomUser.objects.create_user('count_provider', 'p@example.com', 'pw', role='provider')
+        self.customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        self.today = datetime.date.today()
+
+    def snapshot(self):
+        return {
+            (scope, scope_id): read_counters(scope, scope_id, self.today)
+            for scope, scope_id in [(GLOBAL, 0), (CUSTOMER, self.customer.pk), (PROVIDER, self.provider.pk)]
+        }
+
+    def test_counters_match_rebuild(self):
+        project = Project.objects.create(customer=self.customer, name='Site', description='', start_date=self.today)
+        project.providers.add(self.provider)
+        log = SEOLog.objects.create(project=project, date=self.today, created_by=self.provider, work_type='content')
+        SEOLog.objects.create(project=project, date=self.today, created_by=self.provider, work_type='other')
+        Report.objects.create(project=project, title='Monthly', created_by=self.provider)
+
+        log.date = self.today - datetime.timedelta(days=1)
+        log.save()
+        project.is_active = False
+        project.save()
+        other = Project.objects.create(customer=self.customer, name='Blog', description='', start_date=self.today)
+        other.providers.add(self.provider)
+        other.delete()
+
+        incremental = self.snapshot()
+        self.assertEqual(incremental[(GLOBAL, 0)], {
+            'customer_count': 1,
+            'active_projects_count': 0,
+            'todays_logs_count': 1,
+            'reports_count': 1,
+        })
+
+        self.assert_matches_rebuild(incremental)
+
+    def assert_matches_rebuild(self, incremental):
+        DashboardCounter.objects.update(value=0)
+        call_command('rebuild_counters', stdout=io.StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_moving_a_report_moves_its_count(self):
+        other_provider = CustomUser.objects.create_user('count_other', 'o@example.com', 'pw', role='provider')
+        other_customer = Customer.objects.create(name='Globex', email='g@example.com', website='https://globex.example')
+        project = Project.objects.create(customer=self.customer, name='Site', description='', start_date=self.today)
+        other = Project.objects.create(customer=other_customer, name='Shop', description='', start_date=self.today)
+        report = Report.objects.create(project=project, title='Monthly', created_by=self.provider)
+
+        report.project = other
+        report.created_by = other_provider
+        report.save()
+        self.assertEqual(read_counters(CUSTOMER, self.customer.pk, self.today)['reports_count'], 0)
+        self.assertEqual(read_counters(CUSTOMER, other_customer.pk, self.today)['reports_count'], 1)
+        self.assertEqual(read_counters(PROVIDER, self.provider.pk, self.today)['reports_count'], 0)
+        self.assertEqual(read_counters(PROVIDER, other_provider.pk, self.today)['reports_count'], 1)
+        self.assertEqual(read_counters(GLOBAL, 0, self.today)['reports_count'], 1)
+        self.assert_matches_rebuild(self.snapshot())
+
+    def test_cascaded_log_deletes_recount_once(self):
+        project = Project.objects.create(customer=self.customer, name='Site', description='', start_date=self.today)
+        kept = Project.objects.create(customer=self.customer, name='Blog', description='', start_date=self.today)
+        for i in range(20):
+            SEOLog.objects.create(project=project, date=self.today, created_by=self.provider, work_type='content')
+        SEOLog.objects.create(project=kept, date=self.today, created_by=self.provider, work_type='content')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                project.delete()
+        log_counter_updates = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE') and 'core_dashboardcounter' in query['sql'] and 'logs:' in query['sql']
+        ]
+        self.assertEqual(log_counter_updates, [])
+        self.assertEqual(read_counters(GLOBAL, 0, self.today)['todays_logs_count'], 1)
+        self.assertEqual(read_counters(PROVIDER, self.provider.pk, self.today)['todays_logs_count'], 1)
+        self.assert_matches_rebuild(self.snapshot())
+
+    def test_queryset_log_delete(self):
+        project = Project.objects.create(customer=self.customer, name='Site', description='', start_date=self.today)
+        for day in range(3):
+            SEOLog.objects.create(project=project, date=self.today, created_by=self.provider, work_type='content')
+        with self.captureOnCommitCallbacks(execute=True):
+            SEOLog.objects.filter(project=project).delete()
+        self.assertEqual(read_counters(CUSTOMER, self.customer.pk, self.today)['todays_logs_count'], 0)
+
+    def test_migration_backfills_existing_rows(self):
+        project = Project.objects.create(customer=self.customer, name='Site', description='', start_date=self.today)
+        project.providers.add(self.provider)
+        SEOLog.objects.create(project=project, date=self.today, created_by=self.provider, work_type='content')
+        Report.objects.create(project=project, title='Monthly', created_by=self.provider)
+        incremental = self.snapshot()
+
+        # Rows created before the counters table existed have no counters
+        DashboardCounter.objects.all().delete()
+        migration = importlib.import_module('core.migrations.0031_backfill_dashboard_counters')
+        migration.backfill_counters(None, None)
+        self.assertEqual(self.snapshot(), incremental)
+
+
+class ReportLoadingQueryTests(TestCase):
+    """Report pages and the PDF HTML must load the whole report in a fixed number of queries."""
+
+    # Report with project, customer and people; sections; attachments; SEO logs; log files
+    PDF_QUERY_BUDGET = 5
+    # Session + user lookup, the report graph above, and the version list on the detail page
+    PAGE_QUERY_BUDGET = 8
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('load_admin', 'admin@example.com', 'pw', role='admin')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        self.project = Project.objects.create(
+            customer=customer, name='Site', description='', start_date=datetime.date.today()
+        )
+        self.report = Report.objects.create(project=self.project, title='Monthly', created_by=self.admin)
+
+    def add_sections(self, count):
+        start = self.report.reportsectionorder_set.count()
+        for i in range(start, start + count):
+            section = ReportSection.objects.create(project=self.project, title=f'Section {i}', content='')
+            ReportSectionOrder.objects.create(report=self.report, section=section, order=i + 1)
+            ReportAttachment.objects.bulk_create([
+                ReportAttachment(report_section=section, title=f'File {j}', file_type='document', file_size=0)
+                for j in range(2)
+            ])
+            log = SEOLog.objects.create(
+                project=self.project, date=datetime.date.today(), created_by=self.admin, work_type='content'
+            )
+            SEOLogFile.objects.bulk_create([
+                SEOLogFile(seo_log=log, work_type='content', file_name=f'{j}.pdf', file_type='application/pdf', file_size=0)
+                for j in range(2)
+            ])
+            section.seo_logs.add(log)
+
+    def count_queries(self, render):
+        with CaptureQueriesContext(connection) as queries:
+            render()
+        return len(queries)
+
+    def test_pdf_html_query_count(self):
+        self.add_sections(1)
+        few = self.count_queries(lambda: render_report_html(self.report))
+        self.add_sections(5)
+        many = self.count_queries(lambda: render_report_html(self.report))
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, self.PDF_QUERY_BUDGET)
+
+    def test_report_page_query_counts(self):
+        self.client.force_login(self.admin)
+        for name in ['report_detail', 'report_edit']:
+            with self.subTest(view=name):
+                url = reverse(name, args=[self.report.pk])
+                self.add_sections(1)
+                few = self.count_queries(lambda: self.assertEqual(self.client.get(url).status_code, 200))
+                self.add_sections(5)
+                many = self.count_queries(lambda: self.assertEqual(self.client.get(url).status_code, 200))
+                self.assertEqual(few, many)
+                self.assertLessEqual(many, self.PAGE_QUERY_BUDGET)
+
+    def test_sections_follow_report_order(self):
+        self.add_sections(3)
+        ReportSectionOrder.objects.filter(report=self.report, order=1).update(order=10, page_break_before=False)
+        sections = load_report(self.report)['sections']
+        self.assertEqual([section.title for section in sections], ['Section 1', 'Section 2', 'Section 0'])
+        self.assertFalse(sections[-1].page_break_before)
+
+
+@skipUnlessDBFeature('supports_explaining_query_execution')
+class QueryPlanTests(TestCase):
+    """
+    The hot list queries must be answered by an index range scan in the requested
+    order, never a full scan followed by a filesort (MySQL) or temp B-tree (SQLite).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user('plan_admin', 'admin@example.com', 'pw', role='admin')
+        cls.provider = CustomUser.objects.create_user('plan_provider', 'provider@example.com', 'pw', role='provider')
+        other = CustomUser.objects.create_user('plan_other', 'other@example.com', 'pw', role='provider')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        today = datetime.date.today()
+        cls.projects = [
+            Project.objects.create(customer=customer, name=f'Site {i}', description='', start_date=today)
+            for i in range(10)
+        ]
+        SEOLog.objects.bulk_create([
+            SEOLog(
+                project=cls.projects[i % 10], date=today - datetime.timedelta(days=i % 90),
+                created_by=cls.provider if i % 3 else other, work_type='other'
+            )
+            for i in range(600)
+        ])
+        Report.objects.bulk_create([
+            Report(project=cls.projects[i % 10], title=f'Report {i}', created_by=cls.provider)
+            for i in range(100)
+        ])
+        Notification.objects.bulk_create([
+            Notification(user=cls.provider if i % 2 else other, type='seo_log_added', title='Log', message='', is_read=i % 3 == 0)
+            for i in range(200)
+        ])
+        section = ReportSection.objects.create(project=cls.projects[0], title='Links', content='')
+        cls.attachment = ReportAttachment.objects.create(
+            report_section=section, title='Backlinks', file_type='other', file_size=0
+        )
+        AttachmentAccess.objects.bulk_create([
+            AttachmentAccess(attachment=cls.attachment, user=cls.provider) for i in range(50)
+        ])
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute('ANALYZE TABLE core_seolog, core_report, core_notification, core_attachmentaccess')
+            else:
+                cursor.execute('ANALYZE')
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+            return '\n'.join(' '.join(str(value) for value in row) for row in cursor.fetchall())
+
+    def assertIndexRangeScan(self, plan, index_name):
+        self.assertIn(index_name, plan)
+        self.assertNotIn('filesort', plan.lower())
+        self.assertNotIn('TEMP B-TREE', plan)
+        if connection.vendor == 'sqlite':
+            self.assertIn('SEARCH', plan)
+
+    def view_plan(self, user, url, table, params=None):
+        """Request a view and EXPLAIN the ordered query it ran against table."""
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        quoted = connection.ops.quote_name(table)
+        statements = [
+            query['sql'] for query in queries
+            if f'FROM {quoted}' in query['sql'] and 'ORDER BY' in query['sql']
+        ]
+        self.assertTrue(statements, f'{url} ran no ordered query on {table}')
+        return self.explain(statements[0])
+
+    def test_seo_log_list_by_project(self):
+        plan = self.view_plan(self.admin, reverse('seo_logs'), 'core_seolog', {'project': self.projects[0].pk})
+        self.assertIndexRangeScan(plan, 'seolog_project_date_idx')
+
+    def test_seo_log_list_for_provider(self):
+        plan = self.view_plan(self.provider, reverse('seo_logs'), 'core_seolog')
+        self.assertIndexRangeScan(plan, 'seolog_author_date_idx')
+
+    def test_seo_log_list_next_page(self):
+        log = SEOLog.objects.order_by('-date', '-id')[50]
+        plan = self.view_plan(self.admin, reverse('seo_logs'), 'core_seolog', {'cursor': f'{log.date.isoformat()}_{log.pk}'})
+        self.assertIndexRangeScan(plan, 'seolog_date_idx')
+
+    def test_project_detail_logs(self):
+        plan = self.view_plan(self.admin, reverse('project_detail', args=[self.projects[0].pk]), 'core_seolog')
+        self.assertIndexRangeScan(plan, 'seolog_project_date_idx')
+
+    def test_project_reports(self):
+        reports = Report.objects.filter(project=self.projects[0]).order_by('-created_at')
+        self.assertIndexRangeScan(reports.explain(), 'report_project_created_idx')
+
+    def test_attachment_access_log(self):
+        accesses = AttachmentAccess.objects.filter(attachment=self.attachment).order_by('-accessed_at')
+        self.assertIndexRangeScan(accesses.explain(), 'access_attachment_time_idx')
+
+    def test_unread_notifications(self):
+        if connection.vendor == 'sqlite':
+            # Django compiles is_read=False to "NOT is_read" on SQLite, which cannot
+            # match an index column; MySQL gets "is_read = False" and uses the index
+            self.skipTest('boolean lookups are not index-matched on SQLite')
+        unread = Notification.objects.filter(user=self.provider, is_read=False).order_by('-created_at')
+        self.assertIndexRangeScan(unread.explain(), 'notification_user_unread_idx')
+
+
+class InlineRenderPool:
+    """RenderPool stand-in that renders in this process; renders returning no result never finish."""
+
+    def __init__(self, processes, timeout=None):
+        self.slots = [mock.Mock(job=None, busy=False) for i in range(processes)]
+        self.closed = False
+
+    def has_free_slot(self):
+        return any(not slot.busy for slot in self.slots)
+
+    def in_flight(self):
+        return sum(1 for slot in self.slots if slot.busy)
+
+    def submit(self, job, func, *args):
+        slot = next(slot for slot in self.slots if not slot.busy)
+        slot.job, slot.busy, slot.result = job, True, func(*args)
+
+    def collect(self):
+        finished = []
+        for slot in self.slots:
+            if slot.busy and slot.result is not None:
+                pdf, error, rss = slot.result
+                finished.append((slot.job, pdf, error))
+                slot.job, slot.busy = None, False
+        return finished
+
+    def close(self):
+        self.closed = True
+
+
+class ReportExportTests(TempDirsMixin, TestCase):
+    """The ZIP export sends ready PDFs and attachments, renders the rest for a bounded time and queues leftovers."""
+
+    temp_dirs = ['MEDIA_ROOT', 'REPORT_PDF_CACHE_DIR']
+
+    def setUp(self):
+        super().setUp()
+        self.admin = CustomUser.objects.create_user('export_admin', 'admin@example.com', 'pw', role='admin')
+        self.provider = CustomUser.objects.create_user('export_provider', 'provider@example.com', 'pw', role='provider')
+        self.outsider = CustomUser.objects.create_user('export_outsider', 'outsider@example.com', 'pw', role='provider')
+        self.customer_user = CustomUser.objects.create_user('export_customer', 'acme@example.com', 'pw', role='customer')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        self.project = Project.objects.create(
+            customer=customer, name='Site', description='', start_date=datetime.date.today()
+        )
+        self.project.providers.add(self.provider)
+
+        self.ready = Report.objects.create(
+            project=self.project, title='Ready', created_by=self.admin, status='published'
+        )
+        section = ReportSection.objects.create(project=self.project, title='Links', content='')
+        ReportSectionOrder.objects.create(report=self.ready, section=section, order=1)
+        ReportAttachment.objects.create(
+            report_section=section, title='Backlinks', file=ContentFile(b'url,rank\n', name='links.csv'),
+            file_type='other', file_size=9
+        )
+        store_pdf(report_fingerprint(self.ready), b'%PDF-ready')
+        self.pending = Report.objects.create(
+            project=self.project, title='Pending', created_by=self.admin, status='published'
+        )
+        self.draft = Report.objects.create(project=self.project, title='Draft', created_by=self.admin)
+
+        patcher = mock.patch('core.exports.RenderPool', InlineRenderPool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.render = mock.Mock(return_value=(b'%PDF-rendered', None, 0))
+        patcher = mock.patch('core.exports.render_in_child', self.render)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def export(self, user, **params):
+        self.client.force_login(user)
+        return self.client.get(reverse('report_export'), {'project': self.project.pk, **params})
+
+    def read_zip(self, response):
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        return zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_archive_contents(self):
+        archive = self.read_zip(self.export(self.admin))
+        ready = report_folder(self.ready)
+        self.assertEqual(sorted(archive.namelist()), sorted([
+            f'{ready}.pdf', f'{ready}/attachments/Backlinks.csv', f'{report_folder(self.pending)}.pdf'
+        ]))
+        self.assertEqual(archive.read(f'{ready}.pdf'), b'%PDF-ready')
+        self.assertEqual(archive.read(f'{ready}/attachments/Backlinks.csv'), b'url,rank\n')
+
+        # The unrendered report is rendered during the export and cached for the next one
+        self.assertEqual(archive.read(f'{report_folder(self.pending)}.pdf'), b'%PDF-rendered')
+        self.render.assert_called_once_with(self.pending.pk, mock.ANY)
+        with open(get_cached_pdf(report_fingerprint(self.pending)), 'rb') as f:
+            self.assertEqual(f.read(), b'%PDF-rendered')
+        self.assertFalse(ReportRenderJob.objects.exists())
+
+    @override_settings(REPORT_EXPORT_RENDER_WAIT=0.2)
+    def test_slow_render_is_queued(self):
+        self.render.return_value = None
+        archive = self.read_zip(self.export(self.admin))
+        self.assertNotIn(f'{report_folder(self.pending)}.pdf', archive.namelist())
+        errors = archive.read('errors.txt').decode()
+        self.assertIn(f'{report_folder(self.pending)}.pdf: not rendered in time, it has been queued', errors)
+        self.assertEqual(
+            list(ReportRenderJob.objects.values_list('report_id', 'status')), [(self.pending.pk, 'queued')]
+        )
+
+    def test_failed_render_is_reported(self):
+        self.render.return_value = (None, 'Rendering failed: bad font', 0)
+        archive = self.read_zip(self.export(self.admin))
+        errors = archive.read('errors.txt').decode()
+        self.assertIn(f'{report_folder(self.pending)}.pdf: Rendering failed: bad font', errors)
+        self.assertFalse(ReportRenderJob.objects.exists())
+
+    @override_settings(REPORT_EXPORT_RENDER_WAIT=0)
+    def test_render_wait_disabled(self):
+        archive = self.read_zip(self.export(self.admin))
+        self.render.assert_not_called()
+        self.assertIn('not rendered in time', archive.read('errors.txt').decode())
+        self.assertTrue(ReportRenderJob.objects.filter(report=self.pending, status='queued').exists())
+
+    def test_status_filter(self):
+        archive = self.read_zip(self.export(self.admin, status='draft'))
+        self.assertEqual(archive.namelist(), [f'{report_folder(self.draft)}.pdf'])
+
+    def test_permissions(self):
+        # Providers only see the reports of their own projects
+        response = self.export(self.outsider)
+        self.assertRedirects(response, reverse('project_detail', args=[self.project.pk]), fetch_redirect_response=False)
+
+        response = self.export(self.customer_user)
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.assertFalse(ReportRenderJob.objects.exists())
+
+        archive = self.read_zip(self.export(self.provider))
+        self.assertIn(f'{report_folder(self.ready)}.pdf', archive.namelist())
+
+
+@override_settings(ALLOWED_HOSTS=['seo.example.com'])
+class PDFFetcherPathTests(TempDirsMixin, TestCase):
+    """Report renders read this site's media from disk and never escape MEDIA_ROOT or request our own URLs."""
+
+    BASE_URL = 'https://seo.example.com/'
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = settings.MEDIA_ROOT
+        os.makedirs(os.path.join(self.media_root, 'logos'))
+        with open(os.path.join(self.media_root, 'logos', 'acme.png'), 'wb') as f:
+            f.write(b'png')
+
+        outside = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outside, ignore_errors=True)
+        with open(os.path.join(outside, 'secret.txt'), 'w') as f:
+            f.write('secret')
+        self.outside = outside
+
+    def test_media_urls_map_to_files(self):
+        expected = os.path.join(self.media_root, 'logos', 'acme.png')
+        for url in [
+            '/media/logos/acme.png',
+            'https://seo.example.com/media/logos/acme.png',
+            'http://SEO.example.com:8000/media/logos/acme.png',
+            'https://seo.example.com/media/logos/%61cme.png',
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(local_path(url, self.BASE_URL), expected)
+
+    def test_traversal_is_refused(self):
+        for url in [
+            '/media/../secret.txt',
+            '/media/logos/../../secret.txt',
+            'https://seo.example.com/media/%2e%2e/secret.txt',
+            'https://seo.example.com/media/logos/%2E%2E/%2e%2e/secret.txt',
+            '/media/logos%2f..%2f..%2fsecret.txt',
+            '/media/logos/acme.png%00.txt',
+        ]:
+            with self.subTest(url=url):
+                with self.assertRaises(LocalURLError):
+                    local_path(url, self.BASE_URL)
+
+    def test_symlink_out_of_media_root_is_refused(self):
+        os.symlink(self.outside, os.path.join(self.media_root, 'escape'))
+        os.symlink(os.path.join(self.outside, 'secret.txt'), os.path.join(self.media_root, 'logos', 'secret.txt'))
+        for url in ['/media/escape/secret.txt', '/media/logos/secret.txt']:
+            with self.subTest(url=url):
+                with self.assertRaises(LocalURLError):
+                    local_path(url, self.BASE_URL)
+        with self.assertRaises(LocalURLError):
+            contained_path(self.media_root, 'escape/secret.txt')
+
+    def test_own_host_urls_outside_media_are_refused(self):
+        # These would otherwise become HTTP requests against our own server
+        for url in [
+            'https://seo.example.com/reports/1/download/',
+            'http://seo.example.com/admin/',
+            '/accounts/login/',
+            'https://user@seo.example.com/',
+        ]:
+            with self.subTest(url=url):
+                with self.assertRaises(LocalURLError):
+                    local_path(url, self.BASE_URL)
+
+    def test_foreign_urls_are_not_local(self):
+        # The fetcher sends these to WeasyPrint, whose allowed protocols refuse file:
+        for url in [
+            'https://cdn.example.org/media/logo.png',
+            'https://seo.example.com.evil.org/media/logo.png',
+            'data:image/png;base64,iVBORw0KGgo=',
+            'file:///etc/passwd',
+        ]:
+            with self.subTest(url=url):
+                self.assertIsNone(local_path(url, self.BASE_URL))
+
+
+PNG_BYTES = b'\x89PNG\r\n\x1a\n' + b'\x00' * 200
+
+
+class UploadScreeningTests(TempDirsMixin, TestCase):
+    """Uploads are typed by their content and held to the per-file and per-request quotas."""
+
+    def setUp(self):
+        super().setUp()
+        self.provider = CustomUser.objects.create_user('upload_provider', 'p@example.com', 'pw', role='provider')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        self.project = Project.objects.create(
+            customer=customer, name='Site', description='', start_date=datetime.date.today()
+        )
+        self.project.providers.add(self.provider)
+        self.client.force_login(self.provider)
+
+    def add_log(self, *files, client=None):
+        return (client or self.client).post(reverse('seo_log_add'), {
+            'project': self.project.pk,
+            'date': datetime.date.today().isoformat(),
+            'work_type': 'content',
+            'description': '<p>Work</p>',
+            'files': list(files),
+        })
+
+    def test_sniffing(self):
+        cases = [
+            (b'\xff\xd8\xff\xe0JFIF', 'a.jpg', 'image/jpeg'),
+            (PNG_BYTES, 'a.pdf', 'image/png'),  # The content decides, not the extension
+            (b'%PDF-1.7', 'a.pdf', 'application/pdf'),
+            (b'\x00\x00\x00\x18ftypisom', 'a.mp4', 'video/mp4'),
+            (b'\x00\x00\x00\x18ftypqt  ', 'a.mov', 'video/quicktime'),
+            (b'\x00\x00\x00\x18ftyp3gp5', 'a.3gp', 'video/3gpp'),
+            (b'\x00\x00\x00\x18ftypheic', 'a.heic', 'image/heic'),
+            (b'\x00\x00\x00\x1cftypavif', 'a.avif', 'image/avif'),
+            (b'\x00\x00\x00\x18ftypzzzz', 'a.mp4', None),
+            (b'PK\x03\x04rest', 'a.docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+            (b'PK\x03\x04rest', 'a.zip', None),
+            (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'a.xls', 'application/vnd.ms-excel'),
+            (b'MZ\x90\x00', 'a.jpg', None),
+            ('project,date\nSite,2024-01-01\u00e9'.encode(), 'a.csv', 'text/csv'),
+            (b'col\x00\x01\x02', 'a.csv', None),
+            (b'plain text', 'a.jpg', None),
+        ]
+        for head, name, expected in cases:
+            with self.subTest(name=name, head=head[:12]):
+                self.assertEqual(sniff_content_type(head, name), expected)
+
+    def test_spoofed_extension_is_rejected(self):
+        response = self.add_log(SimpleUploadedFile('photo.jpg', b'MZ\x90\x00' * 50, content_type='image/jpeg'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('File photo.jpg has an unsupported format.', response.context['form'].errors['files'])
+        self.assertFalse(SEOLog.objects.exists())
+
+    def test_accepted_upload_is_stored_by_content_hash(self):
+        response = self.add_log(SimpleUploadedFile('chart.png', PNG_BYTES, content_type='application/pdf'))
+        self.assertRedirects(response, reverse('seo_logs'), fetch_redirect_response=False)
+        log_file = SEOLogFile.objects.get()
+        self.assertIn(hashlib.sha256(PNG_BYTES).hexdigest(), log_file.file.name)
+        self.assertEqual(log_file.file.read(), PNG_BYTES)
+
+    @override_settings(UPLOAD_MAX_FILE_SIZE=100)
+    def test_file_quota(self):
+        response = self.add_log(SimpleUploadedFile('big.png', PNG_BYTES, content_type='image/png'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('too large', ' '.join(response.context['form'].errors['files']))
+        self.assertFalse(SEOLog.objects.exists())
+
+    def test_form_accepts_every_sniffed_type(self):
+        video = b'\x00\x00\x00\x18ftypisom' + b'\x00' * 100
+        response = self.add_log(
+            SimpleUploadedFile('clip.mp4', video, content_type='application/octet-stream'),
+            SimpleUploadedFile('links.csv', b'url,rank\n', content_type='application/octet-stream'),
+        )
+        self.assertRedirects(response, reverse('seo_logs'), fetch_redirect_response=False)
+        self.assertEqual(sorted(SEOLogFile.objects.values_list('file_name', flat=True)), ['clip.mp4', 'links.csv'])
+
+    @override_settings(UPLOAD_MAX_FILE_SIZE=2 * 1024 * 1024)
+    def test_form_size_limits_follow_the_setting(self):
+        big = SimpleUploadedFile('big.pdf', b'%PDF-' + b'x' * (3 * 1024 * 1024), content_type='application/pdf')
+        form = SEOLogForm(
+            data={'project': self.project.pk, 'date': datetime.date.today(), 'work_type': 'content',
+                  'description': '<p>Work</p>'},
+            files=MultiValueDict({'files': [big]}), user=self.provider,
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('File big.pdf is too large. Maximum size is 2MB.', form.errors['files'])
+
+        form = ReportAttachmentForm(data={'title': 'Big'}, files={'file': big})
+        self.assertFalse(form.is_valid())
+        self.assertIn('File big.pdf is too large. Maximum size is 2MB.', form.errors['file'])
+
+    @override_settings(UPLOAD_MAX_REQUEST_SIZE=1000)
+    def test_request_quota_stops_before_the_view(self):
+        response = self.add_log(SimpleUploadedFile('big.png', PNG_BYTES * 10, content_type='image/png'))
+        self.assertRedirects(response, reverse('seo_log_add'), fetch_redirect_response=False)
+        self.assertFalse(SEOLog.objects.exists())
+
+    @override_settings(UPLOAD_MAX_REQUEST_SIZE=1000)
+    def test_request_quota_counts_the_body_read(self):
+        # A body larger than its Content-Length said stops at the limit
+        handler = ScreenedUploadHandler()
+        handler.handle_raw_input(None, {}, 500, b'boundary')
+        handler.new_file('files', 'big.png', 'image/png', None)
+        handler.receive_data_chunk(PNG_BYTES * 3, 0)
+        with self.assertRaises(StopUpload) as stopped:
+            handler.receive_data_chunk(PNG_BYTES * 3, len(PNG_BYTES) * 3)
+        self.assertTrue(stopped.exception.connection_reset)
+        self.assertTrue(handler.request_rejected)
+
+    def test_csrf_is_still_checked(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.provider)
+        response = self.add_log(SimpleUploadedFile('chart.png', PNG_BYTES, content_type='image/png'), client=client)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(SEOLog.objects.exists())
+
+    @override_settings(UPLOAD_MAX_FILE_SIZE=10)
+    def test_other_views_keep_default_handlers(self):
+        logo = io.BytesIO()
+        Image.new('RGB', (20, 20), 'red').save(logo, 'PNG')
+        admin = CustomUser.objects.create_user('upload_admin', 'a@example.com', 'pw', role='admin')
+        self.client.force_login(admin)
+        self.client.post(reverse('customer_add'), {
+            'name': 'Logo Co', 'email': 'logo@example.com', 'website': 'https://logo.example.com',
+            'logo': SimpleUploadedFile('logo.png', logo.getvalue(), content_type='image/png'),
+        })
+        self.assertEqual(Customer.objects.get(name='Logo Co').logo.size, len(logo.getvalue()))
+
+
+@override_settings(CHUNKED_UPLOAD_CHUNK_SIZE=64)
+class ChunkedUploadTests(TempDirsMixin, TestCase):
+    """Resumable uploads accept chunks in any order and attach the file exactly once."""
+
+    temp_dirs = ['MEDIA_ROOT', 'CHUNKED_UPLOAD_DIR']
+
+    def setUp(self):
+        super().setUp()
+        self.provider = CustomUser.objects.create_user('chunk_provider', 'p@example.com', 'pw', role='provider')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        project = Project.objects.create(customer=customer, name='Site', description='', start_date=datetime.date.today())
+        self.log = SEOLog.objects.create(
+            project=project, date=datetime.date.today(), created_by=self.provider, work_type='content'
+        )
+        self.data = PNG_BYTES[:150]
+        self.client.force_login(self.provider)
+
+    def create(self, **params):
+        response = self.client.post(reverse('chunked_upload_create', args=[self.log.pk]), {
+            'file_name': 'crawl.png', 'size': len(self.data), **params
+        })
+        return response
+
+    def send(self, state, offset, data=None):
+        if data is None:
+            data = self.data[offset:offset + state['chunk_size']]
+        return self.client.patch(
+            state['url'], data, content_type='application/offset+octet-stream', headers={'Upload-Offset': str(offset)}
+        )
+
+    def test_out_of_order_chunks(self):
+        response = self.create()
+        self.assertEqual(response.status_code, 201)
+        state = response.json()
+        self.assertEqual(state['missing'], [0, 64, 128])
+
+        for offset in [128, 0]:
+            response = self.send(state, offset)
+            self.assertEqual(response.status_code, 204)
+            self.assertEqual(response['Upload-Offset'], str(offset + len(self.data[offset:offset + 64])))
+        self.assertEqual(self.client.get(state['url']).json()['missing'], [64])
+
+        response = self.client.post(state['finalize_url'])
+        self.assertEqual(response.status_code, 400)
+        self.send(state, 64)
+        response = self.client.post(state['finalize_url'])
+        self.assertEqual(response.status_code, 201)
+        log_file = SEOLogFile.objects.get(seo_log=self.log)
+        self.assertEqual(log_file.file.read(), self.data)
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_bad_offsets_and_lengths(self):
+        state = self.create().json()
+        for offset, data in [(10, b'x' * 64), (-64, b'x' * 64), (192, b'x' * 64), (0, b'x' * 10), (128, b'x' * 64)]:
+            with self.subTest(offset=offset, length=len(data)):
+                self.assertEqual(self.send(state, offset, data).status_code, 400)
+        response = self.client.patch(state['url'], b'x' * 64, content_type='application/offset+octet-stream')
+        self.assertEqual(response.status_code, 400)
+
+    def test_unsupported_first_chunk(self):
+        state = self.create().json()
+        response = self.send(state, 0, b'MZ' + b'\x00' * 62)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('unsupported format', response.json()['error'])
+
+    def test_checksum_mismatch_keeps_the_upload(self):
+        state = self.create(sha256='0' * 64).json()
+        for offset in [0, 64, 128]:
+            self.send(state, offset)
+        response = self.client.post(state['finalize_url'])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('checksum', response.json()['error'])
+        self.assertTrue(ChunkedUpload.objects.exists())
+        self.assertFalse(SEOLogFile.objects.exists())
+
+    def test_finalize_attaches_once(self):
+        state = self.create(sha256=hashlib.sha256(self.data).hexdigest()).json()
+        for offset in [0, 64, 128]:
+            self.send(state, offset)
+        upload = ChunkedUpload.objects.get()
+        finalize_upload(upload)
+        # A retry that loaded the upload before the first finalize committed
+        with self.assertRaises(UploadError):
+            finalize_upload(upload)
+        self.assertEqual(SEOLogFile.objects.count(), 1)
+        self.assertEqual(self.client.post(state['finalize_url']).status_code, 404)
+
+    def test_other_users_cannot_use_the_upload(self):
+        state = self.create().json()
+        other = CustomUser.objects.create_user('chunk_other', 'o@example.com', 'pw', role='provider')
+        self.client.force_login(other)
+        self.assertEqual(self.send(state, 0).status_code, 404)
+        self.assertEqual(self.client.post(state['finalize_url']).status_code, 404)
+        response = self.client.post(reverse('chunked_upload_create', args=[self.log.pk]), {'file_name': 'a.png', 'size': 10})
+        self.assertEqual(response.status_code, 403)
+
+    def test_expiry(self):
+        stale = ChunkedUpload.objects.get(pk=self.create().json()['id'])
+        fresh = ChunkedUpload.objects.get(pk=self.create().json()['id'])
+        ChunkedUpload.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - datetime.timedelta(days=3))
+        orphan = os.path.join(settings.CHUNKED_UPLOAD_DIR, 'orphan.part')
+        with open(orphan, 'wb') as f:
+            f.write(b'x')
+        old = time.time() - 3 * 24 * 3600
+        os.utime(orphan, (old, old))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_stale_uploads(), 1)
+        self.assertEqual(list(ChunkedUpload.objects.values_list('pk', flat=True)), [fresh.pk])
+        self.assertFalse(os.path.exists(stale.path))
+        self.assertTrue(os.path.exists(fresh.path))
+        self.assertFalse(os.path.exists(orphan))
+
+
+class BlobLifecycleTests(TempDirsMixin, TestCase):
+    """Identical uploads share one stored file, which is deleted only once nothing references it."""
+
+    def setUp(self):
+        super().setUp()
+        provider = CustomUser.objects.create_user('blob_provider', 'p@example.com', 'pw', role='provider')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        project = Project.objects.create(customer=customer, name='Site', description='', start_date=datetime.date.today())
+        self.log = SEOLog.objects.create(
+            project=project, date=datetime.date.today(), created_by=provider, work_type='content'
+        )
+
+    def attach(self, data=b'crawl report'):
+        return SEOLogFile.objects.create(
+            seo_log=self.log, file=ContentFile(data, name='crawl.txt'), work_type='on_page',
+            file_name='crawl.txt', file_type='text', file_size=len(data),
+        )
+
+    def test_identical_uploads_share_a_blob(self):
+        first = self.attach()
+        second = self.attach()
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.startswith('cas/'))
+        self.assertEqual(StoredBlob.objects.get(name=first.file.name).ref_count, 2)
+
+        first.delete()
+        self.assertEqual(StoredBlob.objects.get(name=second.file.name).ref_count, 1)
+        self.assertFalse(PendingFileDeletion.objects.exists())
+
+    def test_last_release_journals_and_drain_deletes(self):
+        attachment = self.attach()
+        name = attachment.file.name
+        attachment.delete()
+        self.assertEqual(StoredBlob.objects.get(name=name).ref_count, 0)
+        self.assertTrue(PendingFileDeletion.objects.filter(name=name).exists())
+
+        # Journaled after the file was last stored, as in a drain that runs later
+        PendingFileDeletion.objects.update(created_at=timezone.now() + datetime.timedelta(seconds=5))
+        self.assertEqual(drain_file_deletions(), (1, 0))
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(StoredBlob.objects.filter(name=name).exists())
+        self.assertFalse(PendingFileDeletion.objects.exists())
+
+    def test_reupload_before_drain_keeps_the_file(self):
+        attachment = self.attach()
+        name = attachment.file.name
+        attachment.delete()
+        PendingFileDeletion.objects.update(created_at=timezone.now() + datetime.timedelta(seconds=5))
+
+        again = self.attach()
+        self.assertEqual(again.file.name, name)
+        self.assertEqual(drain_file_deletions(), (0, 1))
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(StoredBlob.objects.get(name=name).ref_count, 1)
+        self.assertFalse(PendingFileDeletion.objects.exists())
+
+    def test_upload_in_flight_keeps_the_file(self):
+        # The upload stored the file before the drain but has not taken its reference yet
+        attachment = self.attach()
+        name = attachment.file.name
+        attachment.delete()
+        PendingFileDeletion.objects.update(created_at=timezone.now() - datetime.timedelta(minutes=5))
+        os.utime(default_storage.path(name))
+
+        self.assertEqual(drain_file_deletions(), (0, 1))
+        self.assertTrue(default_storage.exists(name))
+        self.assertFalse(PendingFileDeletion.objects.exists())
+
+    def test_failed_deletes_are_retried(self):
+        attachment = self.attach()
+        name = attachment.file.name
+        attachment.delete()
+        PendingFileDeletion.objects.update(created_at=timezone.now() + datetime.timedelta(seconds=5))
+
+        with mock.patch.object(default_storage, 'delete', side_effect=OSError('busy')):
+            self.assertEqual(drain_file_deletions(), (0, 0))
+        entry = PendingFileDeletion.objects.get(name=name)
+        self.assertEqual((entry.attempts, entry.last_error), (1, 'busy'))
+        self.assertEqual(drain_file_deletions(), (1, 0))
+        self.assertFalse(default_storage.exists(name))
+
+    def test_referenced_names(self):
+        attachment = self.attach()
+        self.assertEqual(referenced_names([attachment.file.name, 'cas/00/00/missing.txt']), {attachment.file.name})
+
+
+class AttachmentDownloadTests(TempDirsMixin, TestCase):
+    """Attachment downloads support conditional and single-range requests, or hand off to nginx."""
+
+    CONTENT = bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        self.admin = CustomUser.objects.create_user('download_admin', 'admin@example.com', 'pw', role='admin')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        project = Project.objects.create(customer=customer, name='Site', description='', start_date=datetime.date.today())
+        Report.objects.create(project=project, title='Monthly', created_by=self.admin)
+        section = ReportSection.objects.create(project=project, title='Links', content='')
+        self.attachment = ReportAttachment.objects.create(
+            report_section=section, title='Backlinks', file=ContentFile(self.CONTENT, name='links.bin'),
+            file_type='other', file_size=len(self.CONTENT)
+        )
+        self.url = reverse('attachment_download', args=[self.attachment.pk])
+        self.client.force_login(self.admin)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.CONTENT)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('Backlinks.bin', response['Content-Disposition'])
+        self.assertEqual(AttachmentAccess.objects.filter(attachment=self.attachment).count(), 1)
+
+    def test_ranges(self):
+        size = len(self.CONTENT)
+        for header, start, end in [
+            ('bytes=0-99', 0, 99),
+            ('bytes=1000-', 1000, size - 1),
+            ('bytes=1000-5000', 1000, size - 1),
+            ('bytes=-24', size - 24, size - 1),
+            ('bytes=-5000', 0, size - 1),
+        ]:
+            with self.subTest(range=header):
+                response = self.client.get(self.url, headers={'Range': header})
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{size}')
+                self.assertEqual(response['Content-Length'], str(end - start + 1))
+                self.assertEqual(self.body(response), self.CONTENT[start:end + 1])
+
+    def test_unsatisfiable_and_ignored_ranges(self):
+        size = len(self.CONTENT)
+        for header in ['bytes=5000-', 'bytes=50-10', 'bytes=-0']:
+            with self.subTest(range=header):
+                response = self.client.get(self.url, headers={'Range': header})
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], f'bytes */{size}')
+        # Multiple or malformed ranges are ignored and the whole file is sent
+        for header in ['bytes=0-1,5-6', 'items=0-5', 'bytes=-']:
+            with self.subTest(range=header):
+                self.assertEqual(self.client.get(self.url, headers={'Range': header}).status_code, 200)
+
+    def test_empty_file_suffix_range(self):
+        empty = ReportAttachment.objects.create(
+            report_section=self.attachment.report_section, title='Empty', file=ContentFile(b'', name='empty.bin'),
+            file_type='other', file_size=0
+        )
+        response = self.client.get(reverse('attachment_download', args=[empty.pk]), headers={'Range': 'bytes=-10'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_if_range(self):
+        full = self.client.get(self.url)
+        etag, last_modified = full['ETag'], full['Last-Modified']
+        for if_range, status in [
+            (etag, 206),
+            ('"stale"', 200),
+            ('W/"weak"', 200),
+            (last_modified, 206),
+            ('Thu, 01 Jan 1970 00:00:00 GMT', 200),
+            ('not a date', 200),
+        ]:
+            with self.subTest(if_range=if_range):
+                response = self.client.get(self.url, headers={'Range': 'bytes=0-9', 'If-Range': if_range})
+                self.assertEqual(response.status_code, status)
+
+    def test_if_none_match(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, headers={'If-None-Match': f'"other", {etag}'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': '"other"'}).status_code, 200)
+
+    @override_settings(USE_X_ACCEL_REDIRECT=True, X_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_x_accel_redirect(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-9'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.attachment.file.name}')
+        self.assertEqual(response.content, b'')
+        self.assertIn('Backlinks.bin', response['Content-Disposition'])
+
+    def test_serve_file_quotes_the_internal_path(self):
+        request = RequestFactory().get('/')
+        self.attachment.file.name = 'cas/ab/cd/na me#1.bin'
+        with override_settings(USE_X_ACCEL_REDIRECT=True):
+            response = serve_file(request, self.attachment.file, filename='a.bin')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/cas/ab/cd/na%20me%231.bin')
+
+
+class RenderWorkerTests(TempDirsMixin, TestCase):
+    """The render worker keeps its own jobs, and never caches a PDF of a report edited mid-render."""
+
+    temp_dirs = ['MEDIA_ROOT', 'REPORT_PDF_CACHE_DIR']
+
+    def setUp(self):
+        super().setUp()
+        admin = CustomUser.objects.create_user('render_admin', 'admin@example.com', 'pw', role='admin')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        project = Project.objects.create(customer=customer, name='Site', description='', start_date=datetime.date.today())
+        self.report = Report.objects.create(project=project, title='Audit', created_by=admin)
+        ReportRenderJob.enqueue(self.report)
+        self.job = ReportRenderJob.claim_next()
+
+    def test_requeue_skips_jobs_the_worker_owns(self):
+        later = timezone.now() + datetime.timedelta(seconds=1)
+        self.assertEqual(ReportRenderJob.requeue_stale(later, exclude=[self.job.pk]), 0)
+        self.assertEqual(ReportRenderJob.requeue_stale(later), 1)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, 'queued')
+
+    def test_stale_after_must_outlast_the_timeout(self):
+        with self.assertRaises(CommandError):
+            call_command('process_render_jobs', '--once', '--stale-after', '10', '--timeout', '300')
+
+    def test_pdf_is_cached_under_the_claim_fingerprint(self):
+        fingerprint = report_fingerprint(self.report)
+        save_rendered_pdf(self.job, b'%PDF-audit', fingerprint)
+        self.assertEqual(self.job.status, 'done')
+        self.assertIsNotNone(get_cached_pdf(fingerprint))
+        self.assertTrue(self.job.version.has_pdf_for(fingerprint))
+
+    def test_edit_during_render_is_not_cached(self):
+        fingerprint = report_fingerprint(self.report)
+        Report.objects.filter(pk=self.report.pk).update(title='Audit (edited)')
+
+        save_rendered_pdf(self.job, b'%PDF-audit', fingerprint)
+        self.assertEqual(self.job.status, 'done')
+        self.assertIsNone(get_cached_pdf(fingerprint))
+        # Stored under the old fingerprint, so the next download renders again
+        self.report.refresh_from_db()
+        self.assertFalse(self.job.version.has_pdf_for(report_fingerprint(self.report)))
+
+    def test_zero_disables_pool_limits(self):
+        pool = RenderPool(processes=1, max_jobs=0, max_rss_mb=0, timeout=0)
+        slot = pool.slots[0]
+        self.assertEqual((slot.max_jobs, slot.max_rss, pool.timeout), (0, 0, 0))
+        slot.job, slot.started = self.job, time.monotonic() - 3600
+        slot.result = mock.Mock(ready=mock.Mock(return_value=False))
+        self.assertEqual(pool.collect(), [])
+
+
+@override_settings(REPORT_PDF_CACHE_MAX_BYTES=25)
+class PDFCacheTests(TempDirsMixin, TestCase):
+    """Rendered PDFs are reused until the report changes, and the cache is kept under its size limit."""
+
+    temp_dirs = ['MEDIA_ROOT', 'REPORT_PDF_CACHE_DIR']
+
+    def setUp(self):
+        super().setUp()
+        admin = CustomUser.objects.create_user('cache_admin', 'admin@example.com', 'pw', role='admin')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        project = Project.objects.create(customer=customer, name='Site', description='', start_date=datetime.date.today())
+        self.report = Report.objects.create(project=project, title='Audit', created_by=admin)
+        self.section = ReportSection.objects.create(project=project, title='Links', content='<p>Before</p>')
+        ReportSectionOrder.objects.create(report=self.report, section=self.section, order=1)
+        # Scan the fresh cache directory so the size estimate starts from it
+        evict_pdf_cache()
+
+    def test_cache_hit(self):
+        fingerprint = report_fingerprint(self.report)
+        self.assertIsNone(read_cached_pdf(fingerprint))
+        store_pdf(fingerprint, b'%PDF-audit')
+        self.assertEqual(read_cached_pdf(report_fingerprint(self.report)), b'%PDF-audit')
+
+    def test_edits_change_the_fingerprint(self):
+        before = report_fingerprint(self.report)
+        self.section.content = '<p>After</p>'
+        self.section.save()
+        edited = report_fingerprint(self.report)
+        self.assertNotEqual(edited, before)
+
+        ReportAttachment.objects.create(
+            report_section=self.section, title='Backlinks', file=ContentFile(b'url\n', name='links.csv'),
+            file_type='other', file_size=4
+        )
+        self.assertNotEqual(report_fingerprint(self.report), edited)
+
+    def test_print_variant_changes_the_fingerprint(self):
+        attachment = ReportAttachment.objects.create(
+            report_section=self.section, title='Screenshot', file=ContentFile(PNG_BYTES, name='shot.png'),
+            file_type='image', file_size=len(PNG_BYTES)
+        )
+        before = report_fingerprint(self.report)
+        ImageDerivativeJob.objects.update_or_create(source=attachment.file.name, defaults={'status': 'done'})
+        self.assertNotEqual(report_fingerprint(self.report), before)
+
+    def test_least_recently_used_pdfs_are_evicted(self):
+        old = store_pdf('a' * 64, b'x' * 10)
+        os.utime(old, (time.time() - 60, time.time() - 60))
+        recent = store_pdf('b' * 64, b'x' * 10)
+        store_pdf('c' * 64, b'x' * 10)
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(recent))
+
+    def test_store_scans_only_past_the_limit(self):
+        with mock.patch('core.pdf_cache.os.walk', wraps=os.walk) as walk:
+            store_pdf('a' * 64, b'x' * 10)
+            store_pdf('b' * 64, b'x' * 10)
+            self.assertFalse(walk.called)
+            store_pdf('c' * 64, b'x' * 10)
+            self.assertTrue(walk.called)
+
+
+class ReportDownloadTests(TempDirsMixin, TestCase):
+    """Downloading a report serves its current PDF or queues one render, and the GET itself only reads."""
+
+    temp_dirs = ['MEDIA_ROOT', 'REPORT_PDF_CACHE_DIR']
+
+    def setUp(self):
+        super().setUp()
+        self.provider = CustomUser.objects.create_user('dl_provider', 'p@example.com', 'pw', role='provider')
+        self.outsider = CustomUser.objects.create_user('dl_outsider', 'o@example.com', 'pw', role='provider')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        project = Project.objects.create(customer=customer, name='Site', description='', start_date=datetime.date.today())
+        project.providers.add(self.provider)
+        self.report = Report.objects.create(project=project, title='Audit', created_by=self.provider)
+        self.download_url = reverse('report_download', args=[self.report.pk])
+        self.status_url = reverse('report_download_status', args=[self.report.pk])
+        self.client.force_login(self.provider)
+
+    def test_get_queues_one_render_without_writing_versions(self):
+        versions = self.report.versions.count()
+        for i in range(2):
+            response = self.client.get(self.download_url)
+            self.assertTemplateUsed(response, 'core/report_download_pending.html')
+        self.assertEqual(self.report.render_jobs.count(), 1)
+        self.assertEqual(self.report.versions.count(), versions)
+
+    def test_status_polling(self):
+        self.assertEqual(self.client.get(self.status_url).status_code, 404)
+        self.client.get(self.download_url)
+        self.assertEqual(self.client.get(self.status_url).json()['status'], 'queued')
+
+        job = ReportRenderJob.claim_next()
+        self.assertEqual(self.client.get(self.status_url).json()['status'], 'running')
+        job.mark_failed('Out of memory')
+        data = self.client.get(self.status_url).json()
+        self.assertEqual((data['status'], data['error']), ('failed', 'Out of memory'))
+
+    def test_rendered_pdf_is_served(self):
+        self.client.get(self.download_url)
+        job = ReportRenderJob.claim_next()
+        save_rendered_pdf(job, b'%PDF-audit', report_fingerprint(self.report))
+        self.assertEqual(self.client.get(self.status_url).json()['status'], 'done')
+
+        response = self.client.get(self.download_url)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-audit')
+        self.assertEqual(self.report.render_jobs.count(), 1)
+
+    def test_jobs_are_claimed_once_and_failed_after_max_attempts(self):
+        self.client.get(self.download_url)
+        job = ReportRenderJob.claim_next()
+        self.assertIsNone(ReportRenderJob.claim_next())
+
+        later = timezone.now() + datetime.timedelta(seconds=1)
+        for attempt in range(2):
+            self.assertEqual(ReportRenderJob.requeue_stale(later, max_attempts=3), 1)
+            self.assertEqual(ReportRenderJob.claim_next().pk, job.pk)
+        self.assertEqual(ReportRenderJob.requeue_stale(later, max_attempts=3), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+
+    def test_other_providers_are_refused(self):
+        self.client.force_login(self.outsider)
+        self.assertEqual(self.client.get(self.download_url).status_code, 403)
+        self.assertEqual(self.client.get(self.status_url).status_code, 403)
+        self.assertFalse(ReportRenderJob.objects.exists())
+
+
+class SEOLogExportTests(TestCase):
+    """The CSV and XLSX exports carry the description HTML, quote formulas, and import back unchanged."""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('export_log_admin', 'admin@example.com', 'pw', role='admin')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        self.project = Project.objects.create(
+            customer=customer, name='Site', description='', start_date=datetime.date(2026, 1, 5)
+        )
+        self.log = SEOLog.objects.create(
+            project=self.project, date=datetime.date(2026, 1, 5), created_by=self.admin, work_type='content',
+            description='<p>Rewrote <strong>titles</strong></p>'
+        )
+        self.client.force_login(self.admin)
+
+    def export(self, export_format):
+        response = self.client.get(reverse('seo_log_export'), {'format': export_format})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_export(self):
+        rows = list(csv.reader(io.StringIO(self.export('csv').decode('utf-8-sig'))))
+        self.assertEqual(rows[0], ['project', 'date', 'work_type', 'description', 'customer', 'created_by', 'word_count'])
+        self.assertEqual(rows[1][:6], [
+            'Site', '2026-01-05', 'Content Optimization', '<p>Rewrote <strong>titles</strong></p>', 'Acme',
+            'export_log_admin'
+        ])
+
+    def test_xlsx_export(self):
+        workbook = load_workbook(io.BytesIO(self.export('xlsx')), read_only=True)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        workbook.close()
+        self.assertEqual(rows[0][:4], ('project', 'date', 'work_type', 'description'))
+        self.assertEqual(rows[1][3], '<p>Rewrote <strong>titles</strong></p>')
+
+    def test_formulas_are_quoted(self):
+        self.project.name = '=HYPERLINK("http://evil.example")'
+        self.project.save()
+        self.log.description = '-5 spammy links removed'
+        self.log.save()
+        row = list(csv.reader(io.StringIO(self.export('csv').decode('utf-8-sig'))))[1]
+        self.assertEqual(row[0], '\'=HYPERLINK("http://evil.example")')
+        self.assertEqual(row[3], "'-5 spammy links removed")
+
+    def test_export_imports_back_unchanged(self):
+        self.log.description = '-5 <em>spammy</em> links removed'
+        self.log.save()
+        data = self.export('csv')
+        SEOLog.objects.all().delete()
+
+        result = import_seo_logs(io.BytesIO(data), 'logs.csv', self.admin)
+        self.assertEqual((result.created, result.errors), (1, []))
+        log = SEOLog.objects.get()
+        self.assertEqual(log.description, '-5 <em>spammy</em> links removed')
+        self.assertEqual((log.project, log.date, log.work_type), (self.project, self.log.date, 'content'))
+
+
+class SEOLogImportTests(TestCase):
+    """Imports validate each row, write in batches inside one transaction, and read CSV and XLSX alike."""
+
+    def setUp(self):
+        self.provider = CustomUser.objects.create_user('import_provider', 'p@example.com', 'pw', role='provider')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        self.project = Project.objects.create(
+            customer=customer, name='Site', description='', start_date=datetime.date(2026, 1, 5)
+        )
+        self.project.providers.add(self.provider)
+        self.other = Project.objects.create(
+            customer=customer, name='Other', description='', start_date=datetime.date(2026, 1, 5)
+        )
+
+    def csv_file(self, *rows, header='project,date,work_type,description'):
+        return io.BytesIO('\n'.join([header, *rows]).encode('utf-8'))
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        result = import_seo_logs(self.csv_file(
+            'Site,2026-01-05,content,<p>Fine</p>',
+            'Nowhere,2026-01-05,content,',
+            'Other,2026-01-05,content,',
+            'Site,someday,content,',
+            'Site,2026-01-05,dancing,',
+            ',2026-01-05,content,',
+            ',,,',
+        ), 'logs.csv', self.provider)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [
+            (3, 'Unknown project "Nowhere" or you are not assigned to it'),
+            (4, 'Unknown project "Other" or you are not assigned to it'),
+            (5, 'Invalid date "someday"'),
+            (6, 'Unknown work type "dancing"'),
+            (7, 'Project is required'),
+        ])
+        self.assertEqual(SEOLog.objects.get().description, '<p>Fine</p>')
+
+    def test_project_names_shared_by_customers(self):
+        globex = Customer.objects.create(name='Globex', email='g@example.com', website='https://globex.example')
+        twin = Project.objects.create(customer=globex, name='Site', description='', start_date=datetime.date(2026, 1, 5))
+        twin.providers.add(self.provider)
+
+        result = import_seo_logs(self.csv_file(
+            'Site,2026-01-05,content,,',
+            'Site,2026-01-05,content,,Globex',
+            f'{self.project.pk},2026-01-05,content,,',
+            header='project,date,work_type,description,customer',
+        ), 'logs.csv', self.provider)
+        self.assertEqual(result.errors, [
+            (2, 'Several customers have a project named "Site"; add a customer column or use the project id'),
+        ])
+        self.assertEqual(
+            sorted(SEOLog.objects.values_list('project__customer__name', flat=True)), ['Acme', 'Globex']
+        )
+
+    def test_file_level_errors(self):
+        with self.assertRaisesMessage(LogImportError, 'Missing column(s): work_type'):
+            import_seo_logs(self.csv_file('Site', header='project'), 'logs.csv', self.provider)
+        with self.assertRaisesMessage(LogImportError, 'not UTF-8'):
+            import_seo_logs(io.BytesIO('project,work_type\nSit\xe9,content'.encode('latin-1')), 'logs.csv', self.provider)
+        with self.assertRaisesMessage(LogImportError, 'use CSV or XLSX'):
+            import_seo_logs(self.csv_file(), 'logs.txt', self.provider)
+
+    def test_dry_run_writes_nothing(self):
+        result = import_seo_logs(
+            self.csv_file('Site,2026-01-05,content,', 'Site,2026-01-06,technical,'), 'logs.csv', self.provider,
+            dry_run=True
+        )
+        self.assertEqual(result.created, 2)
+        self.assertFalse(SEOLog.objects.exists())
+        self.assertFalse(DashboardCounter.objects.filter(name__startswith='logs:', value__gt=0).exists())
+
+    def test_failed_batch_rolls_back_earlier_batches(self):
+        rows = [f'Site,2026-01-0{day},content,' for day in range(1, 6)]
+        with mock.patch('core.log_import.index_logs', side_effect=[None, RuntimeError('index down')]):
+            with self.assertRaises(RuntimeError):
+                import_seo_logs(self.csv_file(*rows), 'logs.csv', self.provider, batch_size=2)
+        self.assertFalse(SEOLog.objects.exists())
+
+    def test_batch_boundaries(self):
+        rows = [f'Site,2026-01-0{day},content,' for day in range(1, 6)]
+        with mock.patch('core.log_import.save_batch', wraps=save_batch) as batches:
+            result = import_seo_logs(self.csv_file(*rows), 'logs.csv', self.provider, batch_size=2)
+        self.assertEqual([len(call.args[0]) for call in batches.call_args_list], [2, 2, 1])
+        self.assertEqual(result.created, 5)
+        counters = DashboardCounter.objects.filter(scope=PROVIDER, scope_id=self.provider.pk, name__startswith='logs:')
+        self.assertEqual(sum(counters.values_list('value', flat=True)), 5)
+
+    def test_xlsx(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Project', 'Date', 'Work Type', 'Description'])
+        sheet.append([self.project.pk, datetime.datetime(2026, 1, 5, 9, 30), 'Technical SEO', '<strong>Fixed</strong> redirects'])
+        sheet.append([None, None, None, None])
+        sheet.append(['site', None, 'content', None])
+        file = io.BytesIO()
+        workbook.save(file)
+        file.seek(0)
+
+        result = import_seo_logs(file, 'logs.xlsx', self.provider)
+        self.assertEqual((result.created, result.errors), (2, []))
+        first, second = SEOLog.objects.order_by('id')
+        self.assertEqual((first.date, first.work_type), (datetime.date(2026, 1, 5), 'technical'))
+        self.assertEqual(first.description, '<strong>Fixed</strong> redirects')
+        self.assertEqual((second.project, second.date), (self.project, timezone.now().date()))
+
+    def test_invalid_xlsx(self):
+        with self.assertRaisesMessage(LogImportError, 'Not a valid XLSX file'):
+            import_seo_logs(io.BytesIO(b'not a zip'), 'logs.xlsx', self.provider)
+
+
+class StorageUsageTests(TempDirsMixin, TestCase):
+    """Usage totals follow uploads, replacements and deletes, and reconcile_storage repairs drift."""
+
+    def setUp(self):
+        super().setUp()
+        provider = CustomUser.objects.create_user('usage_provider', 'p@example.com', 'pw', role='provider')
+        self.customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        self.project = Project.objects.create(
+            customer=self.customer, name='Site', description='', start_date=datetime.date.today()
+        )
+        self.log = SEOLog.objects.create(
+            project=self.project, date=datetime.date.today(), created_by=provider, work_type='content'
+        )
+
+    def usage(self):
+        totals = {}
+        for scope, scope_id in [('global', 0), ('customer', self.customer.pk), ('project', self.project.pk)]:
+            usage = get_usage(scope, scope_id)
+            totals[scope] = (usage.bytes_used, usage.file_count) if usage else (0, 0)
+        return totals
+
+    def attach(self, data):
+        return SEOLogFile.objects.create(
+            seo_log=self.log, file=ContentFile(data, name='crawl.txt'), work_type='on_page',
+            file_name='crawl.txt', file_type='text', file_size=len(data),
+        )
+
+    def test_upload_replace_and_delete(self):
+        attachment = self.attach(b'x' * 10)
+        self.assertEqual(self.usage(), {'global': (10, 1), 'customer': (10, 1), 'project': (10, 1)})
+
+        attachment.file = ContentFile(b'y' * 25, name='crawl.txt')
+        attachment.save()
+        self.assertEqual(self.usage(), {'global': (25, 1), 'customer': (25, 1), 'project': (25, 1)})
+
+        attachment.delete()
+        self.assertEqual(self.usage(), {'global': (0, 0), 'customer': (0, 0), 'project': (0, 0)})
+
+    def test_unchanged_file_is_not_recounted(self):
+        attachment = self.attach(b'x' * 10)
+        attachment.file_name = 'renamed.txt'
+        attachment.save()
+        self.assertEqual(self.usage()['project'], (10, 1))
+
+    def test_reconcile_repairs_drift(self):
+        self.attach(b'x' * 10)
+        StorageUsage.objects.filter(scope='project').update(bytes_used=999, file_count=7)
+        with open(os.path.join(settings.MEDIA_ROOT, 'orphan.bin'), 'wb') as f:
+            f.write(b'z' * 5)
+
+        totals = reconcile_storage()
+        self.assertEqual(self.usage(), {'global': (10, 1), 'customer': (10, 1), 'project': (10, 1)})
+        # The orphan is on disk but billed to nobody
+        self.assertEqual(totals[('disk', 0)], (15, 2))
+        self.assertIsNotNone(get_usage('project', self.project.pk).reconciled_at)
+
+    def test_reconcile_updates_rows_in_place(self):
+        self.attach(b'x' * 10)
+        rows = dict(StorageUsage.objects.values_list('scope', 'pk'))
+        gone = StorageUsage.objects.create(scope='project', scope_id=self.project.pk + 100, bytes_used=5, file_count=1)
+
+        with CaptureQueriesContext(connection) as queries:
+            reconcile_storage()
+        self.assertFalse([query for query in queries.captured_queries if query['sql'].startswith('DELETE')])
+        # The same rows hold the new totals
+        kept = StorageUsage.objects.exclude(scope='disk').exclude(pk=gone.pk)
+        self.assertEqual(dict(kept.values_list('scope', 'pk')), rows)
+        gone.refresh_from_db()
+        self.assertEqual((gone.bytes_used, gone.file_count), (0, 0))
+
+    def test_identical_uploads_count_per_row(self):
+        self.attach(b'x' * 10)
+        self.attach(b'x' * 10)
+        totals = reconcile_storage()
+        # Both rows are billed, though they share one blob on disk
+        self.assertEqual(self.usage()['project'], (20, 2))
+        self.assertEqual(totals[('disk', 0)], (10, 1))
+
+
+class ImageDerivativeTests(TempDirsMixin, TestCase):
+    """The media worker writes each image's variants once, and records images it cannot read as failed."""
+
+    def setUp(self):
+        super().setUp()
+        provider = CustomUser.objects.create_user('image_provider', 'p@example.com', 'pw', role='provider')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        project = Project.objects.create(customer=customer, name='Site', description='', start_date=datetime.date.today())
+        self.log = SEOLog.objects.create(
+            project=project, date=datetime.date.today(), created_by=provider, work_type='content'
+        )
+        # Variants remembered by earlier tests live in other temporary media roots
+        remembered = mock.patch.dict('core.images._ready', clear=True)
+        remembered.start()
+        self.addCleanup(remembered.stop)
+
+    def attach(self, data):
+        return SEOLogFile.objects.create(
+            seo_log=self.log, file=ContentFile(data, name='shot.png'), work_type='on_page',
+            file_name='shot.png', file_type='image/png', file_size=len(data),
+        )
+
+    def screenshot(self):
+        data = io.BytesIO()
+        Image.new('RGBA', (40, 30), (255, 0, 0, 128)).save(data, 'PNG')
+        return self.attach(data.getvalue())
+
+    def run_worker(self):
+        call_command('process_image_derivatives', '--once', stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_worker_writes_variants_once(self):
+        image = self.screenshot()
+        self.run_worker()
+        job = ImageDerivativeJob.objects.get(source=image.file.name)
+        self.assertEqual(job.status, 'done')
+        for name in derivative_names(image.file.name):
+            self.assertTrue(default_storage.exists(name), name)
+        self.assertEqual(generate_derivatives(image.file.name), [])
+
+    def test_unreadable_image_fails_the_job(self):
+        broken = self.attach(PNG_BYTES)
+        image = self.screenshot()
+        self.run_worker()
+        failed = ImageDerivativeJob.objects.get(source=broken.file.name)
+        self.assertEqual(failed.status, 'failed')
+        self.assertTrue(failed.error)
+        # One bad upload does not stop the queue
+        self.assertEqual(ImageDerivativeJob.objects.get(source=image.file.name).status, 'done')
+
+    def test_unexpected_errors_fail_the_job(self):
+        image = self.screenshot()
+        with mock.patch(
+            'core.management.commands.process_image_derivatives.generate_derivatives',
+            side_effect=SyntaxError('broken PNG chunk')
+        ):
+            self.run_worker()
+        job = ImageDerivativeJob.objects.get(source=image.file.name)
+        self.assertEqual((job.status, job.error), ('failed', 'broken PNG chunk'))
+
+    def test_reupload_retries_a_failed_job(self):
+        image = self.screenshot()
+        ImageDerivativeJob.objects.update(status='failed', attempts=3, error='broken')
+        self.screenshot()
+        job = ImageDerivativeJob.objects.get(source=image.file.name)
+        self.assertEqual((job.status, job.attempts, job.error), ('queued', 0, ''))
+
+    def test_abandoned_jobs_are_requeued(self):
+        image = self.screenshot()
+        job = ImageDerivativeJob.claim_next()
+        self.assertIsNotNone(job.started_at)
+        ImageDerivativeJob.objects.update(started_at=timezone.now() - datetime.timedelta(hours=1))
+
+        # The worker picks the abandoned job up again and finishes it
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('done', 2))
+
+        ImageDerivativeJob.objects.update(
+            status='running', attempts=3, started_at=timezone.now() - datetime.timedelta(hours=1)
+        )
+        self.assertEqual(ImageDerivativeJob.requeue_stale(timezone.now(), max_attempts=3), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_remembered_variants_expire_and_are_dropped_on_delete(self):
+        image = self.screenshot()
+        generate_derivatives(image.file.name)
+        name = derivative_name(image.file.name, 'thumb')
+        self.assertTrue(derivative_exists(name))
+
+        # Another process deleted the variant; it is noticed once the entry expires
+        default_storage.delete(name)
+        self.assertTrue(derivative_exists(name))
+        with mock.patch('core.images.READY_TTL', 0):
+            self.assertFalse(derivative_exists(name))
+
+        generate_derivatives(image.file.name)
+        self.assertTrue(derivative_exists(name))
+        forget_derivatives(image.file.name)
+        with mock.patch.object(default_storage, 'exists', return_value=False):
+            self.assertFalse(derivative_exists(name))
+
+    def test_filter_falls_back_to_the_original_and_remembers_variants(self):
+        image = self.screenshot()
+        self.assertEqual(derivative(image.file, 'thumb'), image.file.url)
+
+        generate_derivatives(image.file.name)
+        expected = default_storage.url(derivative_name(image.file.name, 'thumb'))
+        self.assertEqual(derivative(image.file, 'thumb'), expected)
+        with mock.patch.object(default_storage, 'exists') as exists:
+            self.assertEqual(derivative(image.file, 'thumb'), expected)
+        self.assertFalse(exists.called)
+
+
+class SEOLogSanitizeTests(TestCase):
+    """Saving a log sanitizes its description once, and only when the description is written."""
+
+    def setUp(self):
+        provider = CustomUser.objects.create_user('sanitize_provider', 'p@example.com', 'pw', role='provider')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        project = Project.objects.create(customer=customer, name='Site', description='', start_date=datetime.date.today())
+        self.log = SEOLog.objects.create(
+            project=project, date=datetime.date.today(), created_by=provider, work_type='content',
+            description='<p>Fixed <script>x</script>titles</p>'
+        )
+
+    def test_create_stores_derived_fields(self):
+        log = SEOLog.objects.get(pk=self.log.pk)
+        self.assertEqual(log.description, '<p>Fixed xtitles</p>')
+        self.assertEqual((log.search_text, log.word_count), ('Fixed xtitles', 2))
+        self.assertEqual(log.description_hash, content_hash(log.description))
+
+    def test_other_update_fields_skip_sanitizing(self):
+        SEOLog.objects.filter(pk=self.log.pk).update(description_hash='')
+        log = SEOLog.objects.get(pk=self.log.pk)
+        log.work_type = 'technical'
+        with mock.patch('core.models.sanitize_description') as sanitize:
+            log.save(update_fields=['work_type'])
+        self.assertFalse(sanitize.called)
+
+    def test_description_update_fields_write_derived_fields(self):
+        log = SEOLog.objects.get(pk=self.log.pk)
+        log.description = '<p>Rewrote <em>meta</em> descriptions</p>'
+        log.save(update_fields=['description'])
+        log.refresh_from_db()
+        self.assertEqual((log.search_text, log.word_count), ('Rewrote meta descriptions', 3))
+        self.assertEqual(log.description_hash, content_hash(log.description))
+
+        with mock.patch('core.models.sanitize_description') as sanitize:
+            log.save()
+        self.assertFalse(sanitize.called)
+
+
+class SEOLogExcerptTests(TestCase):
+    """Logs keep a plain-text excerpt and word count, and the backfill fills them in for older rows."""
+
+    def setUp(self):
+        provider = CustomUser.objects.create_user('excerpt_provider', 'p@example.com', 'pw', role='provider')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        self.project = Project.objects.create(
+            customer=customer, name='Site', description='', start_date=datetime.date.today()
+        )
+        self.logs = [
+            SEOLog.objects.create(
+                project=self.project, date=datetime.date.today(), created_by=provider, work_type='content',
+                description=f'<p>Fixed <strong>redirect</strong> chains {i}</p>'
+            )
+            for i in range(3)
+        ]
+        SEOLog.objects.create(
+            project=self.project, date=datetime.date.today(), created_by=provider, work_type='content',
+            description=''
+        )
+
+    def plain_text(self):
+        return list(SEOLog.objects.order_by('id').values_list(*SEOLog.PLAIN_TEXT_FIELDS))
+
+    def test_backfill_fills_rows_saved_before_the_columns(self):
+        expected = self.plain_text()
+        self.assertEqual(expected[0], ('Fixed redirect chains 0', 'Fixed redirect chains 0', 4))
+        # Rows from before the migration have none of the derived columns
+        SEOLog.objects.update(search_text='', excerpt='', word_count=0)
+        for log in self.logs:
+            unindex_log(log.pk)
+        self.assertEqual(search_logs(SEOLog.objects.all(), 'redirect').count(), 0)
+
+        out = io.StringIO()
+        call_command('backfill_log_excerpts', batch_size=2, stdout=out)
+        self.assertIn('Updated 3 SEO logs', out.getvalue())
+        self.assertEqual(self.plain_text(), expected)
+        # The recomputed search text is indexed again
+        self.assertEqual(search_logs(SEOLog.objects.all(), 'redirect').count(), 3)
+
+        out = io.StringIO()
+        call_command('backfill_log_excerpts', stdout=out)
+        self.assertIn('Updated 0 SEO logs', out.getvalue())
+
+    def test_other_update_fields_keep_plain_text(self):
+        SEOLog.objects.filter(pk=self.logs[0].pk).update(excerpt='kept', word_count=99, search_text='kept')
+        log = SEOLog.objects.get(pk=self.logs[0].pk)
+        log.description = '<p>Changed in memory only</p>'
+        log.work_type = 'technical'
+        log.save(update_fields=['work_type'])
+
+        log = SEOLog.objects.get(pk=self.logs[0].pk)
+        self.assertEqual((log.search_text, log.excerpt, log.word_count), ('kept', 'kept', 99))
+        self.assertEqual(log.description, '<p>Fixed <strong>redirect</strong> chains 0</p>')
+        self.assertEqual(log.work_type, 'technical')
+
+
+class SearchTests(TestCase):
+    """Every engine requires all terms and matches the last one as a prefix."""
+
+    def setUp(self):
+        provider = CustomUser.objects.create_user('search_provider', 'p@example.com', 'pw', role='provider')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        project = Project.objects.create(customer=customer, name='Site', description='', start_date=datetime.date.today())
+        self.redirects = SEOLog.objects.create(
+            project=project, date=datetime.date.today(), created_by=provider, work_type='technical',
+            description='<p>Fixed redirect chains on the blog</p>'
+        )
+        SEOLog.objects.create(
+            project=project, date=datetime.date.today(), created_by=provider, work_type='content',
+            description='<p>Fixed title tags</p>'
+        )
+
+    def matches(self, query):
+        return list(search_logs(SEOLog.objects.all(), query).values_list('pk', flat=True))
+
+    def test_prefix_and_all_terms(self):
+        for backend in [search_backend(), None]:
+            with mock.patch('core.search.search_backend', return_value=backend):
+                self.assertEqual(self.matches('fixed redir'), [self.redirects.pk], backend)
+                self.assertEqual(self.matches('redirect titles'), [], backend)
+
+    def test_mysql_uses_boolean_mode_with_a_prefix(self):
+        self.assertEqual(_mysql_query(['fixed', 'redir']), '+fixed +redir*')
+
+    def test_migration_skips_fts5_when_sqlite_lacks_it(self):
+        migration = importlib.import_module('core.migrations.0022_seolog_search_text')
+        schema_editor = mock.Mock(connection=mock.Mock(vendor='sqlite'))
+        with mock.patch.object(migration, 'has_fts5', return_value=False):
+            migration.create_fulltext_index(None, schema_editor)
+        self.assertFalse(schema_editor.execute.called)
+
+
+class NotificationTests(TestCase):
+    """Notifications fan out in one INSERT, respect opt-outs and merge repeats of the same event."""
+
+    def setUp(self):
+        self.author = CustomUser.objects.create_user('notify_author', 'author@example.com', 'pw', role='provider')
+        self.customer_user = CustomUser.objects.create_user('notify_customer', 'acme@example.com', 'pw', role='customer')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        self.project = Project.objects.create(
+            customer=customer, name='Site', description='', start_date=datetime.date.today()
+        )
+        self.project.providers.add(self.author)
+        self.log = SEOLog.objects.create(
+            project=self.project, date=datetime.date.today(), created_by=self.author, work_type='content'
+        )
+
+    def add_providers(self, count):
+        start = CustomUser.objects.count()
+        providers = [
+            CustomUser.objects.create_user(f'notify_provider_{i}', f'p{i}@example.com', 'pw', role='provider')
+            for i in range(start, start + count)
+        ]
+        self.project.providers.add(*providers)
+        return providers
+
+    def recipients(self):
+        return set(Notification.objects.values_list('user__username', flat=True))
+
+    def test_audience_excludes_the_author(self):
+        provider, = self.add_providers(1)
+        Notification.notify_seo_log_added(self.log)
+        self.assertEqual(self.recipients(), {'notify_customer', provider.username})
+
+    def test_opted_out_users_are_skipped(self):
+        opted_out, default = self.add_providers(2)
+        UserSettings.objects.create(user=opted_out, notify_new_log=False)
+        Notification.notify_seo_log_added(self.log)
+        self.assertEqual(self.recipients(), {'notify_customer', default.username})
+
+        # The opt-out only covers its own notification types
+        Notification.notify_project_completed(self.project)
+        self.assertTrue(Notification.objects.filter(user=opted_out, type='project_completed').exists())
+
+    def test_repeated_events_coalesce(self):
+        self.add_providers(1)
+        Notification.notify_seo_log_added(self.log)
+        Notification.notify_seo_log_added(self.log)
+        self.assertEqual(Notification.objects.count(), 2)
+
+        # Once read, or outside the window, the same event notifies again
+        Notification.objects.filter(user=self.customer_user).update(is_read=True)
+        Notification.notify_seo_log_added(self.log)
+        self.assertEqual(Notification.objects.count(), 3)
+        with override_settings(NOTIFICATION_COALESCE_SECONDS=60):
+            Notification.objects.update(created_at=timezone.now() - datetime.timedelta(minutes=5))
+            Notification.notify_seo_log_added(self.log)
+        self.assertEqual(Notification.objects.count(), 5)
+
+    def test_query_count_does_not_grow_with_recipients(self):
+        self.add_providers(2)
+        with CaptureQueriesContext(connection) as few:
+            Notification.notify_seo_log_added(self.log)
+        Notification.objects.all().delete()
+
+        self.add_providers(20)
+        with CaptureQueriesContext(connection) as many:
+            Notification.notify_seo_log_added(self.log)
+        self.assertEqual(Notification.objects.count(), 23)
+        self.assertEqual(len(many), len(few))
+
+
+class FileCleanupTests(TempDirsMixin, TestCase):
+    """The deletion worker and the orphan collector only remove files no row references."""
+
+    def setUp(self):
+        super().setUp()
+        provider = CustomUser.objects.create_user('cleanup_provider', 'p@example.com', 'pw', role='provider')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        project = Project.objects.create(customer=customer, name='Site', description='', start_date=datetime.date.today())
+        self.log = SEOLog.objects.create(
+            project=project, date=datetime.date.today(), created_by=provider, work_type='content'
+        )
+
+    def attach(self, data, name='crawl.txt'):
+        return SEOLogFile.objects.create(
+            seo_log=self.log, file=ContentFile(data, name=name), work_type='on_page',
+            file_name=name, file_type='text', file_size=len(data),
+        )
+
+    def write(self, name, age=0):
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'orphan')
+        os.utime(path, (time.time() - age, time.time() - age))
+        return name
+
+    def test_find_orphan_files(self):
+        day = 86400
+        kept = self.attach(b'kept', name='shot.png')
+        kept_variant = self.write(derivative_name(kept.file.name, 'thumb'), age=2 * day)
+        orphan = self.write('uploads/old.txt', age=2 * day)
+        orphan_variant = self.write(derivative_name('cas/00/00/gone.png', 'thumb'), age=2 * day)
+        self.write('uploads/new.txt')
+        journaled = self.write('uploads/journaled.txt', age=2 * day)
+        PendingFileDeletion.objects.create(name=journaled)
+        os.utime(default_storage.path(kept.file.name), (time.time() - 2 * day,) * 2)
+
+        names = {name for name, size in find_orphan_files(min_age=day)}
+        self.assertEqual(names, {orphan, orphan_variant})
+        self.assertNotIn(kept_variant, names)
+
+    def test_collect_orphan_files(self):
+        orphan = self.write('uploads/old.txt', age=2 * 86400)
+        out = io.StringIO()
+        call_command('collect_orphan_files', '--dry-run', stdout=out)
+        self.assertIn('uploads/old.txt (6 bytes)', out.getvalue())
+        self.assertTrue(default_storage.exists(orphan))
+
+        call_command('collect_orphan_files', stdout=io.StringIO())
+        self.assertFalse(default_storage.exists(orphan))
+
+    def test_worker_reports_deleted_and_kept_files(self):
+        self.attach(b'gone').delete()
+        reused = self.attach(b'reused')
+        reused.delete()
+        self.attach(b'reused')
+        PendingFileDeletion.objects.update(created_at=timezone.now() + datetime.timedelta(seconds=5))
+
+        out = io.StringIO()
+        call_command('process_file_deletions', '--once', stdout=out)
+        self.assertIn('Deleted 1 files, kept 1 that are referenced again', out.getvalue())
+        self.assertFalse(PendingFileDeletion.objects.exists())
+
+
+class SEOLogPaginationTests(TestCase):
+    """Keyset pages neither repeat nor skip rows, keep the filters and serve infinite-scroll fragments."""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('page_admin', 'admin@example.com', 'pw', role='admin')
+        provider = CustomUser.objects.create_user('page_provider', 'p@example.com', 'pw', role='provider')
+        customer = Customer.objects.create(name='Acme', email='acme@example.com', website='https://example.com')
+        self.project = Project.objects.create(
+            customer=customer, name='Site', description='', start_date=datetime.date.today()
+        )
+        other = Project.objects.create(customer=customer, name='Other', description='', start_date=datetime.date.today())
+        today = datetime.date.today()
+        # Several rows share each date, so pages must break ties on the id
+        for i in range(9):
+            SEOLog.objects.create(
+                project=self.project if i % 3 else other, date=today - datetime.timedelta(days=i // 4),
+                created_by=provider, work_type='content' if i % 2 else 'technical',
+                description=f'<p>Fixed redirect chains, batch {i}</p>'
+            )
+        self.client.force_login(self.admin)
+
+    def walk(self, logs, field='date'):
+        """Follow the cursors through every page of logs and return the ids in page order."""
+        seen, cursor = [], None
+        while True:
+            page, cursor = keyset_page(logs, cursor, page_size=2, field=field)
+            seen.extend(log.pk for log in page)
+            if cursor is None:
+                return seen
+
+    def test_cursor_walks_tied_dates(self):
+        expected = list(SEOLog.objects.order_by('-date', '-id').values_list('pk', flat=True))
+        self.assertEqual(self.walk(SEOLog.objects.all()), expected)
+
+    def test_search_rank_cursor(self):
+        log = SEOLog.objects.first()
+        log.search_rank = 0.1 + 0.2
+        self.assertEqual(decode_cursor(encode_cursor(log, 'search_rank'), 'search_rank'), (0.1 + 0.2, log.pk))
+
+        for backend in [search_backend(), None]:
+            with mock.patch('core.search.search_backend', return_value=backend):
+                logs = search_logs(SEOLog.objects.all(), 'redirect chains')
+                seen = self.walk(logs, 'search_rank')
+                self.assertEqual(len(seen), len(set(seen)), backend)
+                self.assertEqual(set(seen), set(SEOLog.objects.values_list('pk', flat=True)), backend)
+
+    def test_malformed_cursor(self):
+        for cursor in [None, '', 'garbage', '2024-13-01_5', '2024-01-01_x', '2024-01-01']:
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decode_cursor(cursor))
+        self.assertIsNone(decode_cursor('high_5', 'search_rank'))
+
+        # The list falls back to the first page
+        with mock.patch('core.views.SEO_LOG_PAGE_SIZE', 2):
+            response = self.client.get(reverse('seo_logs'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 200)
+        first = list(SEOLog.objects.order_by('-date', '-id')[:2])
+        self.assertEqual(list(response.context['logs']), first)
+
+    def test_next_url_keeps_filters(self):
+        filters = {'project': str(self.project.pk), 'type': 'content'}
+        expected = list(
+            SEOLog.objects.filter(project=self.project, work_type='content').order_by('-date', '-id')
+        )
+        seen, url, params = [], reverse('seo_logs'), filters
+        with mock.patch('core.views.SEO_LOG_PAGE_SIZE', 2):
+            while url:
+                response = self.client.get(url, params)
+                seen.extend(response.context['logs'])
+                url, params = response.context['next_url'], None
+                if url:
+                    query = QueryDict(url.split('?', 1)[1])
+                    self.assertEqual(query['project'], filters['project'])
+                    self.assertEqual(query['type'], filters['type'])
+        self.assertEqual(seen, expected)
+
+    def test_fragment_for_infinite_scroll(self):
+        with mock.patch('core.views.SEO_LOG_PAGE_SIZE', 2):
+            response = self.client.get(reverse('seo_logs'), {'fragment': '1'})
+        self.assertTemplateUsed(response, 'core/seo_log_rows.html')
+        self.assertTemplateNotUsed(response, 'core/seo_log_list.html')
+        content = response.content.decode()
+        self.assertNotIn('<html', content)
+        self.assertEqual(content.count('<tr>'), 2)
+
+        # The next page link is for the full list; the script asks for a fragment itself
+        next_url = response.context['next_url']
+        self.assertIn(f'data-next-url="{next_url.replace("&", "&amp;")}"', content)
+        self.assertNotIn('fragment', next_url)
+
+
+class WorkerBootTests(TestCase):
+    """Booting a web worker and importing the PDF code must not load WeasyPrint."""
+
+    def test_boot_does_not_load_weasyprint(self):
+        out = io.StringIO()
+        err = io.StringIO()
+        call_command(
+            'benchmark_startup', runs=1, modules=['core.pdf', 'core.render_pool', 'core.exports'],
+            stdout=out, stderr=err
+        )
+        self.assertIn('Worker boot over 1 runs', out.getvalue())
+        self.assertIn('WeasyPrint loaded: no', out.getvalue())
+        self.assertEqual(err.getvalue(), '')
+
+
+class FakeURLFetcher:
+    """Stand-in for weasyprint.urls.URLFetcher that records network fetches."""
+
+    def __init__(self, allowed_protocols=None):
+        self.allowed_protocols = allowed_protocols
+        self.fetched = []
+
+    def fetch(self, url, headers=None):
+        self.fetched.append(url)
+        return 'network'
+
+
+@override_settings(ALLOWED_HOSTS=['seo.example.com'])
+class RenderSharingTests(TempDirsMixin, TestCase):
+    """Renders in one process share fonts, the stylesheet and media read from disk."""
+
+    BASE_URL = 'https://seo.example.com/'
+
+    def setUp(self):
+        super().setUp()
+        # WeasyPrint cannot load here (no Pango), so renders run against a fake module
+        self.weasyprint = mock.Mock()
+        urls = types.ModuleType('weasyprint.urls')
+        urls.URLFetcher = FakeURLFetcher
+        urls.URLFetcherResponse = lambda url, data, headers: (url, data, headers)
+        modules = mock.patch.dict(sys.modules, {
+            'weasyprint': self.weasyprint,
+            'weasyprint.text': self.weasyprint.text,
+            'weasyprint.text.fonts': self.weasyprint.text.fonts,
+            'weasyprint.urls': urls,
+        })
+        for patcher in [
+            modules,
+            mock.patch('core.pdf._font_config', None),
+            mock.patch('core.pdf._stylesheet', None),
+            mock.patch('core.pdf.render_report_html', return_value='<p>Report</p>'),
+            mock.patch.dict('core.pdf_fetcher._cache', clear=True),
+            mock.patch('core.pdf_fetcher._cache_bytes', 0),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.report = mock.Mock(pk=1)
+
+    def test_fonts_and_stylesheet_are_loaded_once(self):
+        render_report_pdf(self.report, self.BASE_URL)
+        render_report_pdf(self.report, self.BASE_URL)
+        self.assertEqual(self.weasyprint.text.fonts.FontConfiguration.call_count, 1)
+        self.assertEqual(self.weasyprint.CSS.call_count, 1)
+
+        font_config = self.weasyprint.text.fonts.FontConfiguration.return_value
+        stylesheet = self.weasyprint.CSS.return_value
+        self.weasyprint.HTML.return_value.write_pdf.assert_called_with(stylesheets=[stylesheet], font_config=font_config)
+        url_fetcher = self.weasyprint.HTML.call_args.kwargs['url_fetcher']
+        self.assertIsInstance(url_fetcher, FakeURLFetcher)
+
+    def test_unshared_render_starts_from_scratch(self):
+        render_report_pdf(self.report, self.BASE_URL, shared=False)
+        render_report_pdf(self.report, self.BASE_URL, shared=False)
+        self.assertEqual(self.weasyprint.text.fonts.FontConfiguration.call_count, 2)
+        self.assertEqual(self.weasyprint.CSS.call_count, 2)
+        self.assertIsNone(self.weasyprint.HTML.call_args.kwargs['url_fetcher'])
+
+    def test_media_is_read_from_disk_and_cached(self):
+        path = os.path.join(settings.MEDIA_ROOT, 'logo.png')
+        with open(path, 'wb') as f:
+            f.write(PNG_BYTES)
+        fetcher = make_url_fetcher(self.BASE_URL)
+
+        url, data, headers = fetcher.fetch('https://seo.example.com/media/logo.png')
+        self.assertEqual((data, headers), (PNG_BYTES, {'Content-Type': 'image/png'}))
+        self.assertIs(fetcher.fetch('/media/logo.png')[1], data)
+
+        # A replaced file is read again
+        with open(path, 'wb') as f:
+            f.write(PNG_BYTES + b'new')
+        self.assertEqual(fetcher.fetch('/media/logo.png')[1], PNG_BYTES + b'new')
+        self.assertEqual(fetcher.fetched, [])
+
+        # Other hosts go to WeasyPrint's own fetcher; our other URLs are refused
+        self.assertEqual(fetcher.fetch('https://cdn.example.org/logo.png'), 'network')
+        with self.assertRaises(LocalURLError):
+            fetcher.fetch('https://seo.example.com/reports/1/download/')
+        self.assertEqual(fetcher.fetched, ['https://cdn.example.org/logo.png'])
@@ -0,0 +1,242 @@
+import hashlib
+import os
+from functools import wraps
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.shortcuts import redirect
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+# Leading bytes of the formats users may upload: (magic bytes, content type)
+SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'%PDF-', 'application/pdf'),
+]
+
+# Office documents share a container format; the extension tells them apart
+OLE2_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+ZIP_MAGIC = b'PK\x03\x04'
+OLE2_TYPES = {
+    '.doc': 'application/msword',
+    '.xls': 'application/vnd.ms-excel',
+}
+ZIP_TYPES = {
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+# ISO base media files (MP4 and relatives) name their format in the major brand
+# at bytes 8-12 of the leading ftyp box
+FTYP_BRANDS = {
+    b'isom': 'video/mp4', b'iso2': 'video/mp4', b'iso4': 'video/mp4', b'iso5': 'video/mp4',
+    b'iso6': 'video/mp4', b'mp41': 'video/mp4', b'mp42': 'video/mp4', b'avc1': 'video/mp4',
+    b'dash': 'video/mp4', b'M4V ': 'video/mp4',
+    b'M4A ': 'audio/mp4',
+    b'qt  ': 'video/quicktime',
+    b'3gp4': 'video/3gpp', b'3gp5': 'video/3gpp', b'3gp6': 'video/3gpp', b'3g2a': 'video/3gpp2',
+    b'heic': 'image/heic', b'heix': 'image/heic', b'heim': 'image/heic', b'heis': 'image/heic',
+    b'hevc': 'image/heic-sequence', b'mif1': 'image/heif', b'msf1': 'image/heif-sequence',
+    b'avif': 'image/avif', b'avis': 'image/avif',
+}
+# Plain text has no signature; accept it for these extensions when it decodes
+TEXT_TYPES = {
+    '.csv': 'text/csv',
+    '.txt': 'text/plain',
+}
+
+# Every content type sniff_content_type can return; forms accept exactly these
+ACCEPTED_TYPES = frozenset(
+    [content_type for magic, content_type in SIGNATURES]
+    + ['image/webp', 'video/webm']
+    + list(FTYP_BRANDS.values())
+    + list(OLE2_TYPES.values())
+    + list(ZIP_TYPES.values())
+    + list(TEXT_TYPES.values())
+)
+
+
+def sniff_content_type(head, file_name):
+    """
+    Return the content type of an upload from its first bytes, or None if
+    they match no accepted format. The client's Content-Type is ignored.
+    """
+    for magic, content_type in SIGNATURES:
+        if head.startswith(magic):
+            return content_type
+    if head[12:16] == b'WEBP' and head.startswith(b'RIFF'):
+        return 'image/webp'
+    if head[4:8] == b'ftyp':
+        return FTYP_BRANDS.get(head[8:12])
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'video/webm'
+
+    ext = os.path.splitext(file_name or '')[1].lower()
+    if head.startswith(OLE2_MAGIC):
+        return OLE2_TYPES.get(ext)
+    if head.startswith(ZIP_MAGIC):
+        return ZIP_TYPES.get(ext)
+    if ext in TEXT_TYPES and b'\x00' not in head:
+        try:
+            # The chunk may end inside a multi-byte character
+            head.decode('utf-8', errors='strict')
+        except UnicodeDecodeError as e:
+            if e.start < len(head) - 3:
+                return None
+        return TEXT_TYPES[ext]
+    return None
+
+
+def max_file_size():
+    return getattr(settings, 'UPLOAD_MAX_FILE_SIZE', 50 * 1024 * 1024)
+
+
+def max_request_size():
+    return getattr(settings, 'UPLOAD_MAX_REQUEST_SIZE', 200 * 1024 * 1024)
+
+
+def file_size_error(file_name):
+    return f'File {file_name} is too large. Maximum size is {max_file_size() // (1024 * 1024)}MB.'
+
+
+def request_limit_error():
+    return f'The upload is larger than the {max_request_size() // (1024 * 1024)}MB limit per request.'
+
+
+def check_upload(file):
+    """Raise ValidationError for a file the upload handler rejected."""
+    error = getattr(file, 'upload_error', None)
+    if error:
+        raise ValidationError(error)
+
+
+class ScreenedUploadHandler(FileUploadHandler):
+    """
+    Screen uploads while the multipart body streams in:
+
+    - a request whose Content-Length exceeds UPLOAD_MAX_REQUEST_SIZE, or whose
+      body turns out to be larger, is stopped without reading the rest of it
+    - the first chunk of every file is sniffed for its real type, unknown types are rejected
+    - a file stops being stored as soon as it passes UPLOAD_MAX_FILE_SIZE
+    - the SHA-256 of the content is computed on the way (file.sha256), so the
+      content-addressed storage does not read the file again
+
+    Small files stay in memory and larger ones spill to a temporary file, like
+    Django's default handlers. A rejected file is still handed to the form as
+    an empty placeholder with an upload_error message, so the form can tell
+    the user which file failed; check_upload() turns that into a ValidationError.
+
+    The handler is installed per view with the screen_uploads decorator, so
+    the admin and other forms keep Django's default handlers.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.request_bytes = 0
+        self.request_rejected = False
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > max_request_size():
+            self.request_rejected = True
+            raise StopUpload(connection_reset=True)
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = BytesIO()
+        self.file_bytes = 0
+        self.content_type = None
+        self.hasher = hashlib.sha256()
+        self.upload_error = None
+
+    def reject(self, error):
+        self.upload_error = error
+        self.file.close()
+        self.file = BytesIO()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.file_bytes += len(raw_data)
+        self.request_bytes += len(raw_data)
+        if self.request_bytes > max_request_size():
+            # The Content-Length understated the body; stop reading it
+            self.request_rejected = True
+            raise StopUpload(connection_reset=True)
+        if self.upload_error:
+            return None
+
+        if start == 0:
+            self.content_type = sniff_content_type(raw_data, self.file_name)
+            if self.content_type is None:
+                self.reject(f'File {self.file_name} has an unsupported format.')
+                return None
+        if self.file_bytes > max_file_size():
+            self.reject(file_size_error(self.file_name))
+            return None
+        self.hasher.update(raw_data)
+        if isinstance(self.file, BytesIO) and self.file_bytes > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            # Spill to disk once the file outgrows the in-memory limit
+            spooled = TemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+            spooled.write(self.file.getvalue())
+            self.file = spooled
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.upload_error:
+            upload = InMemoryUploadedFile(
+                BytesIO(), self.field_name, self.file_name, 'application/octet-stream', 0, self.charset
+            )
+            upload.upload_error = self.upload_error
+            return upload
+
+        self.file.seek(0)
+        if isinstance(self.file, TemporaryUploadedFile):
+            upload = self.file
+            upload.size = file_size
+            upload.content_type = self.content_type
+            upload.file.flush()
+        else:
+            upload = InMemoryUploadedFile(
+                self.file, self.field_name, self.file_name, self.content_type or 'application/octet-stream',
+                file_size, self.charset, self.content_type_extra
+            )
+        upload.sha256 = self.hasher.hexdigest()
+        upload.upload_error = None
+        return upload
+
+    def upload_interrupted(self):
+        if isinstance(getattr(self, 'file', None), TemporaryUploadedFile):
+            self.file.close()
+
+
+def screen_uploads(view_func):
+    """
+    Screen a view's multipart uploads with ScreenedUploadHandler. A request
+    over UPLOAD_MAX_REQUEST_SIZE is redirected back to the page with an error
+    before the view runs.
+
+    Upload handlers can only be replaced before request.POST is read, and the
+    CSRF middleware reads it first, so the CSRF check runs here instead, after
+    the handler is installed.
+    """
+    protected_view = csrf_protect(view_func)
+
+    @wraps(view_func)
+    def wrapped_view(request, *args, **kwargs):
+        if request.method == 'POST':
+            handler = ScreenedUploadHandler(request)
+            request.upload_handlers = [handler]
+            try:
+                request.POST
+            except StopUpload:
+                pass
+            if handler.request_rejected:
+                messages.error(request, request_limit_error())
+                return redirect(request.get_full_path())
+        return protected_view(request, *args, **kwargs)
+
+    return csrf_exempt(wrapped_view)
@@ -30,9 +30,14 @@ urlpatterns = [
     # SEO Log URLs
     path('seo-logs/', views.seo_log_list, name='seo_logs'),
     path('seo-logs/add/', views.seo_log_add, name='seo_log_add'),
+    path('seo-logs/import/', views.seo_log_import, name='seo_log_import'),
+    path('seo-logs/export/', views.seo_log_export, name='seo_log_export'),
     path('seo-logs/<int:pk>/', views.seo_log_detail, name='seo_log_detail'),
     path('seo-logs/<int:pk>/edit/', views.seo_log_edit, name='seo_log_edit'),
     path('seo-logs/<int:pk>/delete/', views.seo_log_delete, name='seo_log_delete'),
+    path('seo-logs/<int:pk>/uploads/', views.chunked_upload_create, name='chunked_upload_create'),
+    path('uploads/<uuid:upload_id>/', views.chunked_upload_detail, name='chunked_upload_detail'),
+    path('uploads/<uuid:upload_id>/finalize/', views.chunked_upload_finalize, name='chunked_upload_finalize'),
     
     # Report URLs
     path('reports/', views.report_list, name='report_list'),
@@ -41,6 +46,8 @@ urlpatterns = [
     path('reports/<int:pk>/edit/', views.report_edit, name='report_edit'),
     path('reports/<int:report_pk>/sections/add/', views.report_section_add, name='report_section_add'),
     path('reports/<int:pk>/download/', views.report_download, name='report_download'),
+    path('reports/<int:pk>/download/status/', views.report_download_status, name='report_download_status'),
+    path('reports/export/', views.report_export, name='report_export'),
     path('attachments/<int:pk>/download/', views.attachment_download, name='attachment_download'),
     path('reports/<int:pk>/review/', views.report_review, name='report_review'),
     path('reports/<int:pk>/publish/', views.report_publish, name='report_publish'),
@@ -1,7 +1,11 @@
+import html
 import os
+import re
 from datetime import datetime
 import uuid
 
+from django.utils.html import strip_tags
+
 def generate_unique_filename(original_filename, prefix=''):
     """
     Generate a unique filename by combining:
@@ -26,4 +30,28 @@ def generate_unique_filename(original_filename, prefix=''):
     else:
         new_filename = f"{name}_{timestamp}_{unique_id}{ext}"
     
-    return new_filename 
\ No newline at end of file
+    return new_filename
+
+def html_to_text(value):
+    """
+    Convert rich HTML content to plain text:
+    - Tags stripped, block boundaries kept as spaces
+    - HTML entities decoded
+    - Whitespace collapsed
+    """
+    if not value:
+        return ''
+    text = strip_tags(re.sub(r'<(br|/p|/li|/h\d|/td|/th|/tr)[^>]*>', ' ', value))
+    return re.sub(r'\s+', ' ', html.unescape(text)).strip()
+
+def text_excerpt(text, length=200):
+    """
+    Shorten plain text to at most length characters, cutting at a word
+    boundary and ending with an ellipsis when anything was cut.
+    """
+    if len(text) <= length:
+        return text
+    cut = text[:length - 1]
+    if ' ' in cut:
+        cut = cut.rsplit(' ', 1)[0]
+    return cut.rstrip(' ,.;:') + '\u2026'
@@ -1,19 +1,33 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponseForbidden, HttpResponse
+from django.http import HttpResponseForbidden, HttpResponse, FileResponse, JsonResponse, StreamingHttpResponse
 from functools import wraps
-from .models import Customer, Project, SEOLog, ReportSection, Media, UserSettings, CustomUser, SEOLogFile, Notification, Report, ReportVersion, ReportSectionOrder, ReportAttachment, AttachmentAccess
+import os
+from django.db.models import Count, Q
+from .models import Customer, Project, SEOLog, ReportSection, Media, UserSettings, CustomUser, SEOLogFile, Notification, Report, ReportVersion, ReportSectionOrder, ReportAttachment, AttachmentAccess, ReportRenderJob, ChunkedUpload
+from .chunked_uploads import UploadError, create_upload, finalize_upload, missing_offsets, write_chunk
+from .counters import GLOBAL, PROVIDER, CUSTOMER, read_counters, recount_customer_memberships, scope_querysets
+from .downloads import serve_file
+from .exports import ReportArchive, open_report_pdf
+from .log_export import EXPORT_FORMATS, stream_csv, write_xlsx
+from .log_import import LogImportError, import_seo_logs
+from .pagination import keyset_page
+from .report_loader import load_report, report_queryset
+from .search import highlight, search_logs
+from .storage_usage import get_usage, top_customer_usage
+from .uploads import screen_uploads
 from .forms import (
-    CustomUserForm, CustomerForm, ProjectForm, SEOLogForm,
+    CustomUserForm, CustomerForm, ProjectForm, SEOLogForm, SEOLogImportForm,
     ReportSectionForm, MediaForm, ReportForm, RegisterForm, LoginForm
 )
 from django.template.loader import render_to_string, get_template
 from django.utils import timezone
 from django.conf import settings
-from weasyprint import HTML
 from django.contrib.auth import login, logout, authenticate
-from django.utils.html import strip_tags
+from django.urls import reverse
+from django.utils.http import content_disposition_header
+from django.utils.text import slugify
 
 def role_required(roles):
     def decorator(view_func):
@@ -26,120 +40,86 @@ def role_required(roles):
         return _wrapped_view
     return decorator
 
+# Work types counted as finished when computing project progress
+COMPLETED_WORK_TYPES = ['completed', 'published']
+
+def with_progress(projects, log_filter=Q(), limit=5):
+    """
+    Annotate projects with their log totals in the same query and set
+    project.progress, instead of counting logs once per project.
+    """
+    projects = projects.annotate(
+        total_logs=Count('seolog', filter=log_filter),
+        completed_logs=Count('seolog', filter=log_filter & Q(seolog__work_type__in=COMPLETED_WORK_TYPES)),
+    ).order_by('pk')
+    projects = list(projects[:limit])
+    for project in projects:
+        if project.total_logs > 0:
+            project.progress = int((project.completed_logs / project.total_logs) * 100)
+        else:
+            project.progress = 0
+    return projects
+
 @login_required
 def dashboard(request):
     today = timezone.now().date()
     user = request.user
 
-    # Get counts based on user role
+    # Resolve the scope of each widget once, based on user role
+    progress_filter = Q()
     if user.role == 'admin':
-        customer_count = Customer.objects.count()
-        active_projects_count = Project.objects.filter(is_active=True).count()
-        todays_logs_count = SEOLog.objects.filter(date=today).count()
-        reports_count = Report.objects.count()
-        
-        # Get active projects with progress
-        active_projects = Project.objects.filter(is_active=True)[:5]
-        for project in active_projects:
-            total_logs = SEOLog.objects.filter(project=project).count()
-            if total_logs > 0:
-                completed_logs = SEOLog.objects.filter(
-                    project=project, 
-                    work_type__in=['completed', 'published']
-                ).count()
-                project.progress = int((completed_logs / total_logs) * 100)
-            else:
-                project.progress = 0
-    
+        scope, scope_id = GLOBAL, 0
     elif user.role == 'provider':
-        customer_count = Customer.objects.filter(projects__providers=user).distinct().count()
-        active_projects_count = Project.objects.filter(providers=user, is_active=True).count()
-        todays_logs_count = SEOLog.objects.filter(created_by=user, date=today).count()
-        reports_count = Report.objects.filter(created_by=user).count()
-        
-        # Get provider's active projects with progress
-        active_projects = Project.objects.filter(providers=user, is_active=True)[:5]
-        for project in active_projects:
-            total_logs = SEOLog.objects.filter(project=project, created_by=user).count()
-            if total_logs > 0:
-                completed_logs = SEOLog.objects.filter(
-                    project=project,
-                    created_by=user,
-                    work_type__in=['completed', 'published']
-                ).count()
-                project.progress = int((completed_logs / total_logs) * 100)
-            else:
-                project.progress = 0
-    
+        scope, scope_id = PROVIDER, user.pk
+        progress_filter = Q(seolog__created_by=user)
     else:  # customer
-        try:
-            customer = Customer.objects.get(email=user.email)
-            customer_count = 1  # themselves
-            active_projects_count = Project.objects.filter(customer=customer, is_active=True).count()
-            todays_logs_count = SEOLog.objects.filter(project__customer=customer, date=today).count()
-            reports_count = Report.objects.filter(project__customer=customer).count()
-            
-            # Get customer's active projects with progress
-            active_projects = Project.objects.filter(customer=customer, is_active=True)[:5]
-            for project in active_projects:
-                total_logs = SEOLog.objects.filter(project=project).count()
-                if total_logs > 0:
-                    completed_logs = SEOLog.objects.filter(
-                        project=project,
-                        work_type__in=['completed', 'published']
-                    ).count()
-                    project.progress = int((completed_logs / total_logs) * 100)
-                else:
-                    project.progress = 0
-        except Customer.DoesNotExist:
+        customer = Customer.objects.filter(email=user.email).first()
+        if customer is None:
             messages.error(request, "No customer profile found for your account. Please contact an administrator.")
-            customer_count = 0
-            active_projects_count = 0
-            todays_logs_count = 0
-            reports_count = 0
-            active_projects = []
+        scope, scope_id = CUSTOMER, customer.pk if customer else None
+
+    if scope_id is None:
+        counts = {
+            'customer_count': 0,
+            'active_projects_count': 0,
+            'todays_logs_count': 0,
+            'reports_count': 0,
+        }
+        projects = Project.objects.none()
+        logs = SEOLog.objects.none()
+        reports = Report.objects.none()
+    else:
+        # Card values come from the materialized counters kept up to date by signals
+        counts = read_counters(scope, scope_id, today)
+        querysets = scope_querysets(scope, scope_id)
+        projects = querysets['projects']
+        logs = querysets['logs']
+        reports = querysets['reports']
+
+    # Get active projects with progress
+    active_projects = with_progress(projects.filter(is_active=True), progress_filter)
 
     # Get recent activities
     recent_activities = []
     
     # Get recent SEO logs
-    recent_logs = SEOLog.objects.select_related('project', 'created_by')
-    if user.role == 'provider':
-        recent_logs = recent_logs.filter(created_by=user)
-    elif user.role == 'customer':
-        try:
-            customer = Customer.objects.get(email=user.email)
-            recent_logs = recent_logs.filter(project__customer=customer)
-        except Customer.DoesNotExist:
-            recent_logs = SEOLog.objects.none()
-    recent_logs = recent_logs.order_by('-date')[:5]
+    recent_logs = logs.select_related('project').defer('description', 'search_text').order_by('-date')[:5]
     
     for log in recent_logs:
         # Convert date to datetime for consistent comparison
         timestamp = timezone.datetime.combine(log.date, timezone.datetime.min.time())
         timestamp = timezone.make_aware(timestamp)
-        # Strip HTML tags from description for clean display
-        description = strip_tags(log.description)
         recent_activities.append({
             'type': 'log',
             'icon': 'fas fa-tasks',
             'color': 'success',
             'title': f'New SEO Log - {log.project.name}',
-            'description': f'{log.get_work_type_display()}: {description[:100]}...',
+            'description': f'{log.get_work_type_display()}: {log.excerpt}',
             'timestamp': timestamp
         })
     
     # Get recent reports
-    recent_reports = Report.objects.select_related('project', 'created_by')
-    if user.role == 'provider':
-        recent_reports = recent_reports.filter(created_by=user)
-    elif user.role == 'customer':
-        try:
-            customer = Customer.objects.get(email=user.email)
-            recent_reports = recent_reports.filter(project__customer=customer)
-        except Customer.DoesNotExist:
-            recent_reports = Report.objects.none()
-    recent_reports = recent_reports.order_by('-created_at')[:5]
+    recent_reports = reports.select_related('project').order_by('-created_at')[:5]
     
     for report in recent_reports:
         recent_activities.append({
@@ -156,10 +136,7 @@ def dashboard(request):
     recent_activities = recent_activities[:10]  # Limit to 10 most recent activities
 
     context = {
-        'customer_count': customer_count,
-        'active_projects_count': active_projects_count,
-        'todays_logs_count': todays_logs_count,
-        'reports_count': reports_count,
+        **counts,
         'active_projects': active_projects,
         'recent_activities': recent_activities,
     }
@@ -167,17 +144,9 @@ def dashboard(request):
     return render(request, 'core/dashboard.html', context)
 
 def get_storage_used():
-    """Calculate total storage used by media files"""
-    from django.conf import settings
-    import os
-    
-    total_size = 0
-    media_root = settings.MEDIA_ROOT
-    
-    for dirpath, dirnames, filenames in os.walk(media_root):
-        for f in filenames:
-            fp = os.path.join(dirpath, f)
-            total_size += os.path.getsize(fp)
+    """Return total storage used by media files, from the incrementally maintained totals"""
+    usage = get_usage('global')
+    total_size = usage.bytes_used if usage else 0
     
     # Convert to MB
     return f"{total_size / (1024 * 1024):.1f} MB"
@@ -268,23 +237,18 @@ def project_add(request):
         'form': form,
     })
 
-@login_required
-@role_required(['admin', 'provider'])
-def seo_log_list(request):
-    # Get base queryset based on user role
+SEO_LOG_PAGE_SIZE = 50
+
+def filter_seo_logs(request):
+    """The SEO logs the user may see, narrowed by the seo_log_list filters in the query string."""
     if request.user.role == 'provider':
         logs = SEOLog.objects.filter(created_by=request.user)
-        projects = Project.objects.filter(seolog__created_by=request.user).distinct()
-        providers = [request.user]  # Only show current provider
     else:
         logs = SEOLog.objects.all()
-        projects = Project.objects.all()
-        providers = CustomUser.objects.filter(role='provider')  # Get all providers
     
-    # Apply filters
     search = request.GET.get('search')
     if search:
-        logs = logs.filter(description__icontains=search)
+        logs = search_logs(logs, search)
     
     project_id = request.GET.get('project')
     if project_id:
@@ -307,13 +271,56 @@ def seo_log_list(request):
     elif date_range == 'month':
         month_ago = timezone.now().date() - timezone.timedelta(days=30)
         logs = logs.filter(date__gte=month_ago)
+    return logs
+
+@login_required
+@role_required(['admin', 'provider'])
+def seo_log_list(request):
+    # Get filter options based on user role
+    if request.user.role == 'provider':
+        projects = Project.objects.filter(seolog__created_by=request.user).distinct()
+        providers = [request.user]  # Only show current provider
+    else:
+        projects = Project.objects.all()
+        providers = CustomUser.objects.filter(role='provider')  # Get all providers
+    
+    search = request.GET.get('search')
+    logs = filter_seo_logs(request)
+    
+    # Fetch one page, most recent first, continuing from the cursor if given
+    logs = logs.select_related('project', 'created_by').prefetch_related('files')
+    # Search results are ranked by relevance instead of date
+    order_field = 'search_rank' if search else 'date'
+    logs, next_cursor = keyset_page(logs, request.GET.get('cursor'), SEO_LOG_PAGE_SIZE, order_field)
+    if search:
+        for log in logs:
+            log.search_snippet = highlight(log.search_text, search)
+    
+    # The next page link keeps every active filter
+    next_url = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        params.pop('fragment', None)
+        next_url = f"{request.path}?{params.urlencode()}"
+    
+    # Infinite scroll requests only need the new rows
+    if request.GET.get('fragment'):
+        return render(request, 'core/seo_log_rows.html', {
+            'logs': logs,
+            'next_url': next_url,
+        })
     
-    # Order by most recent and select related fields for optimization
-    logs = logs.select_related('project', 'created_by').order_by('-date')
+    # The export links apply the same filters to every log, not just this page
+    export_params = request.GET.copy()
+    for key in ('cursor', 'fragment', 'format'):
+        export_params.pop(key, None)
     
     return render(request, 'core/seo_log_list.html', {
         'title': 'SEO Logs',
         'logs': logs,
+        'next_url': next_url,
+        'export_query': export_params.urlencode(),
         'projects': projects,
         'providers': providers,
         'log_types': SEOLog.WORK_TYPE_CHOICES,
@@ -321,6 +328,37 @@ def seo_log_list(request):
 
 @login_required
 @role_required(['admin', 'provider'])
+def seo_log_export(request):
+    """Export the logs matching the seo_log_list filters as CSV or XLSX."""
+    export_format = request.GET.get('format')
+    if export_format not in EXPORT_FORMATS:
+        # Default to the user's report format setting
+        report_format = UserSettings.objects.filter(user=request.user).values_list('report_format', flat=True).first()
+        export_format = 'xlsx' if report_format == 'excel' else 'csv'
+    
+    logs = filter_seo_logs(request)
+    if request.GET.get('search'):
+        logs = logs.order_by('-search_rank', '-date', '-id')
+    else:
+        logs = logs.order_by('-date', '-id')
+    
+    content_type, ext = EXPORT_FORMATS[export_format]
+    filename = f'seo-logs-{timezone.now():%Y-%m-%d}.{ext}'
+    if export_format == 'csv':
+        response = StreamingHttpResponse(stream_csv(logs), content_type=content_type)
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+        return response
+    
+    try:
+        file = write_xlsx(logs)
+    except ImportError:
+        messages.error(request, 'Excel export is not available on this server; export as CSV instead.')
+        return redirect('seo_logs')
+    return FileResponse(file, as_attachment=True, filename=filename, content_type=content_type)
+
+@login_required
+@role_required(['admin', 'provider'])
+@screen_uploads
 def seo_log_add(request):
     if request.method == 'POST':
         form = SEOLogForm(request.POST, request.FILES, user=request.user)
@@ -365,6 +403,40 @@ def seo_log_add(request):
         'form': form,
     })
 
+# At most this many row errors are listed on the import page
+IMPORT_ERRORS_SHOWN = 100
+
+@login_required
+@role_required(['admin', 'provider'])
+@screen_uploads
+def seo_log_import(request):
+    result = None
+    if request.method == 'POST':
+        form = SEOLogImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            file = form.cleaned_data['file']
+            try:
+                result = import_seo_logs(file, file.name, request.user)
+            except LogImportError as e:
+                form.add_error('file', str(e))
+            else:
+                if result.created:
+                    messages.success(request, f'Imported {result.created} SEO logs.')
+                if result.errors:
+                    messages.warning(request, f'{len(result.errors)} rows were skipped.')
+                if not result.errors:
+                    return redirect('seo_logs')
+    else:
+        form = SEOLogImportForm()
+
+    return render(request, 'core/seo_log_import.html', {
+        'title': 'Import SEO Logs',
+        'form': form,
+        'result': result,
+        'errors': result.errors[:IMPORT_ERRORS_SHOWN] if result else [],
+        'log_types': SEOLog.WORK_TYPE_CHOICES,
+    })
+
 @login_required
 def report_list(request):
     if request.user.role == 'admin':
@@ -383,6 +455,7 @@ def report_list(request):
 
 @login_required
 @role_required(['admin', 'provider'])
+@screen_uploads
 def report_create(request, project_pk):
     project = get_object_or_404(Project, pk=project_pk)
     
@@ -466,7 +539,7 @@ def report_create(request, project_pk):
 
 @login_required
 def report_detail(request, pk):
-    report = get_object_or_404(Report, pk=pk)
+    report = get_object_or_404(report_queryset(), pk=pk)
     
     # Check permissions
     if request.user.role == 'customer' and report.project.customer.email != request.user.email:
@@ -474,26 +547,22 @@ def report_detail(request, pk):
     elif request.user.role == 'provider' and request.user not in report.project.providers.all():
         return HttpResponseForbidden()
     
-    sections = report.sections.all().order_by('reportsectionorder__order')
-    versions = report.versions.all()
-    
-    context = {
+    context = load_report(report)
+    context.update({
         'title': report.title,
-        'report': report,
-        'sections': sections,
-        'versions': versions,
+        'versions': report.versions.select_related('created_by'),
         'can_edit': report.can_edit(request.user),
         'can_review': report.can_review(request.user),
         'can_publish': report.can_publish(request.user),
         'is_admin': request.user.role == 'admin'
-    }
+    })
     
     return render(request, 'core/report_detail.html', context)
 
 @login_required
 @role_required(['admin', 'provider'])
 def report_edit(request, pk):
-    report = get_object_or_404(Report, pk=pk)
+    report = get_object_or_404(report_queryset(), pk=pk)
     
     if request.method == 'POST':
         form = ReportForm(request.POST, instance=report)
@@ -516,14 +585,12 @@ def report_edit(request, pk):
     else:
         form = ReportForm(instance=report)
     
-    sections = report.sections.all().order_by('reportsectionorder__order')
-    
-    return render(request, 'core/report_edit.html', {
+    context = load_report(report)
+    context.update({
         'title': f'Edit Report: {report.title}',
         'form': form,
-        'report': report,
-        'sections': sections,
     })
+    return render(request, 'core/report_edit.html', context)
 
 @login_required
 @role_required(['admin', 'provider'])
@@ -569,23 +636,89 @@ def report_download(request, pk):
     elif request.user.role == 'provider' and request.user not in report.project.providers.all():
         return HttpResponseForbidden()
     
-    # Generate PDF
-    template = get_template('core/report_pdf.html')
-    sections = report.sections.all().order_by('reportsectionorder__order')
+    # Serve a stored or cached PDF rendered from the same content
+    pdf_file = open_report_pdf(report)
+    if pdf_file:
+        return FileResponse(
+            pdf_file,
+            as_attachment=True,
+            filename=f'{report.title}.pdf',
+            content_type='application/pdf'
+        )
+    
+    # Otherwise queue a render and let the browser wait for it. The worker
+    # stores it on the current ReportVersion, creating that only then
+    job = ReportRenderJob.enqueue(
+        report,
+        user=request.user,
+        base_url=request.build_absolute_uri('/')
+    )
     
-    context = {
+    return render(request, 'core/report_download_pending.html', {
+        'title': f'Preparing {report.title}',
         'report': report,
-        'sections': sections,
-        'base_url': request.build_absolute_uri('/')[:-1],
-    }
+        'job': job,
+    })
+
+@login_required
+@role_required(['admin', 'provider'])
+def report_export(request):
+    """Stream a ZIP of a customer's or project's report PDFs and their attachments."""
+    reports = Report.objects.filter(is_template=False).select_related('project')
+    if request.user.role == 'provider':
+        reports = reports.filter(project__providers=request.user)
+
+    project_id = request.GET.get('project', '')
+    customer_id = request.GET.get('customer', '')
+    if project_id.isdigit():
+        scope = get_object_or_404(Project, pk=project_id)
+        reports = reports.filter(project=scope)
+        back = redirect('project_detail', pk=scope.pk)
+    elif customer_id.isdigit():
+        scope = get_object_or_404(Customer, pk=customer_id)
+        reports = reports.filter(project__customer=scope)
+        back = redirect('customer_detail', pk=scope.pk)
+    else:
+        messages.error(request, 'Choose a customer or project to export reports for.')
+        return redirect('report_list')
+
+    status = request.GET.get('status', 'published')
+    if status in dict(Report.STATUS_CHOICES):
+        reports = reports.filter(status=status)
+    elif status != 'all':
+        messages.error(request, 'Unknown report status.')
+        return back
+
+    reports = reports.order_by('project__name', 'created_at').distinct()
+    if not reports.exists():
+        messages.info(request, 'There are no reports to export.')
+        return back
+
+    archive = ReportArchive(reports, user=request.user, base_url=request.build_absolute_uri('/'))
+    filename = f'reports-{slugify(scope.name) or scope.pk}-{timezone.now():%Y-%m-%d}.zip'
+    response = StreamingHttpResponse(archive, content_type='application/zip')
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+@login_required
+def report_download_status(request, pk):
+    report = get_object_or_404(Report, pk=pk)
+    
+    # Check permissions
+    if request.user.role == 'customer' and report.project.customer.email != request.user.email:
+        return HttpResponseForbidden()
+    elif request.user.role == 'provider' and request.user not in report.project.providers.all():
+        return HttpResponseForbidden()
     
-    html = template.render(context)
-    pdf = HTML(string=html, base_url=request.build_absolute_uri()).write_pdf()
+    job = report.render_jobs.order_by('-created_at').first()
+    if job is None:
+        return JsonResponse({'status': 'missing'}, status=404)
     
-    # Create response
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{report.title}.pdf"'
-    return response
+    return JsonResponse({
+        'status': job.status,
+        'error': job.error if job.status == 'failed' else '',
+        'download_url': reverse('report_download', kwargs={'pk': report.pk}),
+    })
 
 @login_required
 def attachment_download(request, pk):
@@ -606,10 +739,11 @@ def attachment_download(request, pk):
         user_agent=request.META.get('HTTP_USER_AGENT', '')
     )
     
-    # Stream file
-    response = HttpResponse(attachment.file, content_type='application/octet-stream')
-    response['Content-Disposition'] = f'attachment; filename="{attachment.file.name}"'
-    return response
+    # Stored names are content hashes, so download under the attachment title
+    filename = attachment.title + os.path.splitext(attachment.file.name)[1]
+    
+    # Hand the transfer to nginx, or stream it with range support
+    return serve_file(request, attachment.file, filename=filename, content_type='application/octet-stream')
 
 @login_required
 @role_required(['admin', 'provider'])
@@ -685,8 +819,83 @@ def seo_log_detail(request, pk):
         'log': log,
     })
 
+def chunked_upload_state(upload):
+    return {
+        'id': str(upload.pk),
+        'file_name': upload.file_name,
+        'size': upload.size,
+        'chunk_size': upload.chunk_size,
+        'missing': missing_offsets(upload),
+        'url': reverse('chunked_upload_detail', kwargs={'upload_id': upload.pk}),
+        'finalize_url': reverse('chunked_upload_finalize', kwargs={'upload_id': upload.pk}),
+    }
+
+@login_required
+@role_required(['admin', 'provider'])
+def chunked_upload_create(request, pk):
+    """Start a resumable upload of a large file to an SEO log."""
+    log = get_object_or_404(SEOLog, pk=pk)
+    if request.user.role == 'provider' and log.created_by != request.user:
+        return HttpResponseForbidden("You don't have permission to edit this log.")
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
+        size = int(request.POST.get('size', 0))
+        upload = create_upload(log, request.user, request.POST.get('file_name', ''), size, request.POST.get('sha256', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid file size.'}, status=400)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(chunked_upload_state(upload), status=201)
+
+@login_required
+@role_required(['admin', 'provider'])
+def chunked_upload_detail(request, upload_id):
+    """GET reports the chunks still missing; PATCH writes the chunk at Upload-Offset."""
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+    
+    if request.method == 'PATCH':
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return JsonResponse({'error': 'Upload-Offset header is required.'}, status=400)
+        try:
+            write_chunk(upload, offset, request, length)
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        response = HttpResponse(status=204)
+        response['Upload-Offset'] = str(offset + length)
+        return response
+    
+    if request.method == 'DELETE':
+        upload.delete()
+        return HttpResponse(status=204)
+    
+    return JsonResponse(chunked_upload_state(upload))
+
+@login_required
+@role_required(['admin', 'provider'])
+def chunked_upload_finalize(request, upload_id):
+    """Attach a completely uploaded file to its SEO log."""
+    upload = get_object_or_404(ChunkedUpload.objects.select_related('seo_log'), pk=upload_id, user=request.user)
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
+        log_file = finalize_upload(upload)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({
+        'id': log_file.pk,
+        'file_name': log_file.file_name,
+        'url': log_file.file.url,
+    }, status=201)
+
 @login_required
 @role_required(['admin', 'provider'])
+@screen_uploads
 def seo_log_edit(request, pk):
     log = get_object_or_404(SEOLog, pk=pk)
     if request.user.role == 'provider' and log.created_by != request.user:
@@ -717,10 +926,19 @@ def settings_view(request):
     except UserSettings.DoesNotExist:
         settings = UserSettings.objects.create(user=request.user)
     
-    return render(request, 'core/settings.html', {
+    context = {
         'title': 'Settings',
         'settings': settings,
-    })
+    }
+    if request.user.role == 'admin':
+        context.update({
+            'storage_used': get_storage_used(),
+            'storage_total': get_usage('global'),
+            'storage_disk': get_usage('disk'),
+            'storage_by_customer': top_customer_usage(),
+        })
+    
+    return render(request, 'core/settings.html', context)
 
 @login_required
 def settings_notifications(request):
@@ -756,12 +974,17 @@ def settings_appearance(request):
     })
 
 @login_required
+@screen_uploads
 def settings_reports(request):
     """Handle report settings."""
     settings = request.user.settings
     if request.method == 'POST':
-        if request.FILES.get('report_logo'):
-            settings.report_logo = request.FILES['report_logo']
+        report_logo = request.FILES.get('report_logo')
+        if report_logo and getattr(report_logo, 'upload_error', None):
+            messages.error(request, report_logo.upload_error)
+            return redirect('settings_reports')
+        if report_logo:
+            settings.report_logo = report_logo
         settings.report_format = request.POST.get('report_format', 'pdf')
         settings.keep_as_draft = request.POST.get('keep_as_draft') == 'on'
         settings.save()
@@ -837,6 +1060,8 @@ def customer_toggle_status(request, pk):
     # When deactivating a customer, deactivate all their projects
     if not customer.is_active:
         customer.project_set.all().update(is_active=False)
+        # The bulk update skips signals, so refresh the dashboard counters it affects
+        recount_customer_memberships(customer.pk)
     
     status = 'activated' if customer.is_active else 'deactivated'
     messages.success(request, f'Customer {status} successfully.')
@@ -159,6 +159,41 @@ AUTHENTICATION_BACKENDS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Let nginx serve permission-checked downloads from its internal /protected-media/ location
+USE_X_ACCEL_REDIRECT = int(os.getenv('USE_X_ACCEL_REDIRECT', 0))
+X_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Views decorated with core.uploads.screen_uploads screen uploads while streaming:
+# sniffed type, per-file and per-request quotas
+UPLOAD_MAX_FILE_SIZE = 50 * 1024 * 1024
+UPLOAD_MAX_REQUEST_SIZE = 100 * 1024 * 1024  # Matches client_max_body_size in nginx
+
+# Resumable chunked uploads of large SEO log files
+CHUNKED_UPLOAD_DIR = os.getenv('CHUNKED_UPLOAD_DIR', BASE_DIR / 'var' / 'uploads')
+CHUNKED_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv('CHUNKED_UPLOAD_MAX_SIZE', 1024 * 1024 * 1024))
+
+# Rendered report PDF cache (content-addressed, LRU-evicted)
+REPORT_PDF_CACHE_DIR = os.getenv('REPORT_PDF_CACHE_DIR', BASE_DIR / 'var' / 'pdf_cache')
+REPORT_PDF_CACHE_MAX_BYTES = int(os.getenv('REPORT_PDF_CACHE_MAX_BYTES', 500 * 1024 * 1024))
+# Media files kept in memory by each render process between renders
+REPORT_PDF_FETCH_CACHE_BYTES = int(os.getenv('REPORT_PDF_FETCH_CACHE_BYTES', 64 * 1024 * 1024))
+
+# Report PDFs render in child processes of process_render_jobs. A process is
+# replaced after PDF_RENDER_MAX_JOBS_PER_PROCESS renders or once its peak memory
+# passes PDF_RENDER_MAX_RSS_MB; a render running past PDF_RENDER_TIMEOUT seconds is killed.
+# Setting any of the three to 0 removes that limit.
+PDF_RENDER_PROCESSES = int(os.getenv('PDF_RENDER_PROCESSES', 2))
+PDF_RENDER_MAX_JOBS_PER_PROCESS = int(os.getenv('PDF_RENDER_MAX_JOBS_PER_PROCESS', 20))
+PDF_RENDER_MAX_RSS_MB = int(os.getenv('PDF_RENDER_MAX_RSS_MB', 1024))
+PDF_RENDER_TIMEOUT = int(os.getenv('PDF_RENDER_TIMEOUT', 300))
+# The ZIP export renders missing PDFs itself for up to this many seconds, then
+# queues the rest for process_render_jobs (0 only queues)
+REPORT_EXPORT_RENDER_WAIT = int(os.getenv('REPORT_EXPORT_RENDER_WAIT', 60))
+
+# Repeated notifications for the same user and link within this window are merged
+NOTIFICATION_COALESCE_SECONDS = int(os.getenv('NOTIFICATION_COALESCE_SECONDS', 300))
+
 # Authentication settings
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'